@@ -0,0 +1,141 @@
+"""
+Arrival processes for the comm senders (comm_instrument.py --arrival,
+comm_fleet.py --arrival): when each message of a stream is produced.
+
+arrival_times(spec) returns a generator of send times in seconds from
+the stream's start (the first message at 0 unless the process says
+otherwise). Senders sleep until start + t for every message, so a late
+wake-up or a slow ack never shifts the later messages: the schedule is
+absolute, it does not drift.
+
+Specs (times in ms, like impairment.py's delay specs):
+  periodic:INTERVAL[:JITTER]   every INTERVAL, each release delayed by
+                               uniform [0, JITTER] (release jitter)
+  poisson:MEAN                 exponential gaps with mean MEAN
+  onoff:ON:OFF:INTERVAL        exponential ON and OFF periods (means);
+                               a message every INTERVAL while on
+  mmpp:GAP1:DWELL1:GAP2:DWELL2[:...]
+                               Markov-modulated Poisson: state i sends
+                               with mean gap GAPi and lasts an exponential
+                               DWELLi, then moves to another state at
+                               random (two states: alternate)
+  replay:PATH[:COLUMN]         inter-arrival gaps from a CSV (column name
+                               or index, default the first; header and
+                               '#' lines skipped), looped when exhausted
+
+The old fixed-interval sender with --burst is periodic() with
+burst=(20, 30): messages 21-30 are produced together with message 20.
+"""
+import csv
+import itertools
+import random
+
+
+def periodic(interval_ms, jitter_ms=0.0, burst=None, rng=random):
+    """Nominal k*interval, plus uniform [0, jitter] release jitter; burst=(a, b) sends messages a+1..b with a."""
+    nominal = 0.0
+    last = 0.0
+    for i in itertools.count():
+        t = max(last, nominal + (rng.uniform(0, jitter_ms) if jitter_ms else 0.0))
+        last = t
+        yield t / 1000.0
+        if not (burst and burst[0] <= i < burst[1]):
+            nominal += interval_ms
+
+
+def poisson(mean_ms, rng=random):
+    t = 0.0
+    while True:
+        yield t / 1000.0
+        t += rng.expovariate(1.0 / mean_ms)
+
+
+def onoff(on_ms, off_ms, interval_ms, rng=random):
+    """Exponential on/off periods, periodic sends while on."""
+    t = 0.0
+    while True:
+        end = t + rng.expovariate(1.0 / on_ms)
+        while t < end:
+            yield t / 1000.0
+            t += interval_ms
+        t = end + rng.expovariate(1.0 / off_ms)
+
+
+def mmpp(states, rng=random):
+    """states = [(mean gap ms, mean dwell ms)]; Poisson within a state, exponential dwell times."""
+    t = 0.0
+    state = 0
+    while True:
+        gap, dwell = states[state]
+        end = t + rng.expovariate(1.0 / dwell)
+        while True:
+            nxt = t + rng.expovariate(1.0 / gap)
+            if nxt >= end:
+                break
+            t = nxt
+            yield t / 1000.0
+        t = end  # memoryless: the next state's first gap starts here
+        state = rng.choice([s for s in range(len(states)) if s != state]) if len(states) > 1 else 0
+
+
+def load_gaps(path, column=None):
+    """Inter-arrival gaps (ms) from a CSV column (header name or index; default the first)."""
+    gaps = []
+    named = column is not None and not column.isdigit()
+    index = int(column) if column is not None and not named else 0
+    with open(path, newline='') as f:
+        for fields in csv.reader(f):
+            if not fields or fields[0].startswith('#'):
+                continue
+            if named:  # the first row is the header naming the column
+                if column not in fields:
+                    raise ValueError(f'{path}: no column {column!r}')
+                index = fields.index(column)
+                named = False
+                continue
+            try:
+                gaps.append(float(fields[index]))
+            except (ValueError, IndexError):  # header or short row
+                continue
+    if not gaps:
+        raise ValueError(f'{path}: no inter-arrival times found')
+    return gaps
+
+
+def replay(gaps):
+    t = 0.0
+    for gap in itertools.cycle(gaps):
+        yield t / 1000.0
+        t += gap
+
+
+def arrival_times(spec, rng=random):
+    """Arrival spec (see module docstring) -> generator of send times in seconds."""
+    kind, _, rest = spec.partition(':')
+    if kind == 'replay':
+        path, sep, column = rest.rpartition(':')
+        if not (sep and path and column) or any(c in column for c in '/\\'):
+            path, column = rest, None  # no column, or a drive letter
+        return replay(load_gaps(path, column))
+    try:
+        args = [float(v) for v in rest.split(':')] if rest else []
+    except ValueError:
+        raise ValueError(f'bad arrival spec {spec!r}') from None
+    if kind == 'periodic' and len(args) in (1, 2) and args[0] > 0:
+        return periodic(*args, rng=rng)
+    if kind == 'poisson' and len(args) == 1 and args[0] > 0:
+        return poisson(args[0], rng)
+    if kind == 'onoff' and len(args) == 3 and min(args) > 0:
+        return onoff(*args, rng=rng)
+    if kind == 'mmpp' and len(args) >= 4 and len(args) % 2 == 0 and min(args) > 0:
+        return mmpp(list(zip(args[::2], args[1::2])), rng)
+    raise ValueError(f'bad arrival spec {spec!r}: use periodic:INTERVAL[:JITTER], poisson:MEAN, '
+                     f'onoff:ON:OFF:INTERVAL, mmpp:GAP1:DWELL1:GAP2:DWELL2[:...] or replay:PATH[:COLUMN] (ms)')
+
+
+def schedule(spec=None, interval_ms=10, burst=False, seed=None):
+    """Send times for a stream: the arrival spec if given, else the fixed interval (+ legacy burst)."""
+    rng = random.Random(seed)
+    if spec:
+        return arrival_times(spec, rng)
+    return periodic(interval_ms, burst=(20, 30) if burst else None, rng=rng)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Host clock calibration for the timing harnesses and their analyzers.
+
+Every interval the scripts report (latency_us, rtt_us, tx_start - t1, ...)
+is the difference of two clock reads, so it carries the cost of one read
+and the clock's granularity. calibrate() measures, for one Python clock:
+
+- resolution_ns      what time.get_clock_info() claims
+- tick_ns            smallest non-zero step seen between two reads
+- read_ns_*          cost of one read (back-to-back reads, min/p50/p99)
+- sleep_overshoot_*  how late time.sleep(sleep_us) returns (p50/p95/p99/max)
+- busywait_error_*   how far past an absolute target a spin loop exits
+
+The result is stored with each run: in the .cols meta ('calibration') and
+as a <log>.calib.json sidecar next to the CSV. Analyzers load() it, subtract
+the median read cost from every two-stamp interval (correct()) and report
+the remaining uncertainty (bound_us()); figures within TRUST_FACTOR times
+that bound are flagged as not resolvable on the host.
+
+Run (calibrate the clocks on this machine):
+  python scripts/clock_calibration.py
+  python scripts/clock_calibration.py --clock time -o results/host.calib.json
+"""
+import argparse
+import json
+import os
+import platform
+import time
+
+import columnar
+from latency_stats import percentiles
+
+CLOCKS = {
+    'time': time.time_ns,
+    'perf_counter': time.perf_counter_ns,
+    'monotonic': time.monotonic_ns,
+}
+
+SIDECAR_SUFFIX = '.calib.json'
+TRUST_FACTOR = 10  # figures under 10x the bound are at the clock's noise level
+
+
+def calibrate(clock='perf_counter', reads=20000, sleeps=200, sleep_us=1000, spins=200, spin_us=200):
+    """Measure read cost, granularity, sleep overshoot and busy-wait error of `clock`."""
+    now_ns = CLOCKS[clock]
+    deltas = []
+    for _ in range(reads):
+        a = now_ns()
+        b = now_ns()
+        deltas.append(b - a)
+    overshoot_us = []
+    for _ in range(sleeps):
+        t0 = now_ns()
+        time.sleep(sleep_us / 1_000_000)
+        overshoot_us.append((now_ns() - t0) / 1000 - sleep_us)
+    spin_err_ns = []
+    for _ in range(spins):
+        target = now_ns() + spin_us * 1000
+        t = now_ns()
+        while t < target:
+            t = now_ns()
+        spin_err_ns.append(t - target)
+
+    read_p50, read_p99 = percentiles(deltas, (50, 99))
+    sleep_p50, sleep_p95, sleep_p99 = percentiles(overshoot_us, (50, 95, 99))
+    spin_p50, spin_p99 = percentiles(spin_err_ns, (50, 99))
+    return {
+        'clock': clock,
+        'implementation': time.get_clock_info(clock).implementation,
+        'resolution_ns': time.get_clock_info(clock).resolution * 1e9,
+        'tick_ns': min((d for d in deltas if d > 0), default=0),
+        'read_ns_min': min(deltas),
+        'read_ns_p50': read_p50,
+        'read_ns_p99': read_p99,
+        'sleep_us': sleep_us,
+        'sleep_overshoot_us_p50': sleep_p50,
+        'sleep_overshoot_us_p95': sleep_p95,
+        'sleep_overshoot_us_p99': sleep_p99,
+        'sleep_overshoot_us_max': max(overshoot_us),
+        'busywait_error_ns_p50': spin_p50,
+        'busywait_error_ns_p99': spin_p99,
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'calibrated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def correction_us(cal):
+    """Clock-read cost contained in one two-stamp interval (median)."""
+    return cal['read_ns_p50'] / 1000.0
+
+
+def bound_us(cal):
+    """Uncertainty left in an interval after correct(): granularity plus read-cost spread."""
+    return (max(cal['tick_ns'], cal['resolution_ns']) + cal['read_ns_p99'] - cal['read_ns_min']) / 1000.0
+
+
+def correct(values_ms, cal):
+    """Subtract the read cost from intervals in ms (list or ndarray); never below 0."""
+    c = correction_us(cal) / 1000.0
+    if columnar.np is not None and isinstance(values_ms, columnar.np.ndarray):
+        return columnar.np.maximum(values_ms - c, 0.0)
+    return [max(v - c, 0.0) for v in values_ms]
+
+
+def describe(cal):
+    return (f"clock {cal['clock']} ({cal['implementation']}): read p50={cal['read_ns_p50']:.0f}ns "
+            f"p99={cal['read_ns_p99']:.0f}ns tick={cal['tick_ns']}ns | "
+            f"sleep({cal['sleep_us']}us) overshoot p50={cal['sleep_overshoot_us_p50']:.0f}us "
+            f"p99={cal['sleep_overshoot_us_p99']:.0f}us | "
+            f"busy-wait error p99={cal['busywait_error_ns_p99']:.0f}ns")
+
+
+def describe_correction(cal):
+    return (f"intervals corrected by -{correction_us(cal):.3f}us (clock read), "
+            f"uncertainty +/-{bound_us(cal):.3f}us; "
+            f"values under {TRUST_FACTOR * bound_us(cal):.1f}us are at the clock's noise level")
+
+
+def sidecar_path(path):
+    """`results/x.csv` or `results/x.cols` -> `results/x.calib.json`."""
+    root, ext = os.path.splitext(path)
+    return (root if ext in ('.csv', columnar.SUFFIX) else path) + SIDECAR_SUFFIX
+
+
+def save(cal, path):
+    """Write the sidecar for the output at `path`; returns the sidecar path."""
+    out = sidecar_path(path)
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(cal, f, indent=1)
+    return out
+
+
+def load(path):
+    """Calibration stored with the output at `path` (.cols meta or sidecar), or None."""
+    table = columnar.table_path(path)
+    if columnar.is_table(table):
+        cal = columnar.read_schema(table)['meta'].get('calibration')
+        if cal:
+            return cal
+    sidecar = sidecar_path(path)
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            return json.load(f)
+    return None
+
+
+def main():
+    p = argparse.ArgumentParser(description='Calibrate host clocks: read cost, sleep overshoot, busy-wait error')
+    p.add_argument('--clock', choices=sorted(CLOCKS), action='append',
+                   help='Clock to calibrate (repeatable; default: all)')
+    p.add_argument('--sleep-us', type=int, default=1000, help='Requested sleep for the overshoot test')
+    p.add_argument('-o', '--out', help='Write the calibrations as JSON to this path')
+    args = p.parse_args()
+
+    cals = {}
+    for clock in args.clock or sorted(CLOCKS):
+        cals[clock] = calibrate(clock, sleep_us=args.sleep_us)
+        print(describe(cals[clock]))
+        print(f"  {describe_correction(cals[clock])}")
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(cals, f, indent=1)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
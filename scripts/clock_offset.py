@@ -0,0 +1,120 @@
+"""
+NTP-style client/server clock offset and drift estimation.
+
+Every echo is one NTP sample (RFC 5905 notation, client clock C, server S):
+  T3 = tx_start_us (C)   T5 = srv_recv_us (S)
+  T5' = server send (S)  T6 = ack_recv_us (C)
+  offset theta = ((T5 - T3) + (T5' - T6)) / 2   server minus client
+  delay  delta = (T6 - T3) - (T5' - T5)          network round trip
+theta is exact when the two legs are symmetric; the true offset always
+lies in theta +/- delta/2. Samples with the smallest delta are the ones
+least disturbed by queueing, so the estimator:
+
+- min-RTT filters: keeps the min-delta sample of every BLOCK_S second
+  block of samples (a "point"), and the last HISTORY points;
+- fits offset(t) = a + b*(t - t_ref) to the points by least squares, so
+  b is the drift (reported in ppm) and the estimate follows the clocks
+  as they wander: it is re-fitted whenever a block completes. Until the
+  points span MIN_DRIFT_SPAN_S the offset is the min-delta point's and
+  its bound grows by MAX_DRIFT_PPM with the distance from that point
+  (NTP's dispersion growth);
+- bounds the error at t by the best point's delta/2 plus the largest fit
+  residual.
+
+Corrected one-way latencies (final_comm_report.py):
+  uplink   = T5 - offset - T3
+  downlink = T6 - (T5' - offset)
+  e2e      = T5 - offset - T1
+each with the row's +/- offset_err_us. On loopback the offset is ~0 and
+the bound is about half the loopback RTT. The echo server stamps T5 after
+its emulated uplink delay (srv_delay_us); samples are taken at the
+physical receive, T5 - srv_delay_us, so that known asymmetry does not
+bias the offset, and T5' = T5 + srv_proc_us.
+"""
+
+BLOCK_S = 1.0  # min-RTT filter block length (client seconds)
+HISTORY = 64   # filtered points kept for the fit
+MIN_DRIFT_SPAN_S = 10  # points must span this long before a drift is fitted
+MAX_DRIFT_PPM = 100    # assumed worst relative drift while none is fitted (crystal tolerance)
+
+
+def ntp_sample(t_send, t_srv_recv, t_srv_send, t_recv):
+    """(client midpoint, offset, delay) of one exchange, all in µs."""
+    offset = ((t_srv_recv - t_send) + (t_srv_send - t_recv)) / 2.0
+    delay = (t_recv - t_send) - (t_srv_send - t_srv_recv)
+    return (t_send + t_recv) / 2.0, offset, max(delay, 0)
+
+
+class OffsetEstimator:
+    """Server-minus-client offset and drift from a stream of NTP samples."""
+
+    def __init__(self, block_s=BLOCK_S, history=HISTORY):
+        self.block_us = block_s * 1e6
+        self.history = history
+        self.points = []      # min-delay (t, offset, delay) per block
+        self.current = None   # best sample of the block being filled
+        self.block_start = None
+        self.samples = 0
+        self._fit = None      # (t_ref, a, b, err)
+
+    def add(self, t_send, t_srv_recv, t_srv_send, t_recv):
+        sample = ntp_sample(t_send, t_srv_recv, t_srv_send, t_recv)
+        self.samples += 1
+        if self.block_start is not None and sample[0] - self.block_start >= self.block_us:
+            self.points.append(self.current)
+            del self.points[:-self.history]
+            self.current = None
+            self._fit = None
+        if self.current is None:
+            self.block_start = sample[0]
+        if self.current is None or sample[2] < self.current[2]:
+            self.current = sample
+        if not self.points:
+            self._fit = None  # until the first block completes, use the best sample so far
+        return sample
+
+    def _refit(self):
+        points = self.points or ([self.current] if self.current else [])
+        if not points:
+            return None
+        best = min(p[2] for p in points)
+        t_ref = points[-1][0]
+        if len(points) < 2 or points[-1][0] - points[0][0] < MIN_DRIFT_SPAN_S * 1e6:
+            t_best, a, _ = min(points, key=lambda p: p[2])
+            return t_best, a, None, best / 2.0
+        n = len(points)
+        mt = sum(p[0] - t_ref for p in points) / n
+        mo = sum(p[1] for p in points) / n
+        sxx = sum((p[0] - t_ref - mt) ** 2 for p in points)
+        b = sum((p[0] - t_ref - mt) * (p[1] - mo) for p in points) / sxx
+        a = mo - b * mt
+        resid = max(abs(p[1] - (a + b * (p[0] - t_ref))) for p in points)
+        return t_ref, a, b, best / 2.0 + resid
+
+    def estimate(self, t_client):
+        """(offset_us, err_us) at client time t_client, or (None, None) before any sample."""
+        if self._fit is None:
+            self._fit = self._refit()
+            if self._fit is None:
+                return None, None
+        t_ref, a, b, err = self._fit
+        if b is None:
+            return a, err + MAX_DRIFT_PPM * 1e-6 * abs(t_client - t_ref)
+        return a + b * (t_client - t_ref), err
+
+    def drift_ppm(self):
+        if self._fit is None:
+            self._fit = self._refit()
+        return self._fit[2] * 1e6 if self._fit and self._fit[2] is not None else 0.0
+
+    def summary(self, t_client):
+        offset, err = self.estimate(t_client)
+        return {'offset_us': offset, 'err_us': err, 'drift_ppm': self.drift_ppm(),
+                'samples': self.samples, 'points': len(self.points)}
+
+
+def describe(summary):
+    if summary['offset_us'] is None:
+        return 'clock offset: no samples (server unreachable?)'
+    return (f"clock offset server-client {summary['offset_us']:+.1f}us +/-{summary['err_us']:.1f}us, "
+            f"drift {summary['drift_ppm']:+.2f}ppm ({summary['samples']} samples, {summary['points']} min-RTT points)")
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Binary columnar result tables (.cols), written next to or instead of CSV.
+
+A table is a directory:
+  <name>.cols/schema.json   {"format": "cols", "version": 1, "rows": N,
+                             "columns": [{"name", "type", "dtype", ...}],
+                             "meta": {...}}
+  <name>.cols/<column>.npy  one NumPy .npy (v1.0) file per column
+
+Column types use `array` typecodes: 'q' int64, 'd' float64, 'b' bool
+(stored as uint8) and 's' for short strings, stored as int32 category codes
+with the category list in the schema. Missing values are NULL_INT in 'q'
+columns and NaN in 'd' columns; the CSV view shows both as ''.
+
+Writing only needs the standard library. With NumPy, read_columns()
+memory-maps each column (np.load(mmap_mode='r')), so analyzers touch only
+the columns they use and never parse text.
+
+Run (export a table to CSV, or print its schema):
+  python scripts/columnar.py results/comm_control_log.cols -o comm_control_log.csv
+  python scripts/columnar.py results/db_impact_sync.cols
+"""
+import argparse
+import ast
+import csv
+import json
+import math
+import os
+import struct
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # optional: columns are read into array.array instead
+    np = None
+
+SUFFIX = '.cols'
+SCHEMA_FILE = 'schema.json'
+NULL_INT = -(1 << 63)
+
+# typecode -> (array typecode on disk, .npy descr)
+STORAGE = {
+    'q': ('q', '<i8'),
+    'd': ('d', '<f8'),
+    'b': ('B', '|u1'),
+    's': ('i', '<i4'),
+}
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_HEADER_BYTES = 128  # fixed, so the row count can be patched in on close
+
+
+def _npy_header(descr, rows):
+    text = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({rows},), }}"
+    pad = NPY_HEADER_BYTES - len(NPY_MAGIC) - 2 - len(text) - 1
+    return NPY_MAGIC + struct.pack('<H', NPY_HEADER_BYTES - len(NPY_MAGIC) - 2) + (text + ' ' * pad + '\n').encode()
+
+
+def table_path(path):
+    """`results/x.csv` or `results/x` -> `results/x.cols`."""
+    root, ext = os.path.splitext(path)
+    return path if ext == SUFFIX else (root if ext == '.csv' else path) + SUFFIX
+
+
+def is_table(path):
+    return os.path.isfile(os.path.join(path, SCHEMA_FILE))
+
+
+class ColumnWriter:
+    """Append rows (or whole column batches) to a .cols table.
+
+    ``fields`` is a list of (name, typecode) like simulate_db_impact's
+    RESULT_FIELDS. Rows are buffered and transposed in chunks, as in
+    ResultTable; '' and None become the column's missing value.
+    """
+
+    CHUNK_ROWS = 8192
+
+    def __init__(self, path, fields, meta=None):
+        self.path = table_path(path)
+        self.fields = list(fields)
+        self.meta = meta or {}
+        self.rows = 0
+        self._pending = []
+        self._categories = {name: {} for name, code in self.fields if code == 's'}
+        os.makedirs(self.path, exist_ok=True)
+        self._files = []
+        for name, code in self.fields:
+            f = open(os.path.join(self.path, name + '.npy'), 'wb')
+            f.write(_npy_header(STORAGE[code][1], 0))
+            self._files.append(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, row):
+        """Add one row tuple (values in field order)."""
+        self._pending.append(row)
+        if len(self._pending) >= self.CHUNK_ROWS:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self.append_columns(dict(zip((name for name, _ in self.fields), zip(*pending))))
+
+    def _encode(self, name, code, values):
+        if code == 's':
+            cats = self._categories[name]
+            return array('i', [cats.setdefault(str(v), len(cats)) for v in values])
+        if code == 'q':
+            return array('q', [NULL_INT if v is None or v == '' else int(v) for v in values])
+        if code == 'd':
+            return array('d', [math.nan if v is None or v == '' else float(v) for v in values])
+        return array('B', [1 if v else 0 for v in values])
+
+    def append_columns(self, cols):
+        """Add a batch given as {field: sequence}, all of the same length."""
+        if self._pending:
+            self._flush_pending()
+        n = None
+        for (name, code), f in zip(self.fields, self._files):
+            values = cols[name]
+            n = len(values)
+            if np is not None and isinstance(values, np.ndarray) and code != 's':
+                np.ascontiguousarray(values, dtype=STORAGE[code][1]).tofile(f)
+                continue
+            data = values if isinstance(values, array) and values.typecode == STORAGE[code][0] \
+                else self._encode(name, code, values)
+            if sys.byteorder == 'big':
+                data = array(data.typecode, data)
+                data.byteswap()
+            data.tofile(f)
+        self.rows += n or 0
+
+    def close(self):
+        if self._files is None:
+            return
+        self._flush_pending()
+        columns = []
+        for (name, code), f in zip(self.fields, self._files):
+            f.seek(0)
+            f.write(_npy_header(STORAGE[code][1], self.rows))
+            f.close()
+            col = {'name': name, 'type': code, 'dtype': STORAGE[code][1]}
+            if code == 's':
+                col['categories'] = sorted(self._categories[name], key=self._categories[name].get)
+            elif code in ('q', 'd'):
+                col['null'] = NULL_INT if code == 'q' else 'NaN'
+            columns.append(col)
+        self._files = None
+        schema = {'format': 'cols', 'version': 1, 'rows': self.rows, 'columns': columns, 'meta': self.meta}
+        with open(os.path.join(self.path, SCHEMA_FILE), 'w') as f:
+            json.dump(schema, f, indent=1)
+
+
+def write_table(path, fields, columns, meta=None):
+    """Write a whole table from {field: sequence} in one call."""
+    with ColumnWriter(path, fields, meta) as w:
+        w.append_columns(columns)
+    return w.path
+
+
+def read_schema(path):
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        return json.load(f)
+
+
+def _read_npy(file_path, typecode, rows):
+    with open(file_path, 'rb') as f:
+        if f.read(len(NPY_MAGIC))[:6] != NPY_MAGIC[:6]:
+            raise ValueError(f'{file_path}: not a .npy file')
+        header_len = struct.unpack('<H', f.read(2))[0]
+        header = ast.literal_eval(f.read(header_len).decode())
+        data = array(typecode)
+        data.fromfile(f, header['shape'][0] if rows is None else rows)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+def read_columns(path, names=None, mmap=True):
+    """{name: column} for a .cols table; NumPy arrays (memory-mapped) when available.
+
+    Nulls and category codes are returned as stored; see iter_rows() for
+    decoded values.
+    """
+    schema = read_schema(path)
+    out = {}
+    for col in schema['columns']:
+        if names is not None and col['name'] not in names:
+            continue
+        file_path = os.path.join(path, col['name'] + '.npy')
+        if np is not None:
+            out[col['name']] = np.load(file_path, mmap_mode='r' if mmap else None)
+        else:
+            out[col['name']] = _read_npy(file_path, STORAGE[col['type']][0], schema['rows'])
+    return out
+
+
+def _decoder(col):
+    if col['type'] == 's':
+        cats = col['categories']
+        return lambda v: cats[v]
+    if col['type'] == 'q':
+        return lambda v: '' if v == NULL_INT else v
+    if col['type'] == 'd':
+        return lambda v: '' if v != v else v
+    return bool
+
+
+def iter_rows(path, names=None, chunk_rows=ColumnWriter.CHUNK_ROWS):
+    """Yield decoded row tuples ('' for missing values), one chunk at a time."""
+    schema = read_schema(path)
+    cols = [c for c in schema['columns'] if names is None or c['name'] in names]
+    data = read_columns(path, [c['name'] for c in cols])
+    decoders = [_decoder(c) for c in cols]
+    for lo in range(0, schema['rows'], chunk_rows):
+        hi = min(schema['rows'], lo + chunk_rows)
+        parts = []
+        for col, dec in zip(cols, decoders):
+            part = data[col['name']][lo:hi]
+            part = part.tolist() if hasattr(part, 'tolist') else part
+            parts.append(list(map(dec, part)))
+        yield from zip(*parts)
+
+
+def iter_dicts(path):
+    """Rows as dicts, like csv.DictReader over the CSV export (values not strings)."""
+    names = [c['name'] for c in read_schema(path)['columns']]
+    for values in iter_rows(path):
+        yield dict(zip(names, values))
+
+
+def export_csv(path, csv_path):
+    names = [c['name'] for c in read_schema(path)['columns']]
+    with open(csv_path, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(names)
+        w.writerows(iter_rows(path))
+
+
+def main():
+    p = argparse.ArgumentParser(description='Inspect or export a .cols result table')
+    p.add_argument('table', help='Table directory (results/<name>.cols)')
+    p.add_argument('-o', '--out', help='Write the table as CSV to this path')
+    args = p.parse_args()
+    if not is_table(args.table):
+        p.error(f'{args.table} is not a .cols table')
+    if args.out:
+        export_csv(args.table, args.out)
+        print(f"Wrote {args.out}")
+        return
+    schema = read_schema(args.table)
+    print(f"{args.table}: {schema['rows']} rows")
+    for col in schema['columns']:
+        print(f"  {col['name']:<16} {col['dtype']}" + (f" ({len(col['categories'])} categories)"
+                                                      if 'categories' in col else ''))
+    for key, value in schema['meta'].items():
+        print(f"  meta {key} = {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Fleet load generator: many virtual ESP32 controllers against one UDP backend.
+
+Every virtual device is a comm_instrument.PipelinedSender with its own
+socket, its own SEQ space and its own fixed-interval schedule, started at a
+random phase within the first interval (seeded by --seed and the device
+id). --arrival replaces the fixed interval with an arrivals.py process
+(e.g. poisson:1000), drawn independently per device and shifted by a
+random phase within its first gap; each device then sends the arrivals
+that fall within --duration-s. Devices are split over a process pool;
+each worker runs all of its devices on one asyncio loop and returns
+per-device summaries plus fleet-wide HDR histograms (hdr_histogram.py),
+which the parent merges.
+
+--devices takes a list: the fleet is run once per device count, in order,
+so the table shows throughput and tail latency as the load grows. A step
+is marked saturated when the backend acks less than --sat-ack-ratio of the
+offered rate or the fleet RTT p99 exceeds --sat-p99-factor times the first
+step's p99. The generator itself can saturate first (one event loop per
+worker): check that acked/s tracks offered/s at small counts and give it
+enough --workers on cores the backend does not use.
+
+Run:
+  # terminal 1: backend
+  python scripts/comm_instrument.py --server --port 5005
+  # terminal 2: 100 .. 2000 devices at 1 msg/s each, 30 s per step
+  python scripts/comm_fleet.py --devices 100,500,1000,2000 --interval-ms 1000 --duration-s 30 --workers 8
+
+Outputs:
+- results/comm_fleet.csv          one row per device count (fleet-wide KPIs)
+- results/comm_fleet_devices.csv  one row per (device count, device)
+- results/comm_fleet.hdr.json     fleet RTT / E2E histograms per device count
+"""
+import argparse
+import asyncio
+import csv
+import multiprocessing
+import itertools
+import os
+import random
+
+import arrivals
+import comm_instrument as ci
+import hdr_histogram
+
+OUT_CSV = 'results/comm_fleet.csv'
+DEVICES_CSV = 'results/comm_fleet_devices.csv'
+
+DEVICE_DIGITS = 2  # per-device RTT histograms: thousands of them per worker
+DEVICE_HIGHEST_US = 60 * 1_000_000  # per-device RTTs above a minute are clamped
+
+FLEET_FIELDS = ['devices', 'workers', 'duration_s', 'offered_msg_s', 'acked_msg_s', 'sent', 'success',
+                'timeouts', 'errors', 'loss_pct', 'reordered', 'late', 'rtt_p50_ms', 'rtt_p99_ms',
+                'rtt_p999_ms', 'rtt_max_ms', 'e2e_p50_ms', 'e2e_p99_ms', 'worst_device_p99_ms', 'saturated']
+DEVICE_FIELDS = ['devices', 'device', 'worker', 'sent', 'success', 'timeouts', 'errors', 'reordered', 'late',
+                 'rtt_mean_ms', 'rtt_p50_ms', 'rtt_p99_ms', 'rtt_max_ms']
+
+
+def parse_values(text, cast=int):
+    return [cast(v) for v in text.split(',') if v.strip()]
+
+
+class _Tee:
+    """Record into several histograms at once (per device and fleet-wide)."""
+
+    def __init__(self, *hists):
+        self.hists = hists
+
+    def record(self, value):
+        for h in self.hists:
+            h.record(value)
+
+
+def raise_fd_limit():
+    """Thousands of sockets per worker: lift the soft open-file limit to the hard one."""
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def run_devices(device_ids, opts, fleet):
+    """Run one worker's devices concurrently -> [(device id, sender, rtt histogram)]."""
+    count = max(1, int(opts['duration_s'] * 1000 / opts['interval_ms']))
+    devices = []
+    schedules = {}
+    for dev in device_ids:
+        rtt = hdr_histogram.HdrHistogram(highest=DEVICE_HIGHEST_US, significant_figures=DEVICE_DIGITS)
+        sender = ci.PipelinedSender(opts['target'], opts['port'], f"{opts['type']}{dev}", opts['window'],
+                                    opts['timeout_ms'], lambda row: None,
+                                    (fleet['tx_us'], fleet['e2e_us'], _Tee(fleet['rtt_us'], rtt)),
+                                    progress=False, wire=opts['wire'])
+        rng = random.Random(f"{opts['seed']}:{dev}")
+        if opts['arrival']:
+            # phase within the process's own first gap, applied to the schedule so it ends within --duration-s
+            times = arrivals.schedule(opts['arrival'], seed=f"{opts['seed']}:{dev}")
+            first = list(itertools.islice(times, 2))
+            shift = rng.uniform(0, first[1] - first[0])
+            times = (t + shift for t in itertools.chain(first, times))
+            schedules[dev] = list(itertools.takewhile(lambda t: t < opts['duration_s'], times)) or [0.0]
+            phase_s = 0.0
+        else:
+            phase_s = rng.uniform(0, opts['interval_ms'] / 1000.0)
+        devices.append((dev, sender, rtt, phase_s))
+    await asyncio.gather(*(s.run(len(schedules[dev]) if dev in schedules else count, opts['interval_ms'],
+                                 phase_s=phase, times=iter(schedules[dev]) if dev in schedules else None)
+                           for dev, s, _, phase in devices))
+    return [(dev, sender, rtt) for dev, sender, rtt, _ in devices]
+
+
+def run_worker(job):
+    """Pool worker: one slice of the fleet -> (device rows, {name: encoded fleet histogram})."""
+    worker, device_ids, opts = job
+    raise_fd_limit()
+    fleet = {name: hdr_histogram.HdrHistogram() for name in ('tx_us', 'e2e_us', 'rtt_us')}
+    rows = []
+    for dev, sender, rtt in asyncio.run(run_devices(device_ids, opts, fleet)):
+        s = rtt.summarize((50, 99), scale=0.001)
+        rows.append({'devices': opts['devices'], 'device': dev, 'worker': worker,
+                     'sent': sender.next_flush - 1, 'success': sender.success, 'timeouts': sender.timeouts,
+                     'errors': sender.errors, 'reordered': sender.reordered, 'late': sender.late,
+                     'rtt_mean_ms': round(s['mean'], 3), 'rtt_p50_ms': round(s['p50'], 3),
+                     'rtt_p99_ms': round(s['p99'], 3), 'rtt_max_ms': round(s['max'], 3)})
+    return rows, {name: h.encode() for name, h in fleet.items()}
+
+
+def run_fleet(devices, opts, workers):
+    """Run `devices` virtual devices over `workers` processes -> (device rows, fleet histograms)."""
+    workers = max(1, min(workers, devices))
+    opts = dict(opts, devices=devices)
+    jobs = [(w, list(range(w, devices, workers)), opts) for w in range(workers)]
+    if workers == 1:
+        results = [run_worker(jobs[0])]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(run_worker, jobs)
+    rows = []
+    fleet = {}
+    for worker_rows, encoded in results:
+        rows.extend(worker_rows)
+        for name, blob in encoded.items():
+            h = hdr_histogram.HdrHistogram.decode(blob)
+            if name in fleet:
+                fleet[name].merge(h)
+            else:
+                fleet[name] = h
+    rows.sort(key=lambda r: r['device'])
+    return rows, fleet
+
+
+def fleet_row(devices, workers, opts, rows, fleet):
+    sent = sum(r['sent'] for r in rows)
+    success = sum(r['success'] for r in rows)
+    rtt = fleet['rtt_us'].summarize((50, 99, 99.9), scale=0.001)
+    e2e = fleet['e2e_us'].summarize((50, 99), scale=0.001)
+    return {
+        'devices': devices, 'workers': min(workers, devices), 'duration_s': opts['duration_s'],
+        'offered_msg_s': round(sent / opts['duration_s'] if opts['arrival']
+                               else devices * 1000.0 / opts['interval_ms'], 1),
+        'acked_msg_s': round(success / opts['duration_s'], 1),
+        'sent': sent, 'success': success,
+        'timeouts': sum(r['timeouts'] for r in rows), 'errors': sum(r['errors'] for r in rows),
+        'loss_pct': round((sent - success) * 100.0 / sent, 2) if sent else 0.0,
+        'reordered': sum(r['reordered'] for r in rows), 'late': sum(r['late'] for r in rows),
+        'rtt_p50_ms': round(rtt['p50'], 3), 'rtt_p99_ms': round(rtt['p99'], 3),
+        'rtt_p999_ms': round(rtt['p99.9'], 3), 'rtt_max_ms': round(rtt['max'], 3),
+        'e2e_p50_ms': round(e2e['p50'], 3), 'e2e_p99_ms': round(e2e['p99'], 3),
+        'worst_device_p99_ms': max((r['rtt_p99_ms'] for r in rows), default=0.0),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description='Multi-device UDP load generator (fleet of virtual controllers)')
+    p.add_argument('--target', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=5005)
+    p.add_argument('--devices', type=parse_values, default=[10, 100, 500],
+                   help='Comma-separated device counts, run in order (default: 10,100,500)')
+    p.add_argument('--interval-ms', type=float, default=1000, help='Per-device message interval (default: 1000)')
+    p.add_argument('--duration-s', type=float, default=10, help='Send duration per step (default: 10)')
+    p.add_argument('--arrival', metavar='SPEC',
+                   help='Per-device arrival process instead of --interval-ms (arrivals.py spec, e.g. poisson:1000)')
+    p.add_argument('--window', type=int, default=4, help='Messages in flight per device (default: 4)')
+    p.add_argument('--timeout-ms', type=int, default=500, help='Per-message ack timeout (default: 500)')
+    p.add_argument('--wire', choices=['text', 'binary'], default='text', help='Packet format (default: text)')
+    p.add_argument('--type', default='dev', help='Message type prefix; device d sends TYPE=<prefix><d>')
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    p.add_argument('--seed', type=int, default=1, help='Seed for the device start phases')
+    p.add_argument('--sat-ack-ratio', type=float, default=0.99,
+                   help='Saturated when acked/offered rate falls below this (default: 0.99)')
+    p.add_argument('--sat-p99-factor', type=float, default=5.0,
+                   help="Saturated when RTT p99 exceeds this times the first step's (default: 5)")
+    p.add_argument('-o', '--out', default=OUT_CSV)
+    p.add_argument('--devices-out', default=DEVICES_CSV)
+    args = p.parse_args()
+    if args.arrival:
+        try:
+            arrivals.arrival_times(args.arrival)
+        except (OSError, ValueError) as e:
+            p.error(str(e))
+
+    opts = {'target': args.target, 'port': args.port, 'interval_ms': args.interval_ms,
+            'duration_s': args.duration_s, 'window': args.window, 'timeout_ms': args.timeout_ms,
+            'type': args.type, 'seed': args.seed, 'wire': args.wire, 'arrival': args.arrival}
+    steps = []
+    device_rows = []
+    hists = {}
+    saturation = None
+    print(f"{'devices':>8} {'offered/s':>10} {'acked/s':>10} {'loss%':>7} {'p50_ms':>8} {'p99_ms':>8} "
+          f"{'p99.9_ms':>9} {'max_ms':>8} {'worst_dev_p99':>13}")
+    for devices in args.devices:
+        rows, fleet = run_fleet(devices, opts, args.workers)
+        step = fleet_row(devices, args.workers, opts, rows, fleet)
+        base_p99 = steps[0]['rtt_p99_ms'] if steps else step['rtt_p99_ms']
+        step['saturated'] = int(step['acked_msg_s'] < args.sat_ack_ratio * step['offered_msg_s']
+                                or step['rtt_p99_ms'] > args.sat_p99_factor * base_p99)
+        if step['saturated'] and saturation is None:
+            saturation = step
+        steps.append(step)
+        device_rows.extend(rows)
+        for name, h in fleet.items():
+            hists[f'n{devices}.{name}'] = h
+        print(f"{devices:>8} {step['offered_msg_s']:>10.1f} {step['acked_msg_s']:>10.1f} {step['loss_pct']:>7.2f} "
+              f"{step['rtt_p50_ms']:>8.3f} {step['rtt_p99_ms']:>8.3f} {step['rtt_p999_ms']:>9.3f} "
+              f"{step['rtt_max_ms']:>8.3f} {step['worst_device_p99_ms']:>13.3f}" + ('  SATURATED' if step['saturated'] else ''))
+
+    for path, fields, rows in ((args.out, FLEET_FIELDS, steps), (args.devices_out, DEVICE_FIELDS, device_rows)):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', newline='') as f:
+            w = csv.DictWriter(f, fieldnames=fields)
+            w.writeheader()
+            w.writerows(rows)
+    hdr_path = hdr_histogram.save(hists, args.out, meta=dict(opts, devices=args.devices))
+
+    if saturation is not None:
+        print(f"\nSaturation: first reached at {saturation['devices']} devices "
+              f"({saturation['offered_msg_s']:.0f} msg/s offered, {saturation['acked_msg_s']:.0f} acked)")
+    else:
+        print(f"\nNo saturation up to {args.devices[-1]} devices")
+    print(f"Wrote {args.out}, {args.devices_out}, {hdr_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -12,12 +12,84 @@ Timestamping points:
   T6 (ack_recv_us): Client ACK receive timestamp
   RTT: Round-trip time (tx_start -> ack_recv)
 
+The default sender is stop-and-wait: one datagram, block on its echo for up
+to --timeout-ms, then sleep --interval-ms. With --window N > 1 an asyncio
+sender (PipelinedSender) keeps up to N messages in flight instead: messages
+are created on a fixed --interval-ms schedule (T1), wait for a window slot
+(T2 -> T3 is the queueing delay under backpressure), echoes are matched by
+SEQ=, and every message times out on its own. Acks for an older sequence
+than one already acked are flagged `reordered`; an echo that arrives after
+its message timed out (within one more timeout) is kept as `late_ack_us`,
+the message still counting as lost.
+
+The echo server (--server) is non-blocking: a selectors loop drains each
+socket in batches and keeps bad-case delayed echoes on a heap, so one
+delayed packet does not hold back the others. The injected delay models
+the uplink: srv_recv_us (T5) is stamped at the time the impaired packet
+is due, i.e. when it would reach the far end of the emulated link, so the
+delay shows in E2E (T1 -> T5) and UPLINK as well as in RTT, like the
+baseline's sleep-then-stamp server did. Each echo also reports the
+receive -> due split (srv_delay_us) and the server's own due -> send time
+(srv_proc_us); the server writes its processing-time
+histogram to results/comm_server.hdr.json on exit. Beyond --badcase's
+constant delay and independent drops, the server emulates a lossy uplink
+(impairment.py): Gilbert-Elliott burst loss, delay distributions or a
+replayed delay trace, reordering, duplication and a token-bucket rate
+limit, alone or from a profile (--impair wifi|congested). The
+stop-and-wait sender matches echoes by SEQ, so duplicated or
+late echoes of earlier messages are discarded rather than taken as acks.
+
+Client and server clocks are not assumed to agree: an NTP-style exchange
+(--sync-probes TYPE=sync echoes) and then every data echo feed
+clock_offset.OffsetEstimator (min-RTT filtered, drift-fitted). Each acked
+row records the server-minus-client offset_us at its T3 and the bound
+offset_err_us; e2e histograms and final_comm_report.py use them for
+one-way uplink/downlink latency, so a remote gateway can be measured.
+
+--classes runs producer/consumer mode (QueuedSender): one producer per
+message class on its own fixed schedule feeds a bounded priority queue
+(send_queue.py) that a single consumer drains into --window messages in
+flight. T2 is the real queue insertion, so T2 -> T3 is queueing delay;
+queue size, priority on/off, backpressure (drop_oldest, drop_newest,
+block), retry_count and timeout_ms come from --queue-config's
+"communication" block or the flags. Each class is logged as its own
+comm_<class>_log, with `attempts` and `queue_drop` columns, and gets a
+<class>.queue_us histogram.
+
+--arrival replaces the fixed --interval-ms schedule with an arrival
+process (arrivals.py): periodic with release jitter, Poisson, on/off,
+MMPP, or gaps replayed from a CSV. With --classes, CLASS=SPEC sets one
+class's process. Every sender follows an absolute schedule (sleep until
+start + t), so a slow ack or late wake-up never shifts later sends.
+
+--transport http benchmarks the firmware's Supabase uplink instead
+(http_uplink.py): --server runs a local PostgREST stand-in that charges
+an emulated RTT, link rate, TCP/TLS handshake and insert latency, and the
+client uploads --count telemetry rows once per --http-strategies entry
+(per-request connections as NetworkTask does today, keep-alive pooling,
+return=minimal, batch inserts, gzip), writing rows/s and row/request
+latency per strategy to results/comm_http.csv (+ .hdr.json).
+
+--wire binary replaces the text payload with the fixed PACKET header:
+no formatting or parsing between tx_start and ack_recv, the server stamps
+into its receive buffer with pack_into() and the client decodes with
+unpack_from() on a memoryview. The server answers both formats, and the
+log has the same columns either way (the wire format is in the meta).
+
 Run examples:
   # start clean server
   python scripts/comm_instrument.py --server --port 5005
   
   # start bad-case server (50ms delay, 20% drop)
   python scripts/comm_instrument.py --server --port 5005 --badcase --delay-ms 50 --drop-prob 0.2
+
+  # server on two ports, 4 worker processes sharing them (SO_REUSEPORT)
+  python scripts/comm_instrument.py --server --ports 5005,5006 --server-workers 4
+
+  # Wi-Fi-like server: burst loss, lognormal delay, reordering; or tune each stage
+  python scripts/comm_instrument.py --server --port 5005 --impair wifi
+  python scripts/comm_instrument.py --server --port 5005 --loss-ge 0.02,0.25 --delay-dist pareto:5:1.8 \\
+      --reorder-prob 0.02 --dup-prob 0.005 --rate-kbps 256 --rate-queue-ms 200
   
   # run baseline sender (30 messages, 5ms interval)
   python scripts/comm_instrument.py --target 127.0.0.1 --port 5005 --type baseline --count 30 --interval-ms 5
@@ -25,71 +97,698 @@ Run examples:
   # run control sender with burst (50 messages, 10ms interval, burst at msg 20-30)
   python scripts/comm_instrument.py --target 127.0.0.1 --port 5005 --type control --count 50 --interval-ms 10 --burst
 
-Outputs: results/comm_<type>_log.csv
+  # pipelined telemetry at 1 kHz with up to 32 messages in flight
+  python scripts/comm_instrument.py --type telemetry --count 10000 --interval-ms 1 --window 32
+
+  # HTTP uplink: stand-in server, then compare the upload strategies
+  python scripts/comm_instrument.py --server --transport http --port 8080 --http-rtt-ms 30
+  python scripts/comm_instrument.py --transport http --port 8080 --count 500 --interval-ms 0 --http-pool 2
+
+  # control every 50 ms vs a 1 kHz telemetry flood through improved.json's priority queue
+  python scripts/comm_instrument.py --queue-config configs/improved.json --window 4 \\
+      --classes control:50:200,telemetry:1:10000
+
+  # jittered control vs bursty (two-state MMPP) telemetry
+  python scripts/comm_instrument.py --window 4 --classes control:50:200,telemetry:10:2000 \
+      --arrival control=periodic:50:5 --arrival telemetry=mmpp:2:200:50:2000 --arrival-seed 1
+
+Outputs: results/comm_<type>_log.csv and/or results/comm_<type>_log.cols (--format),
+plus the sender's clock calibration (clock_calibration.py) in the .cols meta
+and in results/comm_<type>_log.calib.json, and HDR histograms (hdr_histogram.py)
+of <type>.tx_us, <type>.e2e_us and <type>.rtt_us in results/comm_<type>_log.hdr.json.
+--format none keeps only the histograms, for long soak runs.
 """
 import socket
 import time
 import argparse
+import asyncio
+import heapq
+import json
+import multiprocessing
 import os
 import csv
-import random
+import re
+import selectors
+import signal
+import struct
 import sys
 
+import arrivals
+import clock_calibration
+import clock_offset
+import columnar
+import hdr_histogram
+import http_uplink
+import impairment
+import send_queue
+
 OUT_DIR = 'results'
 
+# Per-message log columns (also the .cols table schema; '' = missing)
+LOG_FIELDS = [('seq', 'q'), ('t1_us', 'q'), ('enqueue_us', 'q'), ('tx_start_us', 'q'), ('tx_end_us', 'q'),
+              ('srv_recv_us', 'q'), ('ack_recv_us', 'q'), ('rtt_us', 'q'), ('reordered', 'q'), ('late_ack_us', 'q'),
+              ('srv_proc_us', 'q'), ('srv_delay_us', 'q'), ('offset_us', 'q'), ('offset_err_us', 'q'),
+              ('attempts', 'q'), ('queue_drop', 'q')]
+# Row indices used by the senders
+SRV_RECV, ACK_RECV, RTT, REORDERED, LATE_ACK, SRV_PROC, SRV_DELAY, OFFSET, OFFSET_ERR, ATTEMPTS, QUEUE_DROP = \
+    range(5, 16)
+
+SYNC_PROBES = 32       # initial clock-offset exchange (--sync-probes)
+SYNC_SPACING_MS = 5
+
+SERVER_BATCH = 64  # datagrams drained per socket per wake-up
+SERVER_STOP_GRACE_S = 5.0  # workers' own shutdown (summary + histogram save) before terminate()
+
+SEQ_RE = re.compile(rb'SEQ=(\d+)')
+
+# Binary wire format (--wire binary): one fixed little-endian header, no text.
+#   magic 'WP' + version, pad, type (16 bytes, NUL padded), seq u32,
+#   t1_us, enqueue_us, tx_start_us (T1-T3, client),
+#   srv_recv_us, srv_proc_us, srv_delay_us (T5 = due time, server time, injected delay)
+# The client stamps tx_start into its preallocated buffer just before the
+# send; the server writes its three fields in place with pack_into(). T4 is
+# taken after the send returns, so it only exists in the client's log.
+PACKET = struct.Struct('<3sx16sIqqqqqq')
+WIRE_MAGIC = b'WP\x01'
+TX_START = struct.Struct('<q')
+TX_START_OFFSET = struct.calcsize('<3sx16sIqq')
+SERVER_STAMPS = struct.Struct('<qqq')
+SERVER_STAMPS_OFFSET = TX_START_OFFSET + TX_START.size
+
 now_us = lambda: int(time.time()*1_000_000)
 now_ms = lambda: int(time.time()*1000)
 
 
-def run_server(port, badcase=False, delay_ms=0, drop_prob=0.0):
-    """
-    UDP echo server that timestamps incoming packets and echoes them back.
-    Supports bad-case mode with configurable delay and packet drop.
-    """
+def open_server_socket(port, reuseport=False):
+    """Non-blocking UDP socket bound to port; SO_REUSEPORT lets worker processes share it."""
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuseport:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4*1024*1024)
     s.bind(('0.0.0.0', port))
-    
-    mode = 'BADCASE' if badcase else 'CLEAN'
-    print(f'[SERVER] UDP echo server running on port {port}')
-    print(f'[SERVER] Mode: {mode} | Delay: {delay_ms}ms | Drop: {drop_prob*100:.0f}%')
-    
+    s.setblocking(False)
+    return s
+
+
+def _stop_on_sigterm():
+    def handler(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handler)
+
+
+def serve(ports, impair=None, batch=SERVER_BATCH, worker=None):
+    """
+    UDP echo server loop (one process): selectors, no blocking sleeps.
+
+    Each readable socket is drained up to `batch` datagrams per wake-up.
+    The impairment pipeline (impairment.Impairment: loss, rate limit,
+    delay, reordering, duplication) turns each datagram into due times for
+    its echoes, which go on a heap instead of sleeping, so a delayed echo
+    never holds back the packets behind it. Echoes carry
+    |DLY|<injected delay us>|PROC|<server time us>|SRV|<srv_recv_us>, where
+    SRV (T5) is the due time, receive + DLY: the impairment is the uplink,
+    so the packet "arrives" when its delay has passed. PROC is T5 -> send
+    (server cost plus timer lateness; the selector waits in whole
+    milliseconds, so a delayed echo can be up to ~1 ms late).
+    """
+    _stop_on_sigterm()
+    sel = selectors.DefaultSelector()
+    for port in ports:
+        sel.register(open_server_socket(port, reuseport=worker is not None), selectors.EVENT_READ)
+    tag = f'[SERVER{"" if worker is None else f" {worker}"}]'
+    impair = impair or impairment.Impairment()
+    if worker is not None:
+        impair.reseed(worker)
+    clean = impair.passthrough()
+    proc_hist = hdr_histogram.HdrHistogram()
+    delayed = []  # (due_us, n, sock, data, addr, srv_recv_us)
+    n = 0
+    buf = bytearray(65535)  # datagrams are received into, and binary ones echoed from, this buffer
+    view = memoryview(buf)
+
+    mode = 'CLEAN' if clean else 'BADCASE'
+    print(f'{tag} UDP echo server running on port(s) {",".join(map(str, ports))}')
+    print(f'{tag} Mode: {mode} | Impairment: {impair.describe()} | Batch: {batch}')
+
     msg_count = 0
-    dropped = 0
-    
+
+    def echo(sock, data, addr, srv_recv, injected_us):
+        t5 = srv_recv + injected_us  # end of the emulated uplink
+        proc_us = now_us() - t5
+        proc_hist.record(proc_us)
+        if is_binary(data):
+            SERVER_STAMPS.pack_into(data, SERVER_STAMPS_OFFSET, t5, proc_us, injected_us)
+            resp = data
+        else:
+            resp = bytes(data) + f'|DLY|{injected_us}|PROC|{proc_us}|SRV|{t5}'.encode()
+        try:
+            sock.sendto(resp, addr)
+        except OSError as e:
+            print(f'{tag} Send error: {e}')
+
     try:
         while True:
-            data, addr = s.recvfrom(65535)
-            msg_count += 1
-            
-            # simulate bad-case: random drop
-            if badcase and (drop_prob > 0.0) and (random.random() < drop_prob):
-                dropped += 1
-                if msg_count % 10 == 0:
-                    print(f'[SERVER] Received {msg_count} | Dropped {dropped}', end='\r')
+            timeout = max(0.0, (delayed[0][0] - now_us()) / 1e6) if delayed else None
+            for key, _ in sel.select(timeout):
+                sock = key.fileobj
+                for _ in range(batch):
+                    try:
+                        size, addr = sock.recvfrom_into(buf)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    srv_recv = now_us()
+                    msg_count += 1
+                    data = view[:size]
+
+                    if clean:
+                        echo(sock, data, addr, srv_recv, 0)
+                    else:
+                        dues = impair.schedule(srv_recv, size)
+                        if dues == [srv_recv]:
+                            echo(sock, data, addr, srv_recv, 0)
+                        elif dues:
+                            copy = bytearray(data)
+                            for due in dues:
+                                heapq.heappush(delayed, (due, n, sock, copy, addr, srv_recv))
+                                n += 1
+
+                    if msg_count % 1000 == 0:
+                        print(f'{tag} Received {msg_count} | Dropped {impair.counts["lost"]} '
+                              f'| Delayed {len(delayed)}', end='\r')
+
+            now = now_us()
+            while delayed and delayed[0][0] <= now:
+                due, _, sock, data, addr, srv_recv = heapq.heappop(delayed)
+                echo(sock, data, addr, srv_recv, due - srv_recv)
+
+    except KeyboardInterrupt:
+        # a second signal (Ctrl+C reaches the workers, then the parent's terminate()) must not cut the save
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        s = proc_hist.summarize((50, 99))
+        c = impair.counts
+        print(f'\n{tag} Stopped. Total received: {msg_count}, Dropped: {c["lost"]}, '
+              f'Rate-dropped: {c["rate_dropped"]}, Reordered: {c["reordered"]}, '
+              f'Duplicated: {c["duplicated"]}, Pending delayed: {len(delayed)}')
+        print(f'{tag} Processing (due -> send, excl. injected delay): p50={s["p50"]}us p99={s["p99"]}us '
+              f'max={s["max"]}us over {s["count"]} echoes')
+        name = 'comm_server' if worker is None else f'comm_server_w{worker}'
+        hdr_histogram.save({'proc_us': proc_hist},
+                           os.path.join(OUT_DIR, name + hdr_histogram.SUFFIX),
+                           meta={'ports': ports, 'impairment': impair.config, 'counts': impair.counts})
+
+
+def run_server(ports, impair=None, batch=SERVER_BATCH, workers=1):
+    """
+    UDP echo server on one or more ports; workers > 1 runs that many
+    processes sharing the ports through SO_REUSEPORT (the kernel spreads
+    senders across them).
+    """
+    if workers <= 1:
+        serve(ports, impair, batch)
+        return
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        sys.exit('[SERVER] --server-workers > 1 needs SO_REUSEPORT (Linux/BSD)')
+    procs = [multiprocessing.Process(target=serve, args=(ports, impair, batch, w))
+             for w in range(workers)]
+    for proc in procs:
+        proc.start()
+    _stop_on_sigterm()
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        # Ctrl+C also reached the workers: let them print and save before stopping the rest
+        deadline = time.monotonic() + SERVER_STOP_GRACE_S
+        for proc in procs:
+            proc.join(max(0.0, deadline - time.monotonic()))
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in procs:
+            proc.join()
+
+
+def is_binary(data):
+    return len(data) == PACKET.size and data[:3] == WIRE_MAGIC
+
+
+def encode_packet(buf, mtype_bytes, seq, t1, enqueue):
+    """Fill the binary header in buf (tx_start and the server fields left 0)."""
+    PACKET.pack_into(buf, 0, WIRE_MAGIC, mtype_bytes, seq, t1, enqueue, 0, 0, 0, 0)
+
+
+def decode_echo(data):
+    """(seq, srv_recv_us, srv_proc_us, srv_delay_us) from a binary or text echo; '' / None when absent."""
+    if is_binary(data):
+        _, _, seq, _, _, _, srv_recv, srv_proc, srv_delay = PACKET.unpack_from(data)
+        return seq, srv_recv, srv_proc, srv_delay
+    data = bytes(data)
+    m = SEQ_RE.search(data)
+    return (int(m.group(1)) if m else None, *parse_echo(data))
+
+
+def parse_echo(data):
+    """(srv_recv_us, srv_proc_us, srv_delay_us) appended by the echo server; '' when absent."""
+    parts = data.split(b'|')
+    fields = dict(zip(parts[1::2], parts[2::2]))
+    out = []
+    for tag in (b'SRV', b'PROC', b'DLY'):
+        try:
+            out.append(int(fields[tag]))
+        except (KeyError, ValueError):
+            out.append('')
+    return out
+
+
+def add_offset_sample(estimator, row):
+    """Feed an acked row to the offset estimator and store the estimate at its T3; returns the offset."""
+    srv_recv = row[SRV_RECV]
+    if srv_recv == '':
+        return None
+    # the clocks are compared at the physical receive (T5 - injected delay): the
+    # emulated uplink delay is known exactly and would only bias theta by half of it
+    srv_send = srv_recv + (row[SRV_PROC] or 0)
+    estimator.add(row[3], srv_recv - (row[SRV_DELAY] or 0), srv_send, row[ACK_RECV])
+    offset, err = estimator.estimate(row[3])
+    row[OFFSET], row[OFFSET_ERR] = round(offset), round(err)
+    return offset
+
+
+def sync_clock(target, port, estimator, probes=SYNC_PROBES, timeout_ms=100, wire='text'):
+    """Initial NTP-style exchange: `probes` TYPE=sync echoes, SYNC_SPACING_MS apart, feed the estimator."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.settimeout(timeout_ms / 1000.0)
+    packet = bytearray(PACKET.size)
+    rbuf = bytearray(65535)
+    rview = memoryview(rbuf)
+    try:
+        for seq in range(1, probes + 1):
+            if wire == 'binary':
+                encode_packet(packet, b'sync', seq, now_us(), 0)
+                payload = packet
+            else:
+                payload = f"TYPE=sync;SEQ={seq}".encode()
+            t3 = now_us()
+            if wire == 'binary':
+                TX_START.pack_into(packet, TX_START_OFFSET, t3)
+            try:
+                s.sendto(payload, (target, port))
+                size, _ = s.recvfrom_into(rbuf)
+            except OSError:  # includes socket.timeout
                 continue
-            
-            # optional processing delay (simulate server load)
-            if badcase and delay_ms > 0:
-                time.sleep(delay_ms/1000.0)
-            
-            # add server receive timestamp and send it back
-            srv_recv = now_us()
-            resp = data + b'|SRV|' + str(srv_recv).encode()
-            
+            t6 = now_us()
+            rseq, srv_recv, srv_proc, srv_delay = decode_echo(rview[:size])
+            if rseq == seq and srv_recv != '':
+                estimator.add(t3, srv_recv - (srv_delay or 0), srv_recv + (srv_proc or 0), t6)
+            time.sleep(SYNC_SPACING_MS / 1000.0)
+    finally:
+        s.close()
+
+
+class _AckProtocol(asyncio.DatagramProtocol):
+    def __init__(self, sender):
+        self.sender = sender
+
+    def datagram_received(self, data, addr):
+        self.sender.on_ack(data, now_us())
+
+    def error_received(self, exc):
+        # e.g. ICMP port unreachable; not tied to a sequence, the message times out
+        self.sender.icmp_errors += 1
+
+
+class PipelinedSender:
+    """Asyncio UDP sender with up to `window` messages awaiting their echo.
+
+    Rows are handed to log_row in sequence order once final: on ack, or one
+    timeout after the message timed out (so a late echo can still be noted).
+    """
+
+    def __init__(self, target, port, mtype, window, timeout_ms, log_row, hists, progress=True, wire='text',
+                 offset_estimator=None):
+        self.target = target
+        self.port = port
+        self.mtype = mtype
+        self.wire = wire
+        self.offset = offset_estimator if offset_estimator is not None else clock_offset.OffsetEstimator()
+        self.window = window
+        self.timeout_s = timeout_ms / 1000.0
+        self.log_row = log_row
+        self.progress = progress
+        self.tx_hist, self.e2e_hist, self.rtt_hist = hists
+        self.pending = {}   # seq -> row, awaiting its echo
+        self.expired = {}   # seq -> row, timed out, still accepting a late echo
+        self.timers = {}
+        self.done = {}      # seq -> final row, waiting for earlier sequences
+        self.next_flush = 1
+        self.highest_acked = 0
+        self.success = self.timeouts = self.errors = 0
+        self.reordered = self.late = self.stale = self.icmp_errors = 0
+        self.max_in_flight = 0
+
+    def on_ack(self, data, ack_recv):
+        seq, srv_recv, srv_proc, srv_delay = decode_echo(memoryview(data))
+        row = self.pending.pop(seq, None)
+        if row is None:
+            late = self.expired.get(seq)
+            if late is not None and late[LATE_ACK] == '':
+                late[LATE_ACK] = ack_recv
+                self.late += 1
+            else:
+                self.stale += 1  # duplicate, unknown or too late to log
+            return
+        self.timers.pop(seq).cancel()
+        row[SRV_RECV], row[SRV_PROC], row[SRV_DELAY] = srv_recv, srv_proc, srv_delay
+        row[ACK_RECV] = ack_recv
+        row[RTT] = ack_recv - row[3]
+        if seq < self.highest_acked:
+            row[REORDERED] = 1
+            self.reordered += 1
+        else:
+            self.highest_acked = seq
+        self.success += 1
+        self.rtt_hist.record(row[RTT])
+        offset = add_offset_sample(self.offset, row)
+        if offset is not None:
+            self.e2e_hist.record(row[SRV_RECV] - offset - row[1])
+        self.slots.release()
+        self._finish(seq, row)
+
+    def _expire(self, seq):
+        row = self.pending.pop(seq)
+        del self.timers[seq]
+        self.timeouts += 1
+        self.expired[seq] = row
+        self.slots.release()
+        asyncio.get_running_loop().call_later(self.timeout_s, self._finish_expired, seq)
+
+    def _finish_expired(self, seq):
+        self._finish(seq, self.expired.pop(seq))
+
+    def _finish(self, seq, row):
+        self.done[seq] = row
+        while self.next_flush in self.done:
+            self.log_row(self.done.pop(self.next_flush))
+            self.next_flush += 1
+        if self.all_sent and not self.pending and not self.expired:
+            self.drained.set()
+
+    async def run(self, count, interval_ms, burst=False, phase_s=0.0, times=None):
+        """Send count messages, the first after phase_s; returns once every message is final.
+
+        times: send times in seconds from the start (arrivals.py); default the
+        fixed interval_ms schedule with the legacy burst.
+        """
+        loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(self.window)
+        self.drained = asyncio.Event()
+        self.all_sent = False
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _AckProtocol(self), remote_addr=(self.target, self.port))
+        sock = transport.get_extra_info('socket')
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4*1024*1024)
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, 0xB8)  # DSCP EF
+        except Exception:
+            pass
+
+        if phase_s > 0:
+            await asyncio.sleep(phase_s)
+        if times is None:
+            times = arrivals.schedule(None, interval_ms, burst)
+        binary = self.wire == 'binary'
+        mtype_bytes = self.mtype.encode()[:16]
+        packet = bytearray(PACKET.size)
+        start = loop.time()
+        try:
+            for i in range(count):
+                seq = i + 1
+                # absolute schedule: a stall is not stretched into the later sends
+                await asyncio.sleep(max(0.0, start + next(times) - loop.time()))
+                if not binary:
+                    payload = f"TYPE={self.mtype};SEQ={seq};TS={now_us()}".encode()
+                t1 = now_us()
+                enqueue = now_us()
+                if binary:
+                    encode_packet(packet, mtype_bytes, seq, t1, enqueue)
+                    payload = packet  # the transport copies it if the send has to be queued
+                await self.slots.acquire()
+                tx_start = now_us()
+                if binary:
+                    TX_START.pack_into(packet, TX_START_OFFSET, tx_start)
+                try:
+                    transport.sendto(payload)
+                except OSError as e:
+                    self.errors += 1
+                    print(f'\n[CLIENT] Send error seq={seq}: {e}')
+                    self.slots.release()
+                    self._finish(seq, [seq, t1, enqueue, tx_start, '', '', '', '', '', '', '', '', '', '', 1, ''])
+                    continue
+                tx_end = now_us()
+                self.tx_hist.record(tx_end - tx_start)
+                self.pending[seq] = [seq, t1, enqueue, tx_start, tx_end, '', '', '', 0, '', '', '', '', '', 1, '']
+                self.timers[seq] = loop.call_later(self.timeout_s, self._expire, seq)
+                self.max_in_flight = max(self.max_in_flight, len(self.pending))
+
+                if self.progress and (seq % 10 == 0 or seq == count):
+                    print(f'[CLIENT] Sent {seq}/{count} | In flight: {len(self.pending)} | Success: {self.success} '
+                          f'| Timeout: {self.timeouts} | Error: {self.errors} '
+                          f'| Elapsed: {(loop.time() - start) * 1000:.0f}ms', end='\r')
+
+            self.all_sent = True
+            if self.pending or self.expired:
+                await self.drained.wait()
+        finally:
+            transport.close()
+
+
+class QueuedSender:
+    """Producer/consumer sender: one producer per message class feeds a bounded
+    send_queue.PrioritySendQueue, one consumer drains it into up to `window`
+    messages in flight.
+
+    T2 (enqueue_us) is when the message entered the queue and T3 when the
+    consumer took it out, so T2 -> T3 is the real queueing delay. A message
+    that times out is put back at the front of its level until it has been
+    sent retry_count + 1 times; tx_start_us and rtt_us refer to the last
+    attempt, and only first-attempt echoes feed the clock-offset estimator
+    (Karn: a retried echo cannot be matched to its send). Messages dropped by
+    backpressure are logged with queue_drop = 1 and no send times.
+    """
+
+    def __init__(self, target, port, classes, queue_size, backpressure, window, timeout_ms, retry_count, logs,
+                 priority=True, wire='text', offset_estimator=None, dscp=True, arrival_specs=None, arrival_seed=None):
+        self.target = target
+        self.port = port
+        self.classes = classes  # [(name, interval_ms, count)], most important first
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+        self.queue = None       # created in run(), on the event loop
+        self.window = window
+        self.timeout_s = timeout_ms / 1000.0
+        self.retry_count = retry_count
+        self.logs = logs        # name -> MessageLog
+        self.priority = priority
+        self.wire = wire
+        self.dscp = dscp
+        self.arrivals = arrival_specs or {}  # class name -> arrivals.py spec (default: periodic interval_ms)
+        self.arrival_seed = arrival_seed
+        self.offset = offset_estimator if offset_estimator is not None else clock_offset.OffsetEstimator()
+        self.total = sum(count for _, _, count in classes)
+        self.pending = {}   # seq -> (class index, row), awaiting its echo
+        self.retrying = {}  # seq -> (class index, row), back in the queue for another attempt
+        self.timers = {}
+        self.next_seq = 1
+        self.finished = 0
+        self.stats = {name: dict.fromkeys(('sent', 'success', 'timeouts', 'dropped', 'retries', 'errors'), 0)
+                      for name, _, _ in classes}
+        self.stale = self.icmp_errors = 0
+        self.max_in_flight = 0
+
+    def _finish(self, index, row):
+        self.logs[self.classes[index][0]].row(row)
+        self.finished += 1
+        if self.finished == self.total:
+            self.drained.set()
+
+    def _dropped(self, victim):
+        """Log a message evicted (or refused) by the queue's backpressure."""
+        if victim is None or victim[1][ACK_RECV] != '':  # none, or acked while waiting for a retry
+            return
+        index, row = victim
+        self.retrying.pop(row[0], None)
+        row[QUEUE_DROP] = 1
+        self.stats[self.classes[index][0]]['dropped'] += 1
+        self._finish(index, row)
+
+    def on_ack(self, data, ack_recv):
+        seq, srv_recv, srv_proc, srv_delay = decode_echo(memoryview(data))
+        entry = self.pending.pop(seq, None)
+        if entry is not None:
+            self.timers.pop(seq).cancel()
+            self.slots.release()
+        else:
+            entry = self.retrying.pop(seq, None)  # an earlier attempt's echo while the retry waits
+            if entry is None:
+                self.stale += 1  # duplicate, or after the last attempt timed out
+                return
+        index, row = entry
+        log = self.logs[self.classes[index][0]]
+        row[SRV_RECV], row[SRV_PROC], row[SRV_DELAY] = srv_recv, srv_proc, srv_delay
+        row[ACK_RECV] = ack_recv
+        row[RTT] = ack_recv - row[3]
+        self.stats[self.classes[index][0]]['success'] += 1
+        name = self.classes[index][0]
+        log.hists[f'{name}.rtt_us'].record(row[RTT])
+        if row[ATTEMPTS] == 1:
+            offset = add_offset_sample(self.offset, row)
+        else:
+            offset, err = self.offset.estimate(row[3])
+            if offset is not None:
+                row[OFFSET], row[OFFSET_ERR] = round(offset), round(err)
+        if offset is not None and srv_recv != '':
+            log.hists[f'{name}.e2e_us'].record(srv_recv - offset - row[1])
+        self._finish(index, row)
+
+    def _expire(self, seq):
+        index, row = self.pending.pop(seq)
+        del self.timers[seq]
+        self.slots.release()
+        stats = self.stats[self.classes[index][0]]
+        if row[ATTEMPTS] <= self.retry_count:
+            stats['retries'] += 1
+            self.retrying[seq] = (index, row)
+            self._dropped(self.queue.requeue((index, row), index if self.priority else 0))
+        else:
+            stats['timeouts'] += 1
+            self._finish(index, row)
+
+    async def produce(self, index, name, interval_ms, count):
+        """One class's producer: messages on its arrival schedule (absolute times) into the queue."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        times = arrivals.schedule(self.arrivals.get(name), interval_ms, seed=f'{self.arrival_seed}:{name}')
+        level = index if self.priority else 0
+        for _ in range(count):
+            await asyncio.sleep(max(0.0, start + next(times) - loop.time()))
+            seq = self.next_seq
+            self.next_seq += 1
+            row = [seq, now_us(), '', '', '', '', '', '', 0, '', '', '', '', '', 0, '']
+            self._dropped(await self.queue.put((index, row), level))
+            if row[QUEUE_DROP] != 1:
+                row[2] = now_us()  # T2: in the queue
+
+    async def consume(self, transport):
+        loop = asyncio.get_running_loop()
+        binary = self.wire == 'binary'
+        names = [name.encode()[:16] for name, _, _ in self.classes]
+        packet = bytearray(PACKET.size)
+        while True:
+            await self.slots.acquire()
+            index, row = await self.queue.get()
+            seq = row[0]
+            if row[ACK_RECV] != '':  # acked while waiting for its retry
+                self.slots.release()
+                continue
+            self.retrying.pop(seq, None)
+            if binary:
+                encode_packet(packet, names[index], seq, row[1], row[2])
+                payload = packet
+            else:
+                payload = f"TYPE={self.classes[index][0]};SEQ={seq};TS={now_us()}".encode()
+            row[ATTEMPTS] += 1
+            stats = self.stats[self.classes[index][0]]
+            stats['sent'] += 1
+            tx_start = now_us()
+            if binary:
+                TX_START.pack_into(packet, TX_START_OFFSET, tx_start)
             try:
-                s.sendto(resp, addr)
-            except Exception as e:
-                print(f'[SERVER] Send error: {e}')
-            
-            if msg_count % 10 == 0:
-                print(f'[SERVER] Received {msg_count} | Dropped {dropped}', end='\r')
-                
-    except KeyboardInterrupt:
-        print(f'\n[SERVER] Stopped. Total received: {msg_count}, Dropped: {dropped}')
+                transport.sendto(payload)
+            except OSError as e:
+                stats['errors'] += 1
+                print(f'\n[CLIENT] Send error seq={seq}: {e}')
+                row[3] = tx_start
+                self.slots.release()
+                self._finish(index, row)
+                continue
+            tx_end = now_us()
+            row[3], row[4] = tx_start, tx_end
+            name = self.classes[index][0]
+            hists = self.logs[name].hists
+            hists[f'{name}.tx_us'].record(tx_end - tx_start)
+            if row[ATTEMPTS] == 1:
+                hists[f'{name}.queue_us'].record(tx_start - row[2])
+            self.pending[seq] = (index, row)
+            self.timers[seq] = loop.call_later(self.timeout_s, self._expire, seq)
+            self.max_in_flight = max(self.max_in_flight, len(self.pending))
+
+    async def run(self):
+        """Run every producer to completion; returns once every message is final."""
+        loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(self.window)
+        self.drained = asyncio.Event()
+        self.queue = send_queue.PrioritySendQueue(self.queue_size, self.backpressure,
+                                                  len(self.classes) if self.priority else 1)
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _AckProtocol(self), remote_addr=(self.target, self.port))
+        sock = transport.get_extra_info('socket')
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4*1024*1024)
+        if self.dscp:
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, 0xB8)  # DSCP EF
+            except Exception:
+                pass
+        consumer = asyncio.ensure_future(self.consume(transport))
+        try:
+            await asyncio.gather(*(self.produce(i, *cls) for i, cls in enumerate(self.classes)))
+            if self.finished < self.total:
+                await self.drained.wait()
+        finally:
+            consumer.cancel()
+            transport.close()
+
+
+class MessageLog:
+    """One message type's outputs: CSV and/or .cols log (fmt), calibration sidecar, HDR histograms."""
+
+    def __init__(self, mtype, fmt, hdr_digits, meta):
+        os.makedirs(OUT_DIR, exist_ok=True)
+        self.out_csv = os.path.join(OUT_DIR, f'comm_{mtype}_log.csv')
+        self.meta = meta
+        self.csv_file = open(self.out_csv, 'w', newline='') if fmt in ('csv', 'both') else None
+        self.cols = columnar.ColumnWriter(self.out_csv, LOG_FIELDS, meta=dict(meta)) if fmt in ('cols', 'both') else None
+        self.writer = csv.writer(self.csv_file) if self.csv_file else None
+        if self.writer:
+            clock_calibration.save(meta['calibration'], self.out_csv)
+            self.writer.writerow([name for name, _ in LOG_FIELDS])
+        self.hists = {f'{mtype}.{name}': hdr_histogram.HdrHistogram(significant_figures=hdr_digits)
+                      for name in ('tx_us', 'e2e_us', 'rtt_us')}
 
+    def row(self, row):
+        if self.writer:
+            self.writer.writerow(row)
+        if self.cols:
+            self.cols.append(row)
 
-def send_messages(target, port, mtype, count, interval_ms, burst=False, timeout_ms=100):
+    def close(self, offset_summary):
+        """Close the logs, write the histograms; returns the paths written."""
+        paths = []
+        if self.csv_file:
+            self.csv_file.close()
+            paths.append(self.out_csv)
+        if self.cols:
+            self.cols.meta['clock_offset'] = offset_summary
+            self.cols.close()
+            paths.append(self.cols.path)
+        paths.append(hdr_histogram.save(self.hists, self.out_csv, meta=dict(self.meta, clock_offset=offset_summary)))
+        return paths
+
+
+def send_messages(target, port, mtype, count, interval_ms, burst=False, timeout_ms=100, fmt='both',
+                  hdr_digits=hdr_histogram.DEFAULT_SIGNIFICANT_FIGURES, window=1, wire='text',
+                  sync_probes=SYNC_PROBES, arrival=None, arrival_seed=None):
     """
     Send instrumented messages and log timestamps.
     
@@ -101,10 +800,15 @@ def send_messages(target, port, mtype, count, interval_ms, burst=False, timeout_
         interval_ms: Interval between messages in milliseconds
         burst: Enable burst mode (sends burst at messages 20-30)
         timeout_ms: Socket timeout in milliseconds
+        fmt: 'csv', 'cols' (columnar table, see columnar.py), 'both' or 'none'
+        hdr_digits: Significant digits of the latency histograms
+        window: Messages in flight; > 1 uses the pipelined asyncio sender
+        wire: 'text' (TYPE=..;SEQ=..) or 'binary' (PACKET header)
+        sync_probes: Initial clock-offset probes (0: estimate from the data echoes only)
+        arrival: arrivals.py spec for the send times (replaces interval_ms and burst)
+        arrival_seed: Seed of the arrival process
     """
-    os.makedirs(OUT_DIR, exist_ok=True)
-    out_csv = os.path.join(OUT_DIR, f'comm_{mtype}_log.csv')
-    
+    times = arrivals.schedule(arrival, interval_ms, burst, arrival_seed)
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4*1024*1024)
     
@@ -114,95 +818,308 @@ def send_messages(target, port, mtype, count, interval_ms, burst=False, timeout_
     except Exception:
         pass
 
+    # Timestamps come from time.time(): calibrate that clock before sending
+    calibration = clock_calibration.calibrate('time')
+    print(f'[CLIENT] {clock_calibration.describe(calibration)}')
+
+    # Server-minus-client clock offset: initial exchange, then every echo refines it
+    estimator = clock_offset.OffsetEstimator()
+    if sync_probes > 0:
+        sync_clock(target, port, estimator, sync_probes, timeout_ms, wire)
+        print(f'[CLIENT] Initial {clock_offset.describe(estimator.summary(now_us()))}')
+
     print(f'[CLIENT] Sending {count} messages to {target}:{port}')
-    print(f'[CLIENT] Type: {mtype} | Interval: {interval_ms}ms | Burst: {burst} | Timeout: {timeout_ms}ms')
+    schedule = f'Arrival: {arrival}' if arrival else f'Interval: {interval_ms}ms | Burst: {burst}'
+    print(f'[CLIENT] Type: {mtype} | {schedule} | Timeout: {timeout_ms}ms'
+          f' | Window: {window}')
     
     success = 0
     timeouts = 0
     errors = 0
     
-    with open(out_csv, 'w', newline='') as f:
-        w = csv.writer(f)
-        w.writerow(['seq','t1_us','enqueue_us','tx_start_us','tx_end_us','srv_recv_us','ack_recv_us','rtt_us'])
+    log = MessageLog(mtype, fmt, hdr_digits, meta={
+        'type': mtype, 'target': f'{target}:{port}', 'count': count, 'interval_ms': interval_ms,
+        'burst': burst, 'arrival': arrival, 'timeout_ms': timeout_ms, 'wire': wire, 'calibration': calibration})
+    log_row = log.row
+    tx_hist, e2e_hist, rtt_hist = log.hists.values()
+
+    try:
         
-        start_time = now_ms()
+        if window > 1:
+            sender = PipelinedSender(target, port, mtype, window, timeout_ms, log_row, (tx_hist, e2e_hist, rtt_hist),
+                                     wire=wire, offset_estimator=estimator)
+            asyncio.run(sender.run(count, interval_ms, burst, times=times))
+            success, timeouts, errors = sender.success, sender.timeouts, sender.errors
+        else:
+            start_time = now_ms()
+            binary = wire == 'binary'
+            mtype_bytes = mtype.encode()[:16]
+            packet = bytearray(PACKET.size)
+            rbuf = bytearray(65535)
+            rview = memoryview(rbuf)
+            start = time.perf_counter()
         
-        for i in range(count):
-            seq = i + 1
+            for i in range(count):
+                seq = i + 1
+
+                # wait for this message's send time (absolute: a slow ack delays
+                # only the messages that are already due, not the whole schedule)
+                delay = start + next(times) - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
             
-            # create payload
-            payload = f"TYPE={mtype};SEQ={seq};TS={now_us()}".encode()
+                # create payload
+                if not binary:
+                    payload = f"TYPE={mtype};SEQ={seq};TS={now_us()}".encode()
             
-            # T1: producer timestamp
-            t1 = now_us()
+                # T1: producer timestamp
+                t1 = now_us()
             
-            # T2: enqueue timestamp (simulated - in real system this is queue insertion time)
-            enqueue = now_us()
+                # T2: enqueue timestamp (simulated - in real system this is queue insertion time)
+                enqueue = now_us()
+                if binary:
+                    encode_packet(packet, mtype_bytes, seq, t1, enqueue)
+                    payload = packet
             
-            # T3: tx start
-            tx_start = now_us()
-            try:
-                sent = s.sendto(payload, (target, port))
-            except Exception as e:
-                errors += 1
-                print(f'\n[CLIENT] Send error seq={seq}: {e}')
-                w.writerow([seq, t1, enqueue, tx_start, '', '', '', ''])
-                continue
+                # T3: tx start
+                tx_start = now_us()
+                if binary:
+                    TX_START.pack_into(packet, TX_START_OFFSET, tx_start)
+                try:
+                    sent = s.sendto(payload, (target, port))
+                except Exception as e:
+                    errors += 1
+                    print(f'\n[CLIENT] Send error seq={seq}: {e}')
+                    log_row([seq, t1, enqueue, tx_start, '', '', '', '', '', '', '', '', '', '', 1, ''])
+                    continue
             
-            # T4: tx end
-            tx_end = now_us()
+                # T4: tx end
+                tx_end = now_us()
             
-            # wait for ack with timeout
-            s.settimeout(timeout_ms/1000.0)
-            srv_recv = ''
-            ack_recv = ''
-            rtt = ''
+                # wait for ack with timeout
+                srv_recv = srv_proc = srv_delay = ''
+                ack_recv = ''
+                rtt = ''
+                deadline = tx_start + timeout_ms * 1000
             
-            try:
-                data, addr = s.recvfrom(65535)
-                # T6: ack receive timestamp
-                ack_recv = now_us()
+                try:
+                    while True:
+                        remaining = deadline - now_us()
+                        if remaining <= 0:
+                            raise socket.timeout
+                        s.settimeout(remaining / 1e6)
+                        size, addr = s.recvfrom_into(rbuf)
+                        # T6: ack receive timestamp
+                        ack_recv = now_us()
                 
-                # parse server recv ts (T5) if present
-                if b'|SRV|' in data:
-                    parts = data.split(b'|SRV|')
-                    if len(parts) >= 2:
-                        try:
-                            srv_recv = int(parts[-1].decode())
-                        except Exception:
-                            srv_recv = ''
+                        # parse server recv ts (T5) and server-side times if present;
+                        # echoes of earlier messages (late or duplicated) are skipped
+                        echo_seq, srv_recv, srv_proc, srv_delay = decode_echo(rview[:size])
+                        if echo_seq == seq:
+                            break
                 
-                # compute RTT
-                rtt = ack_recv - tx_start
-                success += 1
+                    # compute RTT
+                    rtt = ack_recv - tx_start
+                    success += 1
                 
-            except socket.timeout:
-                timeouts += 1
-                ack_recv = ''
-                rtt = ''
-            except (ConnectionResetError, OSError) as e:
-                errors += 1
-                ack_recv = ''
-                rtt = ''
+                except socket.timeout:
+                    timeouts += 1
+                    srv_recv = srv_proc = srv_delay = ''
+                    ack_recv = ''
+                    rtt = ''
+                except (ConnectionResetError, OSError) as e:
+                    errors += 1
+                    srv_recv = srv_proc = srv_delay = ''
+                    ack_recv = ''
+                    rtt = ''
             
-            # write row
-            w.writerow([seq, t1, enqueue, tx_start, tx_end, srv_recv, ack_recv, rtt])
-            
-            # progress display
-            if seq % 10 == 0 or seq == count:
-                elapsed = now_ms() - start_time
-                print(f'[CLIENT] Sent {seq}/{count} | Success: {success} | Timeout: {timeouts} | Error: {errors} | Elapsed: {elapsed}ms', end='\r')
-            
-            # burst injection: if burst and i in range, send back-to-back
-            if burst and (20 <= i < 30):
-                # tight loop, no sleep (burst mode)
-                continue
+                row = [seq, t1, enqueue, tx_start, tx_end, srv_recv, ack_recv, rtt, '', '', srv_proc, srv_delay, '', '',
+                       1, '']
+                tx_hist.record(tx_end - tx_start)
+                offset = add_offset_sample(estimator, row) if rtt != '' else None
+                if offset is not None:
+                    e2e_hist.record(srv_recv - offset - t1)
+                if rtt != '':
+                    rtt_hist.record(rtt)
+
+                # write row
+                log_row(row)
             
-            time.sleep(interval_ms/1000.0)
+                # progress display
+                if seq % 10 == 0 or seq == count:
+                    elapsed = now_ms() - start_time
+                    print(f'[CLIENT] Sent {seq}/{count} | Success: {success} | Timeout: {timeouts} | Error: {errors} | Elapsed: {elapsed}ms', end='\r')
     
+
+    finally:
+        offset_summary = estimator.summary(now_us())
+        paths = log.close(offset_summary)
+
     print()
-    print(f'[CLIENT] Done. Wrote {out_csv}')
+    for path in paths:
+        print(f'[CLIENT] Done. Wrote {path}')
+    rtt_ms = rtt_hist.summarize(scale=0.001)
+    print(f"[CLIENT] RTT (ms): p50={rtt_ms['p50']:.3f} p95={rtt_ms['p95']:.3f} "
+          f"p99={rtt_ms['p99']:.3f} max={rtt_ms['max']:.3f}")
     print(f'[CLIENT] Success: {success}/{count} ({success*100.0/count:.1f}%) | Timeout: {timeouts} | Errors: {errors}')
+    print(f'[CLIENT] Final {clock_offset.describe(offset_summary)}')
+    if window > 1:
+        print(f'[CLIENT] Max in flight: {sender.max_in_flight}/{window} | Reordered acks: {sender.reordered} '
+              f'| Late acks: {sender.late} | Stale/duplicate: {sender.stale} | ICMP errors: {sender.icmp_errors}')
+
+
+def parse_classes(text, default_count):
+    """'control:50,telemetry:2:5000' -> [(name, interval_ms, count)], most important first."""
+    classes = []
+    for spec in text.split(','):
+        parts = spec.strip().split(':')
+        if len(parts) not in (2, 3) or not parts[0]:
+            raise ValueError(f'bad class spec {spec!r}: use NAME:INTERVAL_MS[:COUNT]')
+        classes.append((parts[0], float(parts[1]), int(parts[2]) if len(parts) == 3 else default_count))
+    return classes
+
+
+def parse_arrivals(entries):
+    """--arrival [NAME=]SPEC entries -> {name or None: spec}; specs are checked here."""
+    specs = {}
+    for entry in entries or []:
+        name, sep, spec = entry.partition('=')
+        if not sep or ':' in name:
+            name, spec = None, entry  # unnamed: the default for every stream
+        arrivals.arrival_times(spec)  # raises ValueError / OSError on a bad spec
+        specs[name] = spec
+    return specs
+
+
+def load_queue_config(path):
+    """The "communication" block of a configs/*.json file ({} when there is none)."""
+    if not path:
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('communication', {})
+
+
+def send_queued(target, port, classes, timeout_ms=200, queue_size=100, backpressure='drop_oldest', retry_count=0,
+                priority=True, window=1, fmt='both', hdr_digits=hdr_histogram.DEFAULT_SIGNIFICANT_FIGURES,
+                wire='text', sync_probes=SYNC_PROBES, dscp=True, arrival_specs=None, arrival_seed=None):
+    """
+    Producer/consumer mode (QueuedSender): every class in `classes`
+    ([(name, interval_ms, count)], most important first) produces into one
+    bounded priority queue; results go to results/comm_<name>_log.* per
+    class, so final_comm_report.py compares the classes side by side.
+    arrival_specs maps a class name to an arrivals.py spec that replaces
+    its fixed interval.
+    """
+    calibration = clock_calibration.calibrate('time')
+    print(f'[CLIENT] {clock_calibration.describe(calibration)}')
+    estimator = clock_offset.OffsetEstimator()
+    if sync_probes > 0:
+        sync_clock(target, port, estimator, sync_probes, timeout_ms, wire)
+        print(f'[CLIENT] Initial {clock_offset.describe(estimator.summary(now_us()))}')
+
+    queue_meta = {'queue_size': queue_size, 'backpressure': backpressure, 'retry_count': retry_count,
+                  'priority_queue': priority, 'window': window, 'classes': [c[0] for c in classes]}
+    print(f'[CLIENT] Queue: {queue_size} msgs, {backpressure}, {"priority" if priority else "FIFO"}, '
+          f'retries {retry_count}, timeout {timeout_ms}ms, window {window} -> {target}:{port}')
+    logs = {}
+    arrival_specs = arrival_specs or {}
+    for level, (name, interval_ms, count) in enumerate(classes):
+        spec = arrival_specs.get(name)
+        print(f'[CLIENT]   {name}: {count} messages ' + (f'on {spec}' if spec else f'every {interval_ms:g}ms')
+              + (f' (priority {level})' if priority else ''))
+        logs[name] = MessageLog(name, fmt, hdr_digits, meta={
+            'type': name, 'target': f'{target}:{port}', 'count': count, 'interval_ms': interval_ms,
+            'arrival': spec, 'timeout_ms': timeout_ms, 'wire': wire, 'calibration': calibration, 'queue': queue_meta})
+        logs[name].hists[f'{name}.queue_us'] = hdr_histogram.HdrHistogram(significant_figures=hdr_digits)
+
+    sender = QueuedSender(target, port, classes, queue_size, backpressure, window, timeout_ms, retry_count, logs,
+                          priority=priority, wire=wire, offset_estimator=estimator, dscp=dscp,
+                          arrival_specs=arrival_specs, arrival_seed=arrival_seed)
+    try:
+        asyncio.run(sender.run())
+    finally:
+        offset_summary = estimator.summary(now_us())
+        paths = [path for log in logs.values() for path in log.close(offset_summary)]
+
+    for path in paths:
+        print(f'[CLIENT] Done. Wrote {path}')
+    print(f"{'class':<12} {'msgs':>7} {'acked':>7} {'dropped':>8} {'timeout':>8} {'retries':>8} "
+          f"{'queue_p50':>10} {'queue_p99':>10} {'rtt_p99':>9}  (ms)")
+    for name, _, count in classes:
+        st = sender.stats[name]
+        rtt = logs[name].hists[f'{name}.rtt_us'].summarize((99,), scale=0.001)
+        wait = logs[name].hists[f'{name}.queue_us'].summarize((50, 99), scale=0.001)
+        print(f"{name:<12} {count:>7} {st['success']:>7} {st['dropped']:>8} {st['timeouts']:>8} "
+              f"{st['retries']:>8} {wait['p50']:>10.3f} {wait['p99']:>10.3f} {rtt['p99']:>9.3f}")
+    print(f'[CLIENT] Max queue depth: {sender.queue.max_depth}/{queue_size} | Max in flight: '
+          f'{sender.max_in_flight}/{window} | Stale/duplicate: {sender.stale} | ICMP errors: {sender.icmp_errors}')
+    print(f'[CLIENT] Final {clock_offset.describe(offset_summary)}')
+
+
+HTTP_CSV = os.path.join(OUT_DIR, 'comm_http.csv')
+HTTP_FIELDS = ['strategy', 'rows', 'requests', 'connections', 'errors', 'elapsed_s', 'rows_per_s',
+               'bytes_out_per_row', 'bytes_in_per_row', 'row_p50_ms', 'row_p99_ms', 'row_max_ms',
+               'req_p50_ms', 'req_p99_ms']
+
+
+def run_http_server(port, rtt_ms=http_uplink.RTT_MS, kbps=http_uplink.UPLINK_KBPS, tls_ms=http_uplink.TLS_MS,
+                    insert_latency=http_uplink.INSERT_LATENCY, seed=None):
+    """PostgREST stand-in for --transport http (see http_uplink.py)."""
+    _stop_on_sigterm()
+    server = http_uplink.StandInServer(port, rtt_ms, kbps, tls_ms, insert_latency, seed)
+    print(f'[SERVER] PostgREST stand-in on port {port}: POST /rest/v1/<table>')
+    print(f'[SERVER] RTT {rtt_ms:g}ms | uplink {kbps:g}kbit/s | handshake {http_uplink.HANDSHAKE_RTTS} RTT'
+          f' + {tls_ms:g}ms | insert {insert_latency} + {http_uplink.PER_ROW_MS:g}ms/row')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        st = server.stats
+        print(f"\n[SERVER] Stopped. Connections: {st['connections']}, Requests: {st['requests']}, "
+              f"Rows: {st['rows']}")
+    finally:
+        server.server_close()
+
+
+def send_http(target, port, count, interval_ms, strategies, pool=1, batch_rows=http_uplink.BATCH_ROWS,
+              timeout_ms=5000, hdr_digits=hdr_histogram.DEFAULT_SIGNIFICANT_FIGURES, out=HTTP_CSV):
+    """Upload `count` telemetry rows with each strategy in turn; one summary row per strategy."""
+    print(f'[CLIENT] HTTP uplink to {target}:{port}: {count} rows every {interval_ms}ms per strategy, '
+          f'pool {pool}, batch {batch_rows}')
+    print(f"{'strategy':<12} {'rows/s':>9} {'reqs':>6} {'conns':>6} {'err':>5} {'B/row out':>10} "
+          f"{'B/row in':>9} {'row_p50':>8} {'row_p99':>8} {'req_p99':>8}  (ms)")
+    results = []
+    hists = {}
+    for strategy in strategies:
+        row_hist, req_hist = (hdr_histogram.HdrHistogram(significant_figures=hdr_digits) for _ in range(2))
+        hists[f'{strategy}.row_us'], hists[f'{strategy}.request_us'] = row_hist, req_hist
+        st = http_uplink.run_strategy(target, port, strategy, count, interval_ms, pool, batch_rows, timeout_ms,
+                                      (row_hist, req_hist))
+        row = row_hist.summarize((50, 99), scale=0.001)
+        req = req_hist.summarize((50, 99), scale=0.001)
+        ok = row_hist.count  # rows acknowledged with a 2xx
+        results.append({
+            'strategy': strategy, 'rows': ok, 'requests': st['requests'], 'connections': st['connections'],
+            'errors': count - ok, 'elapsed_s': round(st['elapsed_s'], 3),
+            'rows_per_s': round(ok / st['elapsed_s'], 1) if st['elapsed_s'] > 0 else 0.0,
+            'bytes_out_per_row': round(st['bytes_out'] / max(ok, 1), 1),
+            'bytes_in_per_row': round(st['bytes_in'] / max(ok, 1), 1),
+            'row_p50_ms': round(row['p50'], 3), 'row_p99_ms': round(row['p99'], 3),
+            'row_max_ms': round(row['max'], 3),
+            'req_p50_ms': round(req['p50'], 3), 'req_p99_ms': round(req['p99'], 3)})
+        r = results[-1]
+        print(f"{strategy:<12} {r['rows_per_s']:>9.1f} {r['requests']:>6} {r['connections']:>6} {r['errors']:>5} "
+              f"{r['bytes_out_per_row']:>10.1f} {r['bytes_in_per_row']:>9.1f} {r['row_p50_ms']:>8.2f} "
+              f"{r['row_p99_ms']:>8.2f} {r['req_p99_ms']:>8.2f}")
+
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=HTTP_FIELDS)
+        w.writeheader()
+        w.writerows(results)
+    hdr_path = hdr_histogram.save(hists, out, meta={
+        'target': f'{target}:{port}', 'count': count, 'interval_ms': interval_ms, 'pool': pool,
+        'batch_rows': batch_rows, 'strategies': strategies})
+    print(f'[CLIENT] Wrote {out}, {hdr_path}')
 
 
 if __name__ == '__main__':
@@ -228,22 +1145,135 @@ Examples:
     # Server options
     p.add_argument('--server', action='store_true', help='Run as UDP echo server')
     p.add_argument('--port', type=int, default=5005, help='Port number (default: 5005)')
+    p.add_argument('--ports', help='Server: comma-separated ports to serve (overrides --port)')
+    p.add_argument('--server-workers', type=int, default=1,
+                   help='Server processes sharing the ports via SO_REUSEPORT (default: 1)')
+    p.add_argument('--batch', type=int, default=SERVER_BATCH,
+                   help=f'Server: datagrams drained per socket per wake-up (default: {SERVER_BATCH})')
     p.add_argument('--badcase', action='store_true', help='Server bad-case mode: enable delay and drops')
     p.add_argument('--delay-ms', type=int, default=0, help='Server processing delay in ms (requires --badcase)')
-    p.add_argument('--drop-prob', type=float, default=0.0, help='Server drop probability 0.0-1.0 (requires --badcase)')
+    p.add_argument('--drop-prob', type=float,
+                   help="Server drop probability 0.0-1.0 (requires --badcase; replaces a profile's GE loss)")
+    p.add_argument('--impair', choices=sorted(impairment.PROFILES),
+                   help='Server: impairment profile; the flags below override its values')
+    p.add_argument('--loss-ge', type=impairment.parse_ge,
+                   help='Server: Gilbert-Elliott burst loss P,R[,BAD_LOSS[,GOOD_LOSS]] (replaces --drop-prob)')
+    p.add_argument('--delay-dist',
+                   help='Server: delay distribution in ms, e.g. lognormal:4:0.6, pareto:10:1.5, trace:delays.csv')
+    p.add_argument('--reorder-prob', type=float, help='Server: probability a packet is held back')
+    p.add_argument('--reorder-gap-ms', type=float, help='Server: extra delay of a held-back packet (default: 10)')
+    p.add_argument('--dup-prob', type=float, help='Server: probability a packet is echoed twice')
+    p.add_argument('--rate-kbps', type=float, help='Server: token-bucket rate limit in kbit/s')
+    p.add_argument('--rate-burst-bytes', type=int, help='Server: token-bucket depth (default: 1500)')
+    p.add_argument('--rate-queue-ms', type=float,
+                   help='Server: tail-drop packets that would queue longer than this (default: 100)')
+    p.add_argument('--impair-seed', type=int, help='Server: seed for the impairment random streams')
+    p.add_argument('--transport', choices=['udp', 'http'], default='udp',
+                   help='udp echo (default) or the HTTP uplink benchmark / PostgREST stand-in server')
+    p.add_argument('--http-rtt-ms', type=float, default=http_uplink.RTT_MS,
+                   help=f'HTTP server: emulated round trip (default: {http_uplink.RTT_MS:g})')
+    p.add_argument('--http-kbps', type=float, default=http_uplink.UPLINK_KBPS,
+                   help=f'HTTP server: emulated link rate in kbit/s (default: {http_uplink.UPLINK_KBPS:g})')
+    p.add_argument('--http-tls-ms', type=float, default=http_uplink.TLS_MS,
+                   help='HTTP server: extra cost per new connection for TLS crypto (default: 0)')
+    p.add_argument('--http-insert', default=http_uplink.INSERT_LATENCY,
+                   help=f'HTTP server: insert latency delay spec in ms (default: {http_uplink.INSERT_LATENCY})')
     
     # Client options
     p.add_argument('--target', default='127.0.0.1', help='Target IP address (default: 127.0.0.1)')
     p.add_argument('--type', default='telemetry', help='Message type label (default: telemetry)')
     p.add_argument('--count', type=int, default=30, help='Number of messages to send (default: 30)')
     p.add_argument('--interval-ms', type=int, default=10, help='Interval between messages in ms (default: 10)')
-    p.add_argument('--timeout-ms', type=int, default=100, help='Socket timeout in ms (default: 100)')
+    p.add_argument('--timeout-ms', type=int,
+                   help="Socket timeout in ms (default: 100, or the --queue-config's timeout_ms)")
     p.add_argument('--burst', action='store_true', help='Enable burst mode (sends burst at msg 20-30)')
+    p.add_argument('--arrival', action='append', metavar='[CLASS=]SPEC',
+                   help='Arrival process replacing --interval-ms/--burst: periodic:I[:JITTER], poisson:MEAN, '
+                        'onoff:ON:OFF:I, mmpp:GAP1:DWELL1:GAP2:DWELL2, replay:PATH[:COLUMN] (ms). '
+                        'Repeat as CLASS=SPEC for --classes; an unnamed spec applies to every class')
+    p.add_argument('--arrival-seed', type=int, help='Seed for the arrival processes')
+    p.add_argument('--wire', choices=['text', 'binary'], default='text',
+                   help='Packet format: text TYPE=..;SEQ=.. or fixed binary header (default: text)')
+    p.add_argument('--sync-probes', type=int, default=SYNC_PROBES,
+                   help=f'Initial clock-offset probes before sending (default: {SYNC_PROBES}; 0 = data echoes only)')
+    p.add_argument('--window', type=int, default=1,
+                   help='Messages in flight; > 1 uses the pipelined asyncio sender (default: 1, stop-and-wait)')
+    p.add_argument('--format', choices=['csv', 'cols', 'both', 'none'], default='both',
+                   help='Log format: CSV, binary columnar .cols table, both, or none (histograms only; default: both)')
+    p.add_argument('--classes',
+                   help='Producer/consumer mode: message classes NAME:INTERVAL_MS[:COUNT],... most important '
+                        'first (COUNT defaults to --count), fed through one bounded priority queue')
+    p.add_argument('--queue-config', help='configs/*.json whose "communication" block sets the queue '
+                                          '(queue_size, priority_queue, backpressure, retry_count, timeout_ms)')
+    p.add_argument('--queue-size', type=int, help='Queue capacity in messages (default: 100)')
+    p.add_argument('--backpressure', choices=send_queue.BACKPRESSURE,
+                   help='Policy when the queue is full (default: drop_oldest)')
+    p.add_argument('--retries', type=int, help='Retransmissions after a timeout (default: 0)')
+    p.add_argument('--fifo', action='store_true', help='One FIFO for all classes instead of priority levels')
+    p.add_argument('--http-strategies', default=','.join(http_uplink.STRATEGIES),
+                   help='HTTP client: comma-separated strategies to compare (default: all)')
+    p.add_argument('--http-pool', type=int, default=1, help='HTTP client: concurrent connections (default: 1)')
+    p.add_argument('--http-batch-rows', type=int, default=http_uplink.BATCH_ROWS,
+                   help=f'HTTP client: max rows per batch insert (default: {http_uplink.BATCH_ROWS})')
+    p.add_argument('--hdr-digits', type=int, choices=range(1, 6), default=hdr_histogram.DEFAULT_SIGNIFICANT_FIGURES,
+                   help='Significant digits of the latency histograms (default: 3)')
     
     args = p.parse_args()
     
-    if args.server:
-        run_server(args.port, badcase=args.badcase, delay_ms=args.delay_ms, drop_prob=args.drop_prob)
+    if args.server and args.transport == 'http':
+        try:
+            impairment.delay_sampler(args.http_insert)
+        except (OSError, ValueError) as e:
+            p.error(str(e))
+        run_http_server(args.port, args.http_rtt_ms, args.http_kbps, args.http_tls_ms, args.http_insert,
+                        args.impair_seed)
+    elif args.server:
+        ports = [int(v) for v in args.ports.split(',')] if args.ports else [args.port]
+        delay = args.delay_dist or (f'const:{args.delay_ms}' if args.badcase and args.delay_ms else None)
+        try:
+            impair = impairment.Impairment.from_profile(
+                args.impair, loss_ge=args.loss_ge, drop_prob=args.drop_prob if args.badcase else None,
+                delay=delay, reorder_prob=args.reorder_prob, reorder_gap_ms=args.reorder_gap_ms,
+                dup_prob=args.dup_prob, rate_kbps=args.rate_kbps, rate_burst_bytes=args.rate_burst_bytes,
+                rate_queue_ms=args.rate_queue_ms, seed=args.impair_seed)
+        except (OSError, ValueError) as e:
+            p.error(str(e))
+        run_server(ports, impair, batch=args.batch, workers=args.server_workers)
+    elif args.transport == 'http':
+        strategies = [v.strip() for v in args.http_strategies.split(',') if v.strip()]
+        unknown = [v for v in strategies if v not in http_uplink.STRATEGIES]
+        if unknown:
+            p.error(f"unknown HTTP strategies {', '.join(unknown)}: use {', '.join(http_uplink.STRATEGIES)}")
+        send_http(args.target, args.port, args.count, args.interval_ms, strategies, args.http_pool,
+                  args.http_batch_rows, args.timeout_ms or 5000, args.hdr_digits)
+    elif args.classes:
+        try:
+            classes = parse_classes(args.classes, args.count)
+            comm = load_queue_config(args.queue_config)
+            specs = parse_arrivals(args.arrival)
+        except (OSError, ValueError) as e:
+            p.error(str(e))
+        unknown = set(specs) - {None} - {name for name, _, _ in classes}
+        if unknown:
+            p.error(f"--arrival for unknown classes: {', '.join(sorted(unknown))}")
+        pick = lambda value, key, default: value if value is not None else comm.get(key, default)
+        send_queued(args.target, args.port, classes, timeout_ms=pick(args.timeout_ms, 'timeout_ms', 100),
+                    queue_size=pick(args.queue_size, 'queue_size', 100),
+                    backpressure=pick(args.backpressure, 'backpressure', 'drop_oldest'),
+                    retry_count=pick(args.retries, 'retry_count', 0),
+                    priority=not args.fifo and comm.get('priority_queue', True),
+                    window=args.window, fmt=args.format, hdr_digits=args.hdr_digits, wire=args.wire,
+                    sync_probes=args.sync_probes, dscp=comm.get('dscp_marking', True),
+                    arrival_specs={name: specs.get(name, specs.get(None)) for name, _, _ in classes},
+                    arrival_seed=args.arrival_seed)
     else:
+        try:
+            specs = parse_arrivals(args.arrival)
+        except (OSError, ValueError) as e:
+            p.error(str(e))
+        if set(specs) - {None, args.type}:
+            p.error('--arrival CLASS=SPEC needs --classes (or CLASS = --type)')
         send_messages(args.target, args.port, args.type, args.count, args.interval_ms, 
-                     burst=args.burst, timeout_ms=args.timeout_ms)
+                     burst=args.burst, timeout_ms=args.timeout_ms or 100, fmt=args.format, hdr_digits=args.hdr_digits,
+                     window=args.window, wire=args.wire, sync_probes=args.sync_probes,
+                     arrival=specs.get(args.type, specs.get(None)), arrival_seed=args.arrival_seed)
@@ -2,122 +2,427 @@
 """
 Generate final RT communication report comparing baseline vs bad-case scenarios.
 Analyzes all comm logs and produces comprehensive E2E metrics.
+Columnar .cols logs are preferred over the CSV of the same name.
+Intervals are corrected by the clock calibration stored with each log.
+Logs with offset_us (comm_instrument.py's clock-offset estimate) also get
+one-way UPLINK (tx_start -> server) and DOWNLINK (server send -> ack)
+latency, and E2E is taken on the offset-corrected server clock, each with
+the per-row offset bound; older logs report raw srv_recv - t1.
+Only srv_proc_us counts as server time: the echo server stamps T5 at the
+end of its emulated uplink, so an injected delay (srv_delay_us) is part
+of E2E and UPLINK, not of DOWNLINK. Logs written before that change
+stamped T5 at the physical receive and show the delay in RTT only.
+
+The logs are read in a process pool (--workers), one file per task, in a
+single streaming pass: rows are folded into a LogSummary (counters plus
+HDR histograms, hdr_histogram.py) as they are read, .cols tables in
+chunks of their memory-mapped columns, so memory does not grow with the
+size or number of logs. Workers return encoded summaries, which the parent
+merges per class (comm_<class>_log, across run directories) and over all
+logs. Percentiles are therefore within the histograms' 0.1% precision
+rather than exact; intervals are held in ns, so the sub-µs clock read
+correction is applied row by row, before merging logs with different
+calibrations.
+
+Rows are classified, not skipped: queue drops (no send times), send errors
+(tx_start but no tx_end), timeouts (no server stamp) and bad rows (missing
+or non-numeric stamps), which are counted with the first offending row.
+A log that cannot be read at all is reported and left out.
+
+Run:
+  python scripts/final_comm_report.py
+  # thousands of run directories, 8 worker processes
+  python scripts/final_comm_report.py runs/ --workers 8
+
+Outputs:
+- results/final_comm_summary.txt   per-class and overall summaries
+- results/final_comm_logs.csv      one row per log file
 """
+import argparse
 import csv
-import statistics
-import os
 import glob
+import multiprocessing
+import os
+
+import clock_calibration
+import columnar
+import hdr_histogram
+
+# (key, report label); all but offset_err_ms are intervals corrected by the clock read cost
+METRICS = (('latency_ms', 'T1→TX_START'), ('exec_ms', 'TX_DURATION'), ('e2e_ms', 'E2E_T1→SRV'),
+           ('rtt_ms', 'RTT'), ('uplink_ms', 'UPLINK'), ('downlink_ms', 'DOWNLINK'), ('offset_err_ms', None))
+OFFSET_COLUMNS = ['offset_us', 'offset_err_us', 'ack_recv_us', 'srv_proc_us']
+REQUIRED_COLUMNS = ['t1_us', 'tx_start_us', 'tx_end_us', 'srv_recv_us', 'rtt_us']
+COUNTERS = ('total', 'success', 'timeout', 'send_error', 'queue_drop', 'bad_rows')
+
+HIGHEST_NS = 3600 * 1_000_000_000   # histogram range: 1 ns .. 1 h
+CHUNK_ROWS = 65536                  # .cols rows per vectorised step
+LIST_LIMIT = 20                     # print the file list up to this many logs
+
+SUMMARY_TXT = 'results/final_comm_summary.txt'
+LOGS_CSV = 'results/final_comm_logs.csv'
+LOGS_FIELDS = ['file', 'class', 'total', 'success', 'timeout', 'send_error', 'queue_drop', 'bad_rows',
+               'first_bad_row', 'calibrated', 'latency_p50_ms', 'latency_p99_ms', 'e2e_p50_ms', 'e2e_p99_ms',
+               'rtt_p50_ms', 'rtt_p99_ms', 'rtt_max_ms', 'uplink_p99_ms', 'downlink_p99_ms', 'error']
+
+
+class LogSummary:
+    """Mergeable counters and HDR histograms (ns) of one log, a class of logs, or all of them."""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.hists = {key: hdr_histogram.HdrHistogram(highest=HIGHEST_NS) for key, _ in METRICS}
+        self.logs = 0
+        self.calibrated = 0
+        self.calibration = None
+        self.first_bad = None  # (file, row number) of the first bad row
+
+    def merge(self, other):
+        for key in COUNTERS:
+            self.counts[key] += other.counts[key]
+        for key, h in other.hists.items():
+            self.hists[key].merge(h)
+        self.logs += other.logs
+        self.calibrated += other.calibrated
+        self.calibration = self.calibration or other.calibration
+        self.first_bad = self.first_bad or other.first_bad
+        return self
+
+    def encode(self):
+        """Picklable form for the pool: counters and encoded histograms."""
+        return {'counts': self.counts, 'hists': {k: h.encode() for k, h in self.hists.items() if h.count},
+                'logs': self.logs, 'calibrated': self.calibrated, 'calibration': self.calibration,
+                'first_bad': self.first_bad}
+
+    @classmethod
+    def decode(cls, doc):
+        s = cls()
+        s.counts = doc['counts']
+        for key, blob in doc['hists'].items():
+            s.hists[key] = hdr_histogram.HdrHistogram.decode(blob)
+        s.logs, s.calibrated = doc['logs'], doc['calibrated']
+        s.calibration, s.first_bad = doc['calibration'], doc['first_bad']
+        return s
 
-def pct(data, p):
-    if not data: return 0
-    data = sorted(data)
-    k = (len(data)-1) * (p/100.0)
-    f = int(k)
-    c = min(f+1, len(data)-1)
-    if f == c:
-        return data[int(k)]
-    d0 = data[f] * (c-k)
-    d1 = data[c] * (k-f)
-    return d0 + d1
-
-def analyze_log(csv_path):
-    """Analyze a single comm log file and return metrics."""
-    if not os.path.exists(csv_path):
-        return None
-    
-    results = {
-        'file': os.path.basename(csv_path),
-        'total': 0,
-        'success': 0,
-        'timeout': 0,
-        'latency_ms': [],  # T1 -> tx_start
-        'exec_ms': [],     # tx_start -> tx_end
-        'e2e_ms': [],      # T1 -> srv_recv
-        'rtt_ms': []       # tx_start -> ack_recv
-    }
-    
-    with open(csv_path, newline='') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            results['total'] += 1
-            try:
-                t1 = int(row['t1_us'])
-                tx_start = int(row['tx_start_us'])
-                tx_end = int(row['tx_end_us'])
-                results['latency_ms'].append((tx_start - t1)/1000.0)
-                results['exec_ms'].append((tx_end - tx_start)/1000.0)
-                
-                if row.get('srv_recv_us') and row['srv_recv_us']:
-                    srv = int(row['srv_recv_us'])
-                    results['e2e_ms'].append((srv - t1)/1000.0)
-                    results['success'] += 1
-                else:
-                    results['timeout'] += 1
-                
-                if row.get('rtt_us') and row['rtt_us']:
-                    results['rtt_ms'].append(int(row['rtt_us'])/1000.0)
-            except Exception as e:
+    def stats(self, key, ps=(50, 95, 99)):
+        return self.hists[key].summarize(ps, scale=1e-6)
+
+
+def log_class(path):
+    """results/run3/comm_control_log.cols -> 'control'."""
+    return os.path.splitext(os.path.basename(path))[0].replace('comm_', '').replace('_log', '')
+
+
+def find_logs(paths):
+    """Log files under the given files, directories (recursive) or globs; a .cols table replaces its CSV."""
+    found = {}
+    for path in paths:
+        if os.path.isdir(path):
+            matches = [glob.glob(os.path.join(path, '**', f'comm_*_log{ext}'), recursive=True)
+                       for ext in ('.csv', columnar.SUFFIX)]
+            candidates = sorted(matches[0]) + sorted(matches[1])
+        else:
+            candidates = sorted(glob.glob(path)) or [path]
+            candidates.sort(key=lambda p: p.endswith(columnar.SUFFIX))
+        for log in candidates:
+            if log.endswith('.csv') or columnar.is_table(log):
+                found[os.path.splitext(log)[0]] = log
+    return sorted(found.values())
+
+
+def _stamp(value):
+    """A log stamp as int, None when missing; ValueError when not a number."""
+    return None if value == '' or value is None else int(value)
+
+
+def add_rows(summary, names, rows, correction_ns, source):
+    """Fold log rows (CSV strings or decoded .cols values, in `names` order) into summary."""
+    missing = [n for n in REQUIRED_COLUMNS if n not in names]
+    if missing:
+        raise ValueError(f"not a comm log: no {', '.join(missing)} column")
+    T1, TX_START, TX_END, SRV, RTT = (names.index(n) for n in REQUIRED_COLUMNS)
+    DROP = names.index('queue_drop') if 'queue_drop' in names else None
+    offsets = [names.index(n) for n in OFFSET_COLUMNS] if all(n in names for n in OFFSET_COLUMNS) else None
+    counts = summary.counts
+    h = summary.hists
+
+    def interval(us):
+        return max(us * 1000 - correction_ns, 0)
+
+    for number, row in enumerate(rows, 1):
+        counts['total'] += 1
+        try:
+            if DROP is not None and str(row[DROP]) == '1':
+                counts['queue_drop'] += 1  # dropped by the sender's queue, never sent
                 continue
-    
-    return results
+            t1, tx_start, tx_end = int(row[T1]), int(row[TX_START]), _stamp(row[TX_END])
+            if tx_end is None:
+                counts['send_error'] += 1  # sendto() failed
+                continue
+            srv, rtt = _stamp(row[SRV]), _stamp(row[RTT])
+            one_way = None
+            if srv is not None and offsets:
+                offset, err, ack, proc = (_stamp(row[i]) for i in offsets)
+                if offset is not None and ack is not None:
+                    # one-way legs on the client clock, using the logged offset estimate
+                    srv_send = srv + (proc or 0)  # T5 already includes the injected uplink delay
+                    one_way = (srv - offset - t1, srv - offset - tx_start, ack - (srv_send - offset), err or 0)
+        except (ValueError, TypeError, IndexError):
+            counts['bad_rows'] += 1
+            if summary.first_bad is None:
+                summary.first_bad = (source, number)
+            continue
+        h['latency_ms'].record(interval(tx_start - t1))
+        h['exec_ms'].record(interval(tx_end - tx_start))
+        if srv is None:
+            counts['timeout'] += 1
+        else:
+            counts['success'] += 1
+            if one_way:
+                e2e, uplink, downlink, err = one_way
+                h['uplink_ms'].record(interval(uplink))
+                h['downlink_ms'].record(interval(downlink))
+                h['offset_err_ms'].record(err * 1000)
+            else:
+                e2e = srv - t1
+            h['e2e_ms'].record(interval(e2e))
+        if rtt is not None:
+            h['rtt_ms'].record(interval(rtt))
+
+
+def add_table(summary, path, correction_ns):
+    """Vectorised add_rows() over a .cols table (needs NumPy), CHUNK_ROWS at a time."""
+    np = columnar.np
+    cols = columnar.read_columns(path, REQUIRED_COLUMNS + OFFSET_COLUMNS + ['queue_drop'])
+    missing = [n for n in REQUIRED_COLUMNS if n not in cols]
+    if missing:
+        raise ValueError(f"not a comm log: no {', '.join(missing)} column")
+    null = columnar.NULL_INT
+    counts = summary.counts
+    h = summary.hists
+    with_offsets = all(n in cols for n in OFFSET_COLUMNS)
+
+    def record(key, us):
+        h[key].record_many(np.maximum(us * 1000 - correction_ns, 0))
+
+    for lo in range(0, len(cols['t1_us']), CHUNK_ROWS):
+        c = {name: np.asarray(col[lo:lo + CHUNK_ROWS]) for name, col in cols.items()}
+        t1, tx_start, tx_end, srv, rtt = (c[n] for n in REQUIRED_COLUMNS)
+        drop = c['queue_drop'] == 1 if 'queue_drop' in c else np.zeros(len(t1), dtype=bool)
+        bad = ~drop & ((t1 == null) | (tx_start == null))
+        send_error = ~drop & ~bad & (tx_end == null)
+        sent = ~drop & ~bad & ~send_error
+        acked = sent & (srv != null)
+        counts['total'] += len(t1)
+        counts['queue_drop'] += int(drop.sum())
+        counts['bad_rows'] += int(bad.sum())
+        counts['send_error'] += int(send_error.sum())
+        counts['success'] += int(acked.sum())
+        counts['timeout'] += int((sent & ~acked).sum())
+        if summary.first_bad is None and bad.any():
+            summary.first_bad = (os.path.basename(path), lo + int(bad.argmax()) + 1)
+        record('latency_ms', (tx_start - t1)[sent])
+        record('exec_ms', (tx_end - tx_start)[sent])
+        record('rtt_ms', rtt[sent & (rtt != null)])
+        synced = np.zeros(len(t1), dtype=bool)
+        if with_offsets:
+            offset, err, ack, proc = (c[n] for n in OFFSET_COLUMNS)
+            synced = acked & (offset != null) & (ack != null)
+            srv_send = srv + np.where(proc != null, proc, 0)
+            srv_local = srv - offset  # server stamps on the client clock
+            record('e2e_ms', (srv_local - t1)[synced])
+            record('uplink_ms', (srv_local - tx_start)[synced])
+            record('downlink_ms', (ack - (srv_send - offset))[synced])
+            h['offset_err_ms'].record_many(np.where(err != null, err, 0)[synced] * 1000)
+        record('e2e_ms', (srv - t1)[acked & ~synced])
 
-def format_stats(data, label):
-    if not data:
+
+def analyze_log(path):
+    """Analyze a single comm log file (CSV or .cols table) in one streaming pass -> LogSummary."""
+    summary = LogSummary()
+    summary.logs = 1
+    cal = clock_calibration.load(path)
+    correction_ns = 0
+    if cal:
+        summary.calibrated, summary.calibration = 1, cal
+        correction_ns = clock_calibration.correction_us(cal) * 1000
+    source = os.path.basename(path)
+    if columnar.is_table(path):
+        if columnar.np is not None:
+            add_table(summary, path, correction_ns)
+        else:
+            schema = columnar.read_schema(path)
+            names = [c['name'] for c in schema['columns']]
+            add_rows(summary, names, columnar.iter_rows(path), correction_ns, source)
+    else:
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            add_rows(summary, next(reader, []), reader, correction_ns, source)
+    return summary
+
+
+def analyze_file(path):
+    """Pool worker: path -> (path, encoded LogSummary or None, error message or None)."""
+    try:
+        return path, analyze_log(path).encode(), None
+    except (OSError, ValueError, KeyError, csv.Error) as e:
+        return path, None, f'{type(e).__name__}: {e}'
+
+
+def analyze_logs(logs, workers):
+    """Yield (path, LogSummary or None, error) for every log, in order, from `workers` processes."""
+    if workers <= 1 or len(logs) <= 1:
+        for path, doc, error in map(analyze_file, logs):
+            yield path, doc and LogSummary.decode(doc), error
+        return
+    with multiprocessing.Pool(min(workers, len(logs))) as pool:
+        for path, doc, error in pool.imap(analyze_file, logs):
+            yield path, doc and LogSummary.decode(doc), error
+
+
+def share(n, total):
+    return n * 100.0 / total if total else 0.0
+
+
+def clock_note(summary):
+    cal = summary.calibration
+    if not cal:
+        return "Clock: no calibration stored with the log; intervals are uncorrected"
+    if summary.logs == 1:
+        return "Clock: " + clock_calibration.describe_correction(cal)
+    return (f"Clock: {summary.calibrated}/{summary.logs} logs calibrated, each corrected by its own "
+            f"clock read cost; e.g. " + clock_calibration.describe_correction(cal))
+
+
+def offset_note(summary):
+    s = summary.stats('offset_err_ms', (50, 99))
+    return (f"One-way bounds: E2E/UPLINK/DOWNLINK are +/- the clock-offset error "
+            f"(p50={s['p50']:.3f}ms p99={s['p99']:.3f}ms max={s['max']:.3f}ms)")
+
+
+def format_stats(summary, key, label):
+    if not summary.hists[key].count:
         return f"{label}: NO DATA"
-    return f"{label}: p50={pct(data,50):.3f} p95={pct(data,95):.3f} p99={pct(data,99):.3f} max={max(data):.3f} mean={statistics.mean(data):.3f}"
+    s = summary.stats(key)
+    return f"{label}: p50={s['p50']:.3f} p95={s['p95']:.3f} p99={s['p99']:.3f} max={s['max']:.3f} mean={s['mean']:.3f}"
+
+
+def report_lines(summary):
+    """Counts, notes and interval statistics of one summary, as printed and written."""
+    c = summary.counts
+    total = c['total']
+    lines = [f"Total: {total} | Success: {c['success']} ({share(c['success'], total):.1f}%) | "
+             f"Loss: {c['timeout']} ({share(c['timeout'], total):.1f}%)"
+             + (f" | Queue drops: {c['queue_drop']}" if c['queue_drop'] else '')
+             + (f" | Send errors: {c['send_error']}" if c['send_error'] else '')
+             + (f" | Logs: {summary.logs}" if summary.logs > 1 else '')]
+    if c['bad_rows']:
+        source, number = summary.first_bad
+        lines.append(f"Bad rows: {c['bad_rows']} ({share(c['bad_rows'], total):.2f}%), "
+                     f"first: {source} row {number}")
+    lines.append(clock_note(summary))
+    for key, label in METRICS:
+        if label and (key not in ('uplink_ms', 'downlink_ms') or summary.hists[key].count):
+            lines.append(format_stats(summary, key, f'{label} (ms)'))
+    if summary.hists['uplink_ms'].count:
+        lines.append(offset_note(summary))
+    return lines
+
+
+def log_row(path, summary, error):
+    row = {'file': path, 'class': log_class(path), 'error': error or ''}
+    if summary is None:
+        return row
+    row.update(summary.counts)
+    row['first_bad_row'] = summary.first_bad[1] if summary.first_bad else ''
+    row['calibrated'] = summary.calibrated
+    for field in LOGS_FIELDS:
+        if field.endswith('_ms'):
+            name, stat, _ = field.split('_')
+            key = f'{name}_ms'
+            row[field] = round(summary.stats(key, (50, 99))[stat], 4) if summary.hists[key].count else ''
+    return row
+
 
 def main():
+    p = argparse.ArgumentParser(description='Summarize comm logs per log, per class and overall')
+    p.add_argument('paths', nargs='*', default=['results'],
+                   help='Log files, globs or directories searched recursively (default: results)')
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    p.add_argument('-o', '--out', default=SUMMARY_TXT)
+    p.add_argument('--logs-out', default=LOGS_CSV)
+    args = p.parse_args()
+
     print("="*70)
     print("REAL-TIME COMMUNICATION FINAL REPORT")
     print("="*70)
-    
-    # Find all comm logs
-    logs = glob.glob('results/comm_*_log.csv')
-    
+
+    logs = find_logs(args.paths)
     if not logs:
-        print("No comm logs found in results/")
+        print(f"No comm logs found in {', '.join(args.paths)}")
         return
-    
+
     print(f"\nFound {len(logs)} log files:")
-    for log in logs:
-        print(f"  - {os.path.basename(log)}")
-    
+    for log in logs[:LIST_LIMIT]:
+        print(f"  - {os.path.relpath(log)}")
+    if len(logs) > LIST_LIMIT:
+        print(f"  ... and {len(logs) - LIST_LIMIT} more")
+
+    # Per-class and overall summaries are merged as the per-log results stream in
+    classes = {}
+    overall = LogSummary()
+    failed = []
+    os.makedirs(os.path.dirname(args.logs_out) or '.', exist_ok=True)
+    with open(args.logs_out, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=LOGS_FIELDS)
+        w.writeheader()
+        for i, (path, summary, error) in enumerate(analyze_logs(logs, args.workers), 1):
+            w.writerow(log_row(path, summary, error))
+            if summary is None:
+                failed.append((path, error))
+                continue
+            name = log_class(path)
+            if name in classes:
+                classes[name].merge(summary)
+            else:
+                classes[name] = summary
+            overall.merge(summary)
+            if len(logs) > LIST_LIMIT and (i % 100 == 0 or i == len(logs)):
+                print(f"Logs: {i}/{len(logs)}", end='\r')
+
     print("\n" + "="*70)
     print("DETAILED ANALYSIS")
     print("="*70)
-    
-    all_results = {}
-    for log_path in logs:
-        results = analyze_log(log_path)
-        if results:
-            log_name = os.path.basename(log_path).replace('comm_', '').replace('_log.csv', '')
-            all_results[log_name] = results
-            
-            print(f"\n--- {log_name.upper()} ---")
-            print(f"Total messages: {results['total']}")
-            print(f"Success: {results['success']} ({results['success']*100.0/results['total']:.1f}%)")
-            print(f"Timeout/Loss: {results['timeout']} ({results['timeout']*100.0/results['total']:.1f}%)")
-            print()
-            print(format_stats(results['latency_ms'], 'T1→TX_START (ms)'))
-            print(format_stats(results['exec_ms'], 'TX_DURATION (ms)'))
-            print(format_stats(results['e2e_ms'], 'E2E_T1→SRV (ms)'))
-            print(format_stats(results['rtt_ms'], 'RTT (ms)'))
-    
+    sections = sorted(classes.items())
+    if len(sections) > 1:
+        sections.append(('all logs', overall))
+    for name, summary in sections:
+        print(f"\n--- {name.upper()} ---")
+        for line in report_lines(summary):
+            print(line)
+    if failed:
+        print(f"\nUnreadable logs: {len(failed)}")
+        for path, error in failed[:LIST_LIMIT]:
+            print(f"  - {os.path.relpath(path)}: {error}")
+
     # Write summary
-    summary_path = 'results/final_comm_summary.txt'
+    summary_path = args.out
+    os.makedirs(os.path.dirname(summary_path) or '.', exist_ok=True)
     with open(summary_path, 'w', encoding='utf-8') as f:
         f.write("REAL-TIME COMMUNICATION FINAL REPORT\n")
         f.write("="*70 + "\n\n")
-        
-        for name, res in all_results.items():
+
+        for name, res in sections:
             f.write(f"--- {name.upper()} ---\n")
-            f.write(f"Total: {res['total']} | Success: {res['success']} ({res['success']*100.0/res['total']:.1f}%) | Loss: {res['timeout']} ({res['timeout']*100.0/res['total']:.1f}%)\n")
-            f.write(format_stats(res['latency_ms'], 'T1→TX_START') + '\n')
-            f.write(format_stats(res['exec_ms'], 'TX_DURATION') + '\n')
-            f.write(format_stats(res['e2e_ms'], 'E2E_T1→SRV') + '\n')
-            f.write(format_stats(res['rtt_ms'], 'RTT') + '\n')
+            for line in report_lines(res):
+                f.write(line + '\n')
             f.write('\n')
-        
+        if failed:
+            f.write(f"Unreadable logs ({len(failed)}):\n")
+            for path, error in failed:
+                f.write(f"  {path}: {error}\n")
+            f.write('\n')
+
         # Interpretation
         f.write("\n" + "="*70 + "\n")
         f.write("INTERPRETATION\n")
@@ -135,14 +440,18 @@ def main():
         f.write("  - I/O wait: T4 - T3 (TX_DURATION)\n")
         f.write("  - Network propagation: T5 - T4 (included in E2E)\n")
         f.write("  - Server processing: included in RTT\n")
-        f.write("  - Return propagation: T6 - T5 (included in RTT)\n\n")
+        f.write("  - Return propagation: T6 - T5 (included in RTT)\n")
+        f.write("  - One-way legs (logs with offset_us): UPLINK = T5 - offset - T3,\n")
+        f.write("    DOWNLINK = T6 - (server send - offset), within the clock-offset bound\n\n")
         f.write("Bad-case behavior:\n")
         f.write("  - Packet loss: shown in Timeout/Loss percentage\n")
         f.write("  - Increased latency: shown in p95/p99 metrics\n")
         f.write("  - Jitter: difference between p50 and p99\n")
-    
+        f.write("  - Bad rows: malformed log rows, counted (not analyzed) with the first one's position\n")
+
     print("\n" + "="*70)
     print(f"Summary written to: {summary_path}")
+    print(f"Per-log table written to: {args.logs_out}")
     print("="*70)
 
 if __name__ == '__main__':
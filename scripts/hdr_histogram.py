@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+High-dynamic-range (HDR) latency histograms for long soak runs.
+
+HdrHistogram records non-negative integer values (µs in this repo) in
+log-linear buckets: every power-of-two range [2^k, 2^(k+1)) is split into
+the same number of linear sub-buckets, enough for `significant_figures`
+decimal digits. A value is therefore reported to within a relative error
+of 10^-significant_figures (0.1% at the default 3 digits) anywhere between
+`lowest` and `highest`, for a fixed number of counters (about 23k for
+1 µs .. 1 h at 3 digits), however long the run.
+
+- record() is constant time: two shifts and a bit_length() per value.
+- encode()/decode() serialize to a zlib-compressed run-length form,
+  a few hundred bytes for a typical latency distribution.
+- merge() adds counts; histograms with a different layout are re-recorded
+  at their bucket midpoints.
+- percentiles() use latency_stats' rule (linear interpolation between
+  closest ranks, latency_stats.histogram_percentiles()), so they agree
+  with percentiles() of the raw samples: exactly while the buckets are
+  1 unit wide (values below 2^11 at 3 digits), and within precision above,
+  where a bucket's samples are taken as evenly spread over its range
+  (narrowed to the exact min and max).
+
+A run's histograms are stored by name ('<task>.latency_us',
+'<type>.rtt_us', ...) in one <log>.hdr.json file (save()/load()); the CLI
+merges any number of those files and reports any quantiles.
+
+Run (merge runs, report arbitrary quantiles, write the merged histograms):
+  python scripts/hdr_histogram.py results/jitter_overload.hdr.json
+  python scripts/hdr_histogram.py run1/comm_control_log.hdr.json run2/comm_control_log.hdr.json \\
+      -p 50,90,99,99.9,99.99 -o results/comm_control_merged.hdr.json
+"""
+import argparse
+import base64
+import json
+import math
+import os
+import struct
+import zlib
+
+from latency_stats import DEFAULT_PERCENTILES, histogram_percentiles
+
+try:
+    import numpy as np
+except ImportError:  # optional: record_many() then records value by value
+    np = None
+
+SUFFIX = '.hdr.json'
+FORMAT_VERSION = 1
+
+DEFAULT_LOWEST = 1                    # 1 µs
+DEFAULT_HIGHEST = 3600 * 1_000_000    # 1 h in µs
+DEFAULT_SIGNIFICANT_FIGURES = 3
+
+# version, significant figures, lowest, highest, min, max, total
+_HEADER = struct.Struct('<BBqqqqq')
+
+
+def _zigzag_varint(n, out):
+    n = (n << 1) ^ (n >> 63)
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varints(data, pos):
+    while pos < len(data):
+        n = shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            n |= (b & 0x7F) << shift
+            shift += 7
+            if b < 0x80:
+                break
+        yield (n >> 1) ^ -(n & 1)
+
+
+class HdrHistogram:
+    """Log-linear histogram of integer values with fixed relative precision."""
+
+    def __init__(self, lowest=DEFAULT_LOWEST, highest=DEFAULT_HIGHEST,
+                 significant_figures=DEFAULT_SIGNIFICANT_FIGURES):
+        if lowest < 1 or highest < 2 * lowest or not 1 <= significant_figures <= 5:
+            raise ValueError('need 1 <= lowest, 2*lowest <= highest, 1 <= significant_figures <= 5')
+        self.lowest = lowest
+        self.highest = highest
+        self.significant_figures = significant_figures
+
+        largest_single_unit = 2 * 10 ** significant_figures
+        sub_bucket_count_magnitude = math.ceil(math.log2(largest_single_unit))
+        self.sub_half_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+        self.unit_magnitude = int(math.floor(math.log2(lowest)))
+        self.sub_bucket_count = 1 << (self.sub_half_magnitude + 1)
+        self.sub_half_count = self.sub_bucket_count // 2
+        self.sub_bucket_mask = (self.sub_bucket_count - 1) << self.unit_magnitude
+
+        smallest_untrackable = self.sub_bucket_count << self.unit_magnitude
+        buckets = 1
+        while smallest_untrackable <= highest:
+            smallest_untrackable <<= 1
+            buckets += 1
+        self.bucket_count = buckets
+        self.counts = [0] * ((buckets + 1) * self.sub_half_count)
+
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __len__(self):
+        return self.count
+
+    def same_layout(self, other):
+        return (self.lowest, self.highest, self.significant_figures) == \
+            (other.lowest, other.highest, other.significant_figures)
+
+    # -- index arithmetic -------------------------------------------------
+
+    def _index(self, value):
+        bucket = (value | self.sub_bucket_mask).bit_length() - self.unit_magnitude - self.sub_half_magnitude - 1
+        sub = value >> (bucket + self.unit_magnitude)
+        return ((bucket + 1) << self.sub_half_magnitude) + sub - self.sub_half_count
+
+    def _value_at_index(self, index):
+        bucket = (index >> self.sub_half_magnitude) - 1
+        sub = (index & (self.sub_half_count - 1)) + self.sub_half_count
+        if bucket < 0:
+            sub -= self.sub_half_count
+            bucket = 0
+        return sub << (bucket + self.unit_magnitude)
+
+    def _bucket_size(self, value):
+        bucket = (value | self.sub_bucket_mask).bit_length() - self.unit_magnitude - self.sub_half_magnitude - 1
+        return 1 << (self.unit_magnitude + bucket)
+
+    def lowest_equivalent(self, value):
+        return self._value_at_index(self._index(value))
+
+    def highest_equivalent(self, value):
+        low = self.lowest_equivalent(value)
+        return low + self._bucket_size(low) - 1
+
+    def median_equivalent(self, value):
+        low = self.lowest_equivalent(value)
+        return low + (self._bucket_size(low) >> 1)
+
+    # -- recording --------------------------------------------------------
+
+    def record(self, value, count=1):
+        """Record an integer value; clamped to [0, highest] (min/max stay exact)."""
+        value = int(value)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.total += value * count
+        self.count += count
+        self.counts[self._index(min(max(value, 0), self.highest))] += count
+
+    def record_many(self, values):
+        if np is not None and isinstance(values, np.ndarray):
+            # one record() per distinct value: latency samples repeat heavily
+            uniq, counts = np.unique(values.astype(np.int64), return_counts=True)
+            for v, c in zip(uniq.tolist(), counts.tolist()):
+                self.record(v, c)
+            return
+        for v in values:
+            self.record(v)
+
+    def merge(self, other):
+        """Add other's counts into this histogram."""
+        if not other.count:
+            return self
+        if self.same_layout(other):
+            counts = self.counts
+            for i, c in enumerate(other.counts):
+                if c:
+                    counts[i] += c
+        else:
+            for i, c in enumerate(other.counts):
+                if c:
+                    self.counts[self._index(min(self.median_equivalent(other._value_at_index(i)),
+                                                self.highest))] += c
+        self.count += other.count
+        self.total += other.total
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+        return self
+
+    # -- queries ----------------------------------------------------------
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def _bucket_sampler(self, index, n):
+        """sample(j) for the n values of one bucket, spread evenly over its range within [min, max]."""
+        low = self._value_at_index(index)
+        lo = max(low, self.min)
+        hi = min(low + self._bucket_size(low) - 1, self.max)
+        if n == 1:
+            # the lowest bucket's only sample is min, the highest's is max
+            only = lo if lo == self.min else hi if hi == self.max else (lo + hi) / 2.0
+            return lambda j: only
+        return lambda j: lo + (hi - lo) * j / (n - 1)
+
+    def percentiles(self, ps=DEFAULT_PERCENTILES):
+        """latency_stats' interpolated percentile for every p in ps, from one walk over the counts."""
+        buckets = ((c, self._bucket_sampler(index, c)) for index, c in enumerate(self.counts) if c)
+        return histogram_percentiles(buckets, self.count, ps)
+
+    def value_at_percentile(self, p):
+        return self.percentiles((p,))[0]
+
+    def summarize(self, ps=DEFAULT_PERCENTILES, scale=1.0):
+        """Same keys as latency_stats.summarize(), values multiplied by scale."""
+        out = {'count': self.count, 'mean': self.mean() * scale,
+               'max': (self.max if self.max is not None else 0) * scale}
+        for p, value in zip(ps, self.percentiles(ps)):
+            out[f'p{p:g}'] = value * scale
+        return out
+
+    # -- serialization ----------------------------------------------------
+
+    def encode(self):
+        """Compact bytes: header, then counts as zigzag varints with zero runs as -n, zlib."""
+        out = bytearray(_HEADER.pack(FORMAT_VERSION, self.significant_figures, self.lowest, self.highest,
+                                     self.min if self.min is not None else 0,
+                                     self.max if self.max is not None else -1, self.total))
+        last = max((i for i, c in enumerate(self.counts) if c), default=-1)
+        zeros = 0
+        for c in self.counts[:last + 1]:
+            if c:
+                if zeros:
+                    _zigzag_varint(-zeros, out)
+                    zeros = 0
+                _zigzag_varint(c, out)
+            else:
+                zeros += 1
+        return zlib.compress(bytes(out), 9)
+
+    @classmethod
+    def decode(cls, blob):
+        data = zlib.decompress(blob)
+        version, digits, lowest, highest, vmin, vmax, total = _HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f'unsupported histogram encoding version {version}')
+        h = cls(lowest, highest, digits)
+        i = 0
+        for n in _read_varints(data, _HEADER.size):
+            if n < 0:
+                i -= n
+            else:
+                h.counts[i] = n
+                h.count += n
+                i += 1
+        if h.count:
+            h.min, h.max, h.total = vmin, vmax, total
+        return h
+
+
+def hist_path(path):
+    """`results/x.csv` or `results/x.cols` -> `results/x.hdr.json`."""
+    root, ext = os.path.splitext(path)
+    return (root if ext in ('.csv', '.cols') else path) + SUFFIX
+
+
+def save(hists, path, meta=None):
+    """Write {name: HdrHistogram} (+ meta) for the output at `path`; returns the file."""
+    out = path if path.endswith(SUFFIX) else hist_path(path)
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    doc = {'format': 'hdr', 'version': FORMAT_VERSION, 'meta': meta or {},
+           'histograms': {name: base64.b64encode(h.encode()).decode('ascii') for name, h in hists.items()}}
+    with open(out, 'w') as f:
+        json.dump(doc, f, indent=1)
+    return out
+
+
+def load(path):
+    """({name: HdrHistogram}, meta) from a .hdr.json file (or the output it belongs to)."""
+    with open(path if path.endswith(SUFFIX) else hist_path(path)) as f:
+        doc = json.load(f)
+    if doc.get('format') != 'hdr':
+        raise ValueError(f'{path}: not a histogram file')
+    hists = {name: HdrHistogram.decode(base64.b64decode(blob)) for name, blob in doc['histograms'].items()}
+    return hists, doc.get('meta', {})
+
+
+def merge_files(paths):
+    """Merge same-named histograms across files -> ({name: HdrHistogram}, [meta...])."""
+    merged = {}
+    metas = []
+    for path in paths:
+        hists, meta = load(path)
+        metas.append(meta)
+        for name, h in hists.items():
+            if name in merged:
+                merged[name].merge(h)
+            else:
+                merged[name] = h
+    return merged, metas
+
+
+def main():
+    p = argparse.ArgumentParser(description='Merge HDR latency histograms and report quantiles')
+    p.add_argument('files', nargs='+', help='.hdr.json files written by the jitter/comm tools')
+    p.add_argument('-p', '--percentiles', default='50,90,99,99.9,99.99,100',
+                   help='Comma-separated percentiles (default: 50,90,99,99.9,99.99,100)')
+    p.add_argument('--unit', choices=['us', 'ms'], default='ms', help='Report unit (histograms hold µs)')
+    p.add_argument('-o', '--out', help='Write the merged histograms to this .hdr.json file')
+    args = p.parse_args()
+
+    ps = [float(v) for v in args.percentiles.split(',') if v.strip()]
+    scale = 1.0 if args.unit == 'us' else 0.001
+    merged, metas = merge_files(args.files)
+
+    print(f"{len(args.files)} file(s), {len(merged)} histogram(s), values in {args.unit}")
+    width = max((len(n) for n in merged), default=4)
+    print(f"{'name':<{width}} {'count':>10} {'mean':>10} " + ' '.join(f"{'p%g' % v:>10}" for v in ps))
+    for name in sorted(merged):
+        s = merged[name].summarize(ps, scale)
+        print(f"{name:<{width}} {s['count']:>10} {s['mean']:>10.3f} " +
+              ' '.join(f"{s['p%g' % v]:>10.3f}" for v in ps))
+    if args.out:
+        runs = [m for m in metas if m]
+        print(f"Wrote {save(merged, args.out, {'merged_from': args.files, 'runs': runs})}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+HTTP uplink benchmark (comm_instrument.py --transport http): the
+firmware's Supabase telemetry insert against a local PostgREST stand-in.
+
+NetworkTask (src/main.cpp) does, per row:
+  http.begin(SUPABASE_URL/rest/v1/telemetry) -> POST one JSON row with
+  Prefer: return=representation -> getString() -> http.end()
+i.e. a new TCP + TLS connection per row and the whole inserted row read
+back. The client here replays that and the alternatives (STRATEGIES):
+
+  per-request   new connection per row, return=representation (firmware)
+  keepalive     persistent connections (--http-pool of them)
+  minimal       keepalive + Prefer: return=minimal (201, empty body)
+  batch         minimal + up to --http-batch-rows rows per POST (JSON array)
+  batch-gzip    batch + Content-Encoding: gzip request bodies
+
+Rows are produced on a fixed schedule (--interval-ms, 0 = all at once for
+a throughput run); a sender takes every row that is due, up to the batch
+size, so batching only waits for rows that already exist. Row latency is
+production (T1) -> response read; request latency is send -> response.
+
+Bytes per row count what crosses the socket in HTTP: request line, headers
+and body out, status line, headers and body in (not TCP/TLS overhead), as
+headers are most of what batching and return=minimal save.
+
+StandInServer answers POST /rest/v1/<table> like PostgREST (201, the rows
+with id/created_at for return=representation) and charges what a local
+socket does not cost, by sleeping in the connection's thread:
+  every request      one RTT + (request + response bytes) / uplink rate
+                     + an insert latency (delay spec, see impairment.py)
+                     + PER_ROW_MS per row
+  every connection   HANDSHAKE_RTTS more RTTs (TCP + TLS 1.2) + --http-tls-ms
+                     (mbedTLS key exchange on the ESP32 takes hundreds of ms)
+"""
+import gzip
+import http.client
+import http.server
+import json
+import random
+import socket
+import threading
+import time
+
+import impairment
+
+RTT_MS = 20.0                 # Wi-Fi -> cloud round trip
+UPLINK_KBPS = 2000.0          # bytes on the wire are charged at this rate
+HANDSHAKE_RTTS = 3            # TCP (1) + TLS 1.2 full handshake (2)
+TLS_MS = 0.0                  # device-side TLS crypto per connection
+INSERT_LATENCY = 'lognormal:4:0.5'  # PostgREST + Postgres commit (ms)
+PER_ROW_MS = 0.05
+BATCH_ROWS = 20
+TABLE = 'telemetry'
+
+STRATEGIES = {
+    'per-request': {'keepalive': False, 'minimal': False, 'batch': False, 'gzip': False},
+    'keepalive': {'keepalive': True, 'minimal': False, 'batch': False, 'gzip': False},
+    'minimal': {'keepalive': True, 'minimal': True, 'batch': False, 'gzip': False},
+    'batch': {'keepalive': True, 'minimal': True, 'batch': True, 'gzip': False},
+    'batch-gzip': {'keepalive': True, 'minimal': True, 'batch': True, 'gzip': True},
+}
+
+now_us = lambda: int(time.time()*1_000_000)
+
+
+def telemetry_row(seq, rng=random):
+    """One row as NetworkTask builds it (populateStatus() + valves)."""
+    return {'seq': seq, 'airTemp': round(rng.uniform(24, 34), 1), 'airHum': round(rng.uniform(50, 90), 1),
+            'soil': [rng.randint(20, 80) for _ in range(3)], 'pumpOn': rng.randint(0, 1),
+            'forecastTemp': 30.5, 'forecastHum': 72.0, 'forecast3Temp': 31.2, 'forecast3Hum': 70.0,
+            'forecastLight': 850.0, 'rainSoon': 0, 'nextIrrigationMs': 3600, 'mode': 0, 'valves': []}
+
+
+# -- stand-in server -------------------------------------------------------
+
+class _PostgrestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive unless the client says close
+
+    def setup(self):
+        super().setup()
+        # headers and body are separate writes: without NODELAY, Nagle + delayed ACK add ~40 ms
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.handshake_due = True
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _head(self, code, body):
+        """Buffer the status line and headers (sent by _send()); returns their bytes on the wire."""
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        return sum(len(line) for line in self._headers_buffer) + 2  # + the blank line
+
+    def _send(self, body):
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _reply(self, code, body=b''):
+        self._head(code, body)
+        self._send(body)
+
+    def do_POST(self):
+        srv = self.server
+        received = time.perf_counter()
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+        if not self.path.startswith('/rest/v1/'):
+            self._reply(404, b'{"message":"not found"}')
+            return
+        try:
+            body = gzip.decompress(raw) if self.headers.get('Content-Encoding') == 'gzip' else raw
+            doc = json.loads(body)
+        except (OSError, ValueError):
+            self._reply(400, b'{"message":"bad request body"}')
+            return
+        rows = doc if isinstance(doc, list) else [doc]
+        with srv.lock:
+            first = srv.next_id
+            srv.next_id += len(rows)
+            srv.stats['requests'] += 1
+            srv.stats['rows'] += len(rows)
+            insert_us = srv.insert_delay()
+        if 'return=representation' in self.headers.get('Prefer', ''):
+            created = time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime())
+            resp = json.dumps([dict(r, id=first + i, created_at=created) for i, r in enumerate(rows)]).encode()
+        else:
+            resp = b''
+        head = self._head(201, resp)
+        wire_bytes = len(self.requestline) + 2 + len(str(self.headers)) + len(raw) + head + len(resp)
+        cost_s = (srv.rtt_ms / 1000.0 + wire_bytes * 8 / (srv.kbps * 1000.0)
+                  + insert_us / 1e6 + len(rows) * PER_ROW_MS / 1000.0)
+        if self.handshake_due:
+            self.handshake_due = False
+            cost_s += (HANDSHAKE_RTTS * srv.rtt_ms + srv.tls_ms) / 1000.0
+        time.sleep(max(0.0, cost_s - (time.perf_counter() - received)))
+        self._send(resp)
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    """Local PostgREST stand-in: one thread per connection, emulated network and insert cost."""
+
+    daemon_threads = True
+
+    def __init__(self, port, rtt_ms=RTT_MS, kbps=UPLINK_KBPS, tls_ms=TLS_MS, insert_latency=INSERT_LATENCY,
+                 seed=None):
+        super().__init__(('0.0.0.0', port), _PostgrestHandler)
+        self.rtt_ms = rtt_ms
+        self.kbps = kbps
+        self.tls_ms = tls_ms
+        self.insert_delay = impairment.delay_sampler(insert_latency, random.Random(seed))
+        self.config = {'rtt_ms': rtt_ms, 'kbps': kbps, 'handshake_rtts': HANDSHAKE_RTTS, 'tls_ms': tls_ms,
+                       'insert_latency': insert_latency, 'per_row_ms': PER_ROW_MS}
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.stats = {'connections': 0, 'requests': 0, 'rows': 0}
+
+
+# -- client ----------------------------------------------------------------
+
+class _CountingConnection(http.client.HTTPConnection):
+    """HTTPConnection that counts the bytes it sends (request line, headers, body)."""
+
+    sent = 0
+
+    def send(self, data):
+        self.sent += len(data)
+        super().send(data)
+
+
+def response_bytes(resp, body):
+    """Status line + headers + body of a response as received."""
+    status = len(f'HTTP/1.1 {resp.status} {resp.reason}\r\n')
+    return status + sum(len(k) + len(v) + 4 for k, v in resp.getheaders()) + 2 + len(body)
+
+
+class UplinkClient:
+    """One pool member: a connection (kept or per request) to the stand-in."""
+
+    def __init__(self, target, port, strategy, timeout_s, table=TABLE):
+        self.target = target
+        self.port = port
+        self.opts = STRATEGIES[strategy]
+        self.timeout_s = timeout_s
+        self.path = f'/rest/v1/{table}'
+        self.conn = None
+        self.connections = 0
+        self.bytes_out = self.bytes_in = 0
+
+    def _connection(self):
+        if self.conn is None:
+            self.conn = _CountingConnection(self.target, self.port, timeout=self.timeout_s)
+            self.connections += 1
+        return self.conn
+
+    def post(self, rows):
+        """POST rows (one object, or an array when batching); returns the HTTP status."""
+        body = json.dumps(rows if self.opts['batch'] else rows[0], separators=(',', ':')).encode()
+        headers = {'Content-Type': 'application/json', 'apikey': 'anon', 'Authorization': 'Bearer anon',
+                   'Prefer': 'return=minimal' if self.opts['minimal'] else 'return=representation'}
+        if self.opts['gzip']:
+            body = gzip.compress(body, 6)
+            headers['Content-Encoding'] = 'gzip'
+        if not self.opts['keepalive']:
+            headers['Connection'] = 'close'
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.request('POST', self.path, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()  # getString(): the whole body is read either way
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # a kept connection the server closed meanwhile: reconnect once
+                self.bytes_out += conn.sent
+                self.close()
+                if attempt == 2 or not self.opts['keepalive']:
+                    raise
+            except (OSError, http.client.HTTPException):
+                # timeout or broken response: the connection is unusable mid-request
+                self.bytes_out += conn.sent
+                self.close()
+                raise
+        self.bytes_out += conn.sent
+        conn.sent = 0
+        self.bytes_in += response_bytes(resp, data)
+        if not self.opts['keepalive'] or resp.will_close:
+            self.close()
+        return resp.status
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def run_strategy(target, port, strategy, count, interval_ms, pool=1, batch_rows=BATCH_ROWS, timeout_ms=5000,
+                 hists=None, seed=1):
+    """
+    Upload `count` rows with one strategy over `pool` concurrent senders.
+    hists = (row latency, request latency) HdrHistograms, µs.
+    Returns a summary dict (requests, connections, errors, bytes, elapsed).
+    """
+    batch = batch_rows if STRATEGIES[strategy]['batch'] else 1
+    rng = random.Random(seed)
+    rows = [telemetry_row(i + 1, rng) for i in range(count)]
+    row_hist, req_hist = hists
+    lock = threading.Lock()
+    state = {'next': 0, 'requests': 0, 'errors': 0}
+    clients = [UplinkClient(target, port, strategy, timeout_ms / 1000.0) for _ in range(pool)]
+    start_us = now_us() + 1000
+    due_us = lambda i: start_us + int(i * interval_ms * 1000)
+
+    def sender(client):
+        while True:
+            with lock:
+                first = state['next']
+                if first >= count:
+                    return
+                wait_us = due_us(first) - now_us()
+                if wait_us <= 0:
+                    last = first + 1
+                    while last < count and last - first < batch and due_us(last) <= now_us():
+                        last += 1
+                    state['next'] = last
+            if wait_us > 0:
+                time.sleep(wait_us / 1e6)
+                continue
+            t_send = now_us()
+            try:
+                status = client.post(rows[first:last])
+                ok = 200 <= status < 300
+            except (OSError, http.client.HTTPException):
+                ok = False
+            t_done = now_us()
+            with lock:
+                state['requests'] += 1
+                if not ok:
+                    state['errors'] += last - first
+                    continue
+                req_hist.record(t_done - t_send)
+                for i in range(first, last):
+                    row_hist.record(t_done - due_us(i))
+
+    threads = [threading.Thread(target=sender, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed_s = (now_us() - start_us) / 1e6
+    for c in clients:
+        c.close()
+    return {'requests': state['requests'], 'errors': state['errors'], 'elapsed_s': elapsed_s,
+            'connections': sum(c.connections for c in clients),
+            'bytes_out': sum(c.bytes_out for c in clients), 'bytes_in': sum(c.bytes_in for c in clients)}
@@ -0,0 +1,241 @@
+"""
+Network impairment pipeline for the echo server (a local netem stand-in).
+
+Every received datagram goes through the stages in this order, like a
+Wi-Fi uplink: the radio loses it, the bottleneck queues it, the path
+delays it, and the far end may see it twice:
+
+  loss      Gilbert-Elliott two-state chain (bursty) or independent drops
+  rate      token bucket (--rate-kbps, --rate-burst-bytes); a packet that
+            would wait longer than --rate-queue-ms is tail-dropped
+  delay     a distribution spec (below), or delays replayed from a trace
+  reorder   with --reorder-prob a packet is held --reorder-gap-ms longer,
+            so the packets behind it overtake it
+  duplicate with --dup-prob a second copy is sent DUP_GAP_US later
+
+Nothing blocks: Impairment.schedule() turns one arrival into the list
+of times at which its echoes are due, and the server keeps those on its
+delay heap. The injected time (due - receive) is what the echo reports
+as DLY, so srv_proc_us stays the server's own cost.
+
+Delay specs (ms):
+  const:D               always D
+  uniform:LO:HI         uniform in [LO, HI]
+  normal:MEAN:SD        clipped at 0
+  lognormal:MEDIAN:SIGMA   heavy right tail (Wi-Fi retransmissions)
+  pareto:MIN:ALPHA      heavier tail, alpha <= 2 has infinite variance
+  trace:PATH            one delay per line (first CSV field, header and
+                        '#' lines skipped), replayed in order and looped
+
+Gilbert-Elliott (--loss-ge P,R[,BAD_LOSS[,GOOD_LOSS]], netem's gemodel):
+P = P(good -> bad) and R = P(bad -> good) per packet, so bursts last
+1/R packets on average and the stationary loss rate is
+(P*BAD_LOSS + R*GOOD_LOSS) / (P + R). BAD_LOSS defaults to 1, GOOD_LOSS to 0.
+
+PROFILES bundles typical settings (--impair wifi); explicit flags
+override a profile's values, and an explicit drop probability replaces
+its Gilbert-Elliott loss.
+"""
+import math
+import random
+
+DUP_GAP_US = 50  # spacing of a duplicate behind the original
+
+PROFILES = {
+    # 2.4 GHz home Wi-Fi: short loss bursts, lognormal delay, some reordering
+    'wifi': {'loss_ge': (0.01, 0.3, 1.0, 0.0), 'delay': 'lognormal:4:0.6',
+             'reorder_prob': 0.01, 'reorder_gap_ms': 5.0, 'dup_prob': 0.001},
+    # congested AP: long bursts, heavy-tailed delay, 1 Mbit/s bottleneck
+    'congested': {'loss_ge': (0.02, 0.1, 0.9, 0.005), 'delay': 'pareto:10:1.5',
+                  'reorder_prob': 0.02, 'reorder_gap_ms': 20.0, 'dup_prob': 0.002,
+                  'rate_kbps': 1000.0, 'rate_burst_bytes': 3000, 'rate_queue_ms': 200.0},
+}
+
+
+def parse_ge(text):
+    """'P,R[,BAD_LOSS[,GOOD_LOSS]]' -> (p, r, bad_loss, good_loss)."""
+    values = [float(v) for v in text.split(',')]
+    if not 2 <= len(values) <= 4 or not all(0.0 <= v <= 1.0 for v in values):
+        raise ValueError(f'bad Gilbert-Elliott spec {text!r}: need P,R[,BAD_LOSS[,GOOD_LOSS]] in [0, 1]')
+    return tuple(values + [1.0, 0.0][len(values) - 2:])
+
+
+class GilbertElliott:
+    """Two-state burst-loss chain; lost() advances it by one packet."""
+
+    def __init__(self, p, r, bad_loss=1.0, good_loss=0.0, rng=random):
+        self.p, self.r, self.bad_loss, self.good_loss = p, r, bad_loss, good_loss
+        self.rng = rng
+        self.bad = False
+
+    def lost(self):
+        if self.rng.random() < (self.r if self.bad else self.p):
+            self.bad = not self.bad
+        return self.rng.random() < (self.bad_loss if self.bad else self.good_loss)
+
+    def loss_rate(self):
+        if self.p + self.r == 0:
+            return self.good_loss
+        return (self.p * self.bad_loss + self.r * self.good_loss) / (self.p + self.r)
+
+
+class Bernoulli:
+    """Independent drops with probability prob (the old --drop-prob)."""
+
+    def __init__(self, prob, rng=random):
+        self.prob = prob
+        self.rng = rng
+
+    def lost(self):
+        return self.prob > 0.0 and self.rng.random() < self.prob
+
+    def loss_rate(self):
+        return self.prob
+
+
+def load_trace(path):
+    """Delays in ms from a trace file -> list of µs."""
+    delays = []
+    with open(path) as f:
+        for line in f:
+            field = line.split(',')[0].strip()
+            if not field or field.startswith('#'):
+                continue
+            try:
+                delays.append(int(float(field) * 1000))
+            except ValueError:  # header
+                continue
+    if not delays:
+        raise ValueError(f'{path}: no delays found')
+    return delays
+
+
+def delay_sampler(spec, rng=random):
+    """Delay spec (see module docstring) -> function returning one delay in µs."""
+    kind, _, rest = spec.partition(':')
+    if kind == 'trace':
+        delays = load_trace(rest)
+        position = [0]
+
+        def replay():
+            d = delays[position[0] % len(delays)]
+            position[0] += 1
+            return d
+        return replay
+    try:
+        args = [float(v) for v in rest.split(':')] if rest else []
+    except ValueError:
+        raise ValueError(f'bad delay spec {spec!r}') from None
+    samplers = {
+        'const': (1, lambda d: d),
+        'uniform': (2, lambda lo, hi: rng.uniform(lo, hi)),
+        'normal': (2, lambda mean, sd: max(0.0, rng.gauss(mean, sd))),
+        'lognormal': (2, lambda median, sigma: rng.lognormvariate(math.log(median), sigma)),
+        'pareto': (2, lambda xmin, alpha: xmin * rng.paretovariate(alpha)),
+    }
+    if kind not in samplers or len(args) != samplers[kind][0]:
+        raise ValueError(f'bad delay spec {spec!r}: use const:D, uniform:LO:HI, normal:MEAN:SD, '
+                         f'lognormal:MEDIAN:SIGMA, pareto:MIN:ALPHA or trace:PATH (ms)')
+    fn = samplers[kind][1]
+    return lambda: int(fn(*args) * 1000)
+
+
+class TokenBucket:
+    """FIFO token-bucket shaper: departure time of each packet, or None when the queue is full."""
+
+    def __init__(self, rate_kbps, burst_bytes=1500, queue_ms=100.0):
+        self.rate = rate_kbps * 1000 / 8 / 1e6  # bytes per µs
+        self.burst = burst_bytes
+        self.queue_us = queue_ms * 1000
+        self.tokens = float(burst_bytes)
+        self.t = None            # time the token count refers to
+        self.last_departure = 0
+
+    def admit(self, now, size):
+        start = max(now, self.last_departure)
+        tokens = self.burst if self.t is None else min(self.burst, self.tokens + (start - self.t) * self.rate)
+        depart = start if tokens >= size else start + (size - tokens) / self.rate
+        if depart - now > self.queue_us:
+            return None
+        self.tokens = max(tokens - size, 0.0)
+        self.t = depart
+        self.last_departure = depart
+        return int(depart)
+
+
+class Impairment:
+    """The server's impairment pipeline; schedule() -> due times (µs) of one arrival's echoes."""
+
+    def __init__(self, loss_ge=None, drop_prob=0.0, delay=None, reorder_prob=0.0, reorder_gap_ms=10.0,
+                 dup_prob=0.0, rate_kbps=None, rate_burst_bytes=1500, rate_queue_ms=100.0, seed=None):
+        self.config = {'loss_ge': loss_ge, 'drop_prob': drop_prob, 'delay': delay,
+                       'reorder_prob': reorder_prob, 'reorder_gap_ms': reorder_gap_ms, 'dup_prob': dup_prob,
+                       'rate_kbps': rate_kbps, 'rate_burst_bytes': rate_burst_bytes,
+                       'rate_queue_ms': rate_queue_ms, 'seed': seed}
+        self.rng = random.Random(seed)
+        if loss_ge:
+            self.config['drop_prob'] = 0.0  # GE loss replaces independent drops
+        self.loss = GilbertElliott(*loss_ge, rng=self.rng) if loss_ge else Bernoulli(drop_prob, self.rng)
+        self.delay = delay_sampler(delay, self.rng) if delay else None
+        self.shaper = TokenBucket(rate_kbps, rate_burst_bytes, rate_queue_ms) if rate_kbps else None
+        self.reorder_prob = reorder_prob
+        self.reorder_gap_us = int(reorder_gap_ms * 1000)
+        self.dup_prob = dup_prob
+        self.counts = {'lost': 0, 'rate_dropped': 0, 'reordered': 0, 'duplicated': 0}
+
+    @classmethod
+    def from_profile(cls, name, **overrides):
+        settings = dict(PROFILES[name]) if name else {}
+        overrides = {k: v for k, v in overrides.items() if v is not None}
+        if 'drop_prob' in overrides and 'loss_ge' not in overrides:
+            settings.pop('loss_ge', None)  # an explicit drop probability replaces the profile's GE loss
+        settings.update(overrides)
+        return cls(**settings)
+
+    def reseed(self, worker):
+        """Independent streams per server worker process."""
+        self.rng.seed(None if self.config['seed'] is None else f"{self.config['seed']}:{worker}")
+
+    def passthrough(self):
+        return not (self.config['loss_ge'] or self.config['drop_prob'] or self.delay or self.shaper
+                    or self.reorder_prob or self.dup_prob)
+
+    def schedule(self, now, size):
+        """Due times for the echoes of a datagram received at `now` ([] = dropped)."""
+        if self.loss.lost():
+            self.counts['lost'] += 1
+            return []
+        due = now
+        if self.shaper:
+            due = self.shaper.admit(now, size)
+            if due is None:
+                self.counts['rate_dropped'] += 1
+                return []
+        if self.delay:
+            due += self.delay()
+        if self.reorder_prob and self.rng.random() < self.reorder_prob:
+            self.counts['reordered'] += 1
+            due += self.reorder_gap_us
+        if self.dup_prob and self.rng.random() < self.dup_prob:
+            self.counts['duplicated'] += 1
+            return [due, due + DUP_GAP_US]
+        return [due]
+
+    def describe(self):
+        c = self.config
+        parts = []
+        if c['loss_ge']:
+            p, r, bad, good = c['loss_ge']
+            parts.append(f'GE loss p={p:g} r={r:g} bad={bad:g} good={good:g} (~{self.loss.loss_rate()*100:.1f}%, '
+                         f'mean burst {1/r if r else float("inf"):.1f} pkts)')
+        elif c['drop_prob']:
+            parts.append(f'drop {c["drop_prob"]*100:g}%')
+        if self.shaper:
+            parts.append(f'rate {c["rate_kbps"]:g}kbit/s burst {c["rate_burst_bytes"]}B queue {c["rate_queue_ms"]:g}ms')
+        if c['delay']:
+            parts.append(f'delay {c["delay"]}')
+        if self.reorder_prob:
+            parts.append(f'reorder {self.reorder_prob*100:g}% +{c["reorder_gap_ms"]:g}ms')
+        if self.dup_prob:
+            parts.append(f'dup {self.dup_prob*100:g}%')
+        return ', '.join(parts) or 'none'
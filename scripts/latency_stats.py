@@ -0,0 +1,173 @@
+"""
+Shared percentile statistics for the simulators and log analyzers.
+
+Every script reports percentiles with the same definition, the linear
+interpolation between closest ranks (NumPy's default 'linear' method):
+
+  k = (n - 1) * p / 100
+  value = x[floor(k)] + (x[ceil(k)] - x[floor(k)]) * (k - floor(k))
+
+on the sorted samples x. p50 is therefore the median, and p100 the max.
+
+- pct(): one percentile of an already sorted sequence.
+- percentiles(): several percentiles from a single sort, or from one
+  np.percentile() (partition-based) call for arrays and large lists.
+- summarize(): count / mean / max plus percentiles in one call.
+- histogram_percentiles(): the same rule over samples held in histogram
+  buckets (LatencyHistogram here, hdr_histogram.HdrHistogram), so every
+  histogram reports the percentiles a sort of its samples would.
+- LatencyHistogram: fixed-width, exact-count histogram that merges by
+  adding counts, for streamed runs and multi-file aggregation.
+"""
+try:
+    import numpy as np
+except ImportError:  # optional: pure-Python sort path is used instead
+    np = None
+
+DEFAULT_PERCENTILES = (50, 95, 99)
+
+# Lists at least this long go through NumPy when it is available
+NUMPY_MIN_SAMPLES = 10000
+
+
+def pct(data, p):
+    """Linear-interpolated percentile of an already sorted sequence."""
+    if not len(data): return 0
+    k = (len(data)-1) * (p/100.0)
+    f = int(k)
+    c = min(f+1, len(data)-1)
+    if f == c:
+        return data[int(k)]
+    d0 = data[f] * (c-k)
+    d1 = data[c] * (k-f)
+    return d0 + d1
+
+
+def percentiles(data, ps=DEFAULT_PERCENTILES, presorted=False):
+    """Percentiles for every p in ps; the data is sorted at most once."""
+    if not len(data):
+        return [0] * len(ps)
+    if presorted:
+        return [pct(data, p) for p in ps]
+    if np is not None and (isinstance(data, np.ndarray) or len(data) >= NUMPY_MIN_SAMPLES):
+        return np.percentile(np.asarray(data, dtype=np.float64), ps).tolist()
+    data = sorted(data)
+    return [pct(data, p) for p in ps]
+
+
+def summarize(data, ps=DEFAULT_PERCENTILES):
+    """{'count', 'mean', 'max', 'p<p>'...} of a sample; zeros when empty."""
+    n = len(data)
+    out = {'count': n, 'mean': 0.0, 'max': 0}
+    if n:
+        if np is not None and isinstance(data, np.ndarray):
+            out['mean'], out['max'] = float(data.mean()), float(data.max())
+        else:
+            out['mean'], out['max'] = sum(data) / n, max(data)
+    for p, value in zip(ps, percentiles(data, ps)):
+        out[f'p{p:g}'] = value
+    return out
+
+
+def histogram_percentiles(buckets, count, ps=DEFAULT_PERCENTILES):
+    """pct() for every p in ps over `count` samples held in histogram buckets.
+
+    buckets yields (n, sample) in ascending value order, where sample(j) is
+    the j-th smallest (0-based) of the bucket's n values; it is only called
+    for the ranks pct() interpolates between, in one walk.
+    """
+    if not count:
+        return [0] * len(ps)
+    wanted = {}
+    for p in ps:
+        k = (count - 1) * (p / 100.0)
+        wanted[int(k)] = None
+        wanted[min(int(k) + 1, count - 1)] = None
+    ranks = sorted(wanted)
+    seen = 0
+    r = 0
+    for n, sample in buckets:
+        while r < len(ranks) and ranks[r] < seen + n:
+            wanted[ranks[r]] = sample(ranks[r] - seen)
+            r += 1
+        seen += n
+        if r == len(ranks):
+            break
+    out = []
+    for p in ps:
+        k = (count - 1) * (p / 100.0)
+        f = int(k)
+        c = min(f + 1, count - 1)
+        out.append(wanted[f] if f == c else wanted[f] * (c - k) + wanted[c] * (k - f))
+    return out
+
+
+class LatencyHistogram:
+    """Exact-count histogram of millisecond values in fixed-width µs buckets.
+
+    Memory depends on the spread of values, not on how many were recorded,
+    and two histograms with the same bucket width merge by adding counts.
+    Percentiles use the same interpolation as pct(), on bucket values.
+    """
+
+    def __init__(self, bucket_us=1):
+        self.bucket_ms = bucket_us / 1000.0
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+
+    def add(self, value_ms):
+        idx = int(round(value_ms / self.bucket_ms))
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.count += 1
+        self.total += value_ms
+        if self.max is None or value_ms > self.max:
+            self.max = value_ms
+
+    def add_many(self, values):
+        if not len(values):
+            return
+        counts = self.counts
+        if np is not None and isinstance(values, np.ndarray):
+            idx, n = np.unique(np.rint(values / self.bucket_ms).astype(np.int64), return_counts=True)
+            for i, c in zip(idx.tolist(), n.tolist()):
+                counts[i] = counts.get(i, 0) + c
+            top = float(values.max())
+            self.total += float(values.sum())
+        else:
+            width = self.bucket_ms
+            for v in values:
+                i = int(round(v / width))
+                counts[i] = counts.get(i, 0) + 1
+            top = max(values)
+            self.total += sum(values)
+        self.count += len(values)
+        if self.max is None or top > self.max:
+            self.max = top
+
+    def merge(self, other):
+        if other.bucket_ms != self.bucket_ms:
+            raise ValueError('cannot merge histograms with different bucket widths')
+        for i, c in other.counts.items():
+            self.counts[i] = self.counts.get(i, 0) + c
+        self.count += other.count
+        self.total += other.total
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentiles(self, ps=DEFAULT_PERCENTILES):
+        """Percentiles for every p in ps from one walk over the buckets."""
+        width = self.bucket_ms
+        buckets = ((self.counts[idx], lambda j, v=idx * width: v) for idx in sorted(self.counts))
+        return histogram_percentiles(buckets, self.count, ps)
+
+    def summarize(self, ps=DEFAULT_PERCENTILES):
+        """Same keys as summarize(), from the histogram."""
+        out = {'count': self.count, 'mean': self.mean(), 'max': self.max if self.max is not None else 0}
+        for p, value in zip(ps, self.percentiles(ps)):
+            out[f'p{p:g}'] = value
+        return out
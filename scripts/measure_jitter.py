@@ -9,21 +9,57 @@ Run:
         python scripts/measure_jitter.py --mode normal
     Overload/burst:
         python scripts/measure_jitter.py --mode overload
+    Virtual time (không chờ thật, 1 giờ mô phỏng < 1s):
+        python scripts/measure_jitter.py --mode overload --virtual --sim-s 3600
+    Đo chính xác trên host (monotonic ns, ngủ tới thời điểm tuyệt đối):
+        python scripts/measure_jitter.py --mode normal --precise --cpu 2 --rt-prio 80
 
-Produces: CSV logs và các KPI p50/p95/p99/max cho từng task
+--virtual chạy cùng tập PeriodicTask và cửa sổ burst trên đồng hồ mô phỏng:
+work() và sleep() chỉ cộng thời gian, các tick rảnh được bỏ qua. Chế độ
+wall-clock mặc định vẫn dùng để đo chính máy host.
+
+--precise bỏ tick 10 ms: đọc time.perf_counter_ns() (CLOCK_MONOTONIC, số
+nguyên ns), ngủ tới đúng thời điểm release tuyệt đối (sleep gần tới rồi
+spin SPIN_US cuối), tắt GC trong lúc đo. --cpu ghim tiến trình vào một CPU
+(os.sched_setaffinity), --rt-prio xin SCHED_FIFO nếu được phép. Overhead
+của chính harness được ghi lại: cột overhead_us cho từng mẫu (thời gian từ
+lúc harness sẵn sàng tới lúc job thật sự bắt đầu), và hiệu chuẩn đồng hồ
+lúc khởi động (clock_calibration.py: chi phí đọc clock, sleep overshoot,
+sai số busy-wait) lưu trong meta .cols và file <log>.calib.json.
+
+Mỗi task ghi latency_us và overhead_us vào HDR histogram (hdr_histogram.py,
+độ chính xác --hdr-digits chữ số, ghi O(1), bộ nhớ cố định), lưu ở
+results/jitter_<mode>.hdr.json; KPI p50/p95/p99 được tính từ histogram.
+Log từng mẫu là tuỳ chọn: --format none chỉ giữ histogram, phù hợp cho
+soak test nhiều ngày. Gộp nhiều lần chạy / xem quantile bất kỳ:
+    python scripts/hdr_histogram.py results/jitter_normal.hdr.json -p 50,99,99.99
+
+Produces: CSV logs (và/hoặc bảng cột .cols, xem --format), histogram .hdr.json
+và các KPI p50/p95/p99/max cho từng task
 """
 import time
 import random
-import statistics
 import csv
 import argparse
+import gc
+import os
+
+import clock_calibration
+import columnar
+import hdr_histogram
 
 # Giá trị mặc định, sẽ được override theo --mode
 OUT_CSV = 'results/jitter_baseline.csv'
+OUT_FORMAT = 'both'  # csv, cols (columnar .cols table), both or none (histograms only)
+HDR_DIGITS = 3  # significant figures kept by the latency histograms
+
+SAMPLE_FIELDS = [('task', 's'), ('scheduled_us', 'q'), ('start_us', 'q'), ('latency_us', 'q'),
+                 ('exec_us', 'q'), ('deadline_ms', 'q'), ('result', 's'), ('overhead_us', 'q')]
 
 # Simulation params
 SIM_S = 60  # seconds
 TICK_MS = 10
+SPIN_US = 200  # --precise: busy-wait this long before each absolute release
 
 # Task definitions: (name, period_ms, nominal_work_ms, priority)
 TASKS = [
@@ -49,29 +85,118 @@ def work(duration_ms):
         pass
 
 
+class WallClock:
+    """Host clock: real busy-wait work and real sleeps."""
+
+    calibration_clock = 'time'
+
+    def now_us(self):
+        return now_us()
+
+    def work(self, duration_ms):
+        work(duration_ms)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class PreciseClock:
+    """Monotonic integer-ns clock with sleeps to absolute release times.
+
+    perf_counter_ns() is CLOCK_MONOTONIC on Linux: never steps, no float
+    conversion. sleep_until_us() sleeps to SPIN_US before the target and
+    spins the rest, so wake-up error does not accumulate across periods.
+    """
+
+    calibration_clock = 'perf_counter'
+
+    def now_us(self):
+        return time.perf_counter_ns() // 1000
+
+    def work(self, duration_ms):
+        target = time.perf_counter_ns() + int(duration_ms * 1_000_000)
+        while time.perf_counter_ns() < target:
+            pass
+
+    def sleep(self, seconds):
+        self.sleep_until_us(self.now_us() + int(seconds * 1_000_000))
+
+    def sleep_until_us(self, target_us):
+        target_ns = target_us * 1000
+        coarse_ns = target_ns - SPIN_US * 1000 - time.perf_counter_ns()
+        if coarse_ns > 0:
+            time.sleep(coarse_ns / 1e9)
+        while time.perf_counter_ns() < target_ns:
+            pass
+
+
+class VirtualClock:
+    """Simulated clock: work and sleeps advance time exactly and instantly."""
+
+    def __init__(self, start_us=0):
+        self.t_us = start_us
+
+    def now_us(self):
+        return self.t_us
+
+    def work(self, duration_ms):
+        self.t_us += int(duration_ms * 1000)
+
+    def sleep(self, seconds):
+        self.t_us += int(round(seconds * 1_000_000))
+
+
+def set_realtime(cpu=None, rt_prio=None):
+    """Pin to one CPU and/or request SCHED_FIFO; returns what was applied."""
+    notes = []
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {cpu})
+            notes.append(f'pinned to CPU {cpu}')
+        except (AttributeError, OSError) as e:
+            notes.append(f'CPU pinning unavailable ({e})')
+    if rt_prio is not None:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(rt_prio))
+            notes.append(f'SCHED_FIFO priority {rt_prio}')
+        except (AttributeError, OSError) as e:
+            notes.append(f'SCHED_FIFO not permitted ({e})')
+    return notes
+
+
 class PeriodicTask:
-    def __init__(self, name, period_ms, work_ms, prio):
+    def __init__(self, name, period_ms, work_ms, prio, clock=None):
         self.name = name
         self.period_ms = period_ms
         self.work_ms = work_ms
         self.prio = prio
+        self.clock = clock if clock is not None else WallClock()
         self.next_ms = 0
-        # (scheduled_us, actual_start_us, latency_us, exec_us, deadline_ms, result)
+        # (scheduled_us, actual_start_us, latency_us, exec_us, deadline_ms, result, overhead_us)
+        # kept only when a per-sample log is written
         self.samples = []
+        self.keep_samples = OUT_FORMAT != 'none'
+        self.latency = hdr_histogram.HdrHistogram(significant_figures=HDR_DIGITS)
+        self.overhead = hdr_histogram.HdrHistogram(significant_figures=HDR_DIGITS)
+        self.misses = 0
 
-    def schedule_if_due(self, now_ms, sim_start_s):
+    def schedule_if_due(self, now_ms, sim_start_us, ready_us=None):
+        """Run the job if due. ready_us is when the harness was free to start
+        it (wake-up or the previous job's end); start - ready_us is recorded
+        as harness overhead. Returns the job's end time, or ready_us."""
+        clock = self.clock
         if now_ms >= self.next_ms:
             # scheduled
-            scheduled_us = int(sim_start_s*1_000_000) + int(self.next_ms*1000)
+            scheduled_us = sim_start_us + int(self.next_ms*1000)
             # compute work with burst factor
             work_ms = self.work_ms
-            t_s = time.time() - sim_start_s
+            t_s = (clock.now_us() - sim_start_us) / 1_000_000
             if BURST_START_S <= t_s < BURST_END_S:
                 work_ms *= BURST_FACTOR
-            start_us = now_us()
-            exec_start = now_us()
-            work(work_ms)
-            exec_end = now_us()
+            start_us = clock.now_us()
+            exec_start = clock.now_us()
+            clock.work(work_ms)
+            exec_end = clock.now_us()
             latency_us = exec_start - scheduled_us
             exec_us = exec_end - exec_start
 
@@ -80,22 +205,53 @@ class PeriodicTask:
             deadline_us = scheduled_us + deadline_ms * 1000
             result = 'HIT' if exec_end <= deadline_us else 'MISS'
 
-            self.samples.append((scheduled_us, exec_start, latency_us, exec_us, deadline_ms, result))
+            overhead_us = exec_start - ready_us if ready_us is not None else 0
+            self.latency.record(latency_us)
+            self.overhead.record(overhead_us)
+            if result == 'MISS':
+                self.misses += 1
+            if self.keep_samples:
+                self.samples.append((scheduled_us, exec_start, latency_us, exec_us, deadline_ms, result, overhead_us))
             # schedule next
             self.next_ms += self.period_ms
+            return exec_end
+        return ready_us
 
 
-def run_sim():
-    start = time.time()
-    sim_start_s = start
-    tasks = [PeriodicTask(*t) for t in TASKS]
-    end_time = sim_start_s + SIM_S
-    while time.time() < end_time:
+def run_sim(virtual=False, precise=False):
+    clock = VirtualClock() if virtual else PreciseClock() if precise else WallClock()
+    # Calibrate before the run, so it does not perturb the measurement
+    calibration = None if virtual else clock_calibration.calibrate(clock.calibration_clock)
+    sim_start_us = clock.now_us()
+    tasks = [PeriodicTask(*t, clock=clock) for t in TASKS]
+    by_prio = sorted(tasks, key=lambda t: -t.prio)
+    end_us = sim_start_us + int(SIM_S * 1_000_000)
+    if precise:
+        gc.disable()  # no collector pauses inside the measurement
+    while clock.now_us() < end_us:
+        if precise:
+            # No tick: sleep to the next absolute release time
+            next_us = sim_start_us + int(min(t.next_ms for t in tasks) * 1000)
+            if next_us >= end_us:
+                break
+            clock.sleep_until_us(next_us)
         # Tính thời gian hiện tại theo "đồng hồ thực" của mô phỏng
-        now_ms = (time.time() - sim_start_s) * 1000.0
-        for task in tasks:
-            task.schedule_if_due(now_ms, sim_start_s)
-        time.sleep(TICK_MS / 1000.0)
+        wake_us = clock.now_us()
+        now_ms = (wake_us - sim_start_us) / 1000.0
+        if virtual:
+            # Idle ticks only sleep: jump straight to the first tick with a due task
+            # (integer µs, so float rounding of now_ms cannot overshoot a tick)
+            wait_us = sim_start_us + int(min(t.next_ms for t in tasks) * 1000) - wake_us
+            idle = -(-wait_us // (TICK_MS * 1000))
+            if idle > 0:
+                clock.sleep(idle * TICK_MS / 1000.0)
+                continue
+        ready_us = wake_us
+        for task in by_prio:
+            ready_us = task.schedule_if_due(now_ms, sim_start_us, ready_us)
+        if not precise:
+            clock.sleep(TICK_MS / 1000.0)
+    gc.enable()
 
     # gather samples
     rows = []
@@ -103,50 +259,84 @@ def run_sim():
         for s in task.samples:
             rows.append((task.name,) + s)
     # write csv
-    import os
     os.makedirs('results', exist_ok=True)
-    with open(OUT_CSV, 'w', newline='') as f:
-        w = csv.writer(f)
-        w.writerow(['task','scheduled_us','start_us','latency_us','exec_us','deadline_ms','result'])
-        for r in rows:
-            w.writerow(r)
+    if OUT_FORMAT in ('csv', 'both'):
+        with open(OUT_CSV, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow([name for name, _ in SAMPLE_FIELDS])
+            for r in rows:
+                w.writerow(r)
+    if OUT_FORMAT in ('cols', 'both'):
+        meta = {'burst_factor': BURST_FACTOR, 'sim_s': SIM_S, 'virtual': virtual, 'precise': precise,
+                'calibration': calibration}
+        with columnar.ColumnWriter(OUT_CSV, SAMPLE_FIELDS, meta=meta) as w:
+            for r in rows:
+                w.append(r)
 
-    # stats
+    hists = {}
     for task in tasks:
-        if not task.samples:
+        hists[f'{task.name}.latency_us'] = task.latency
+        hists[f'{task.name}.overhead_us'] = task.overhead
+    hdr_path = hdr_histogram.save(hists, OUT_CSV, meta={'burst_factor': BURST_FACTOR, 'sim_s': SIM_S,
+                                                        'virtual': virtual, 'precise': precise,
+                                                        'calibration': calibration})
+
+    # stats (from the histograms, so they do not need the per-sample log)
+    for task in tasks:
+        if not task.latency.count:
             continue
 
-        lat = [s[2] for s in task.samples]
-        lat_ms = [l/1000.0 for l in lat]
-        total = len(task.samples)
-        misses = sum(1 for s in task.samples if s[5] == 'MISS')
+        lat_ms = [v / 1000.0 for v in task.latency.percentiles((50, 95, 99, 100))]
+        if calibration:
+            lat_ms = clock_calibration.correct(lat_ms, calibration)
+        total = task.latency.count
+        misses = task.misses
         hits = total - misses
         miss_rate = misses / total if total else 0.0
 
+        p50, p95, p99, top = lat_ms
         print(f"Task {task.name}: samples={total} hits={hits} misses={misses} miss_rate={miss_rate*100:.1f}% "
-              f"p50={statistics.median(lat_ms):.3f}ms p95={percentile(lat_ms,95):.3f}ms "
-              f"p99={percentile(lat_ms,99):.3f}ms max={max(lat_ms):.3f}ms")
+              f"p50={p50:.3f}ms p95={p95:.3f}ms "
+              f"p99={p99:.3f}ms max={top:.3f}ms")
+    print(f"Histograms: {hdr_path} ({HDR_DIGITS} significant digits)")
 
-
-def percentile(data, p):
-    if not data:
-        return 0.0
-    data = sorted(data)
-    k = (len(data)-1) * (p/100.0)
-    f = int(k)
-    c = min(f+1, len(data)-1)
-    if f == c:
-        return data[int(k)]
-    d0 = data[f] * (c-k)
-    d1 = data[c] * (k-f)
-    return d0 + d1
+    if calibration:
+        clock_calibration.save(calibration, OUT_CSV)
+        overhead = hdr_histogram.HdrHistogram(significant_figures=HDR_DIGITS)
+        for task in tasks:
+            overhead.merge(task.overhead)
+        o50, o99 = overhead.percentiles((50, 99))
+        print(f"Harness: {clock_calibration.describe(calibration)}")
+        print(f"Harness: dispatch overhead p50={o50:.0f}us p99={o99:.0f}us (included in latency; see overhead_us), "
+              f"latency uncertainty +/-{clock_calibration.bound_us(calibration):.3f}us")
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Jitter simulator with normal/overload modes')
     parser.add_argument('--mode', choices=['normal', 'overload'], default='overload',
                         help='Simulation mode: normal (no burst) or overload (with burst)')
+    parser.add_argument('--format', choices=['csv', 'cols', 'both', 'none'], default=OUT_FORMAT,
+                        help='Sample log format: CSV, binary columnar .cols table, both, or none (histograms only)')
+    parser.add_argument('--hdr-digits', type=int, choices=range(1, 6), default=HDR_DIGITS,
+                        help=f'Significant digits of the latency histograms (default: {HDR_DIGITS})')
+    parser.add_argument('--virtual', action='store_true',
+                        help='Advance a simulated clock instead of sleeping/busy-waiting in real time')
+    parser.add_argument('--sim-s', type=float, default=SIM_S,
+                        help=f'Simulated seconds (default: {SIM_S})')
+    parser.add_argument('--precise', action='store_true',
+                        help='Monotonic ns clock and absolute-time sleeps instead of the 10 ms tick')
+    parser.add_argument('--spin-us', type=int, default=SPIN_US,
+                        help=f'--precise: busy-wait before each release (default: {SPIN_US})')
+    parser.add_argument('--cpu', type=int, default=None, help='Pin the process to this CPU')
+    parser.add_argument('--rt-prio', type=int, default=None,
+                        help='Request SCHED_FIFO with this priority (needs CAP_SYS_NICE/root)')
     args = parser.parse_args()
+    if args.virtual and args.precise:
+        parser.error('--virtual and --precise are mutually exclusive')
+    OUT_FORMAT = args.format
+    HDR_DIGITS = args.hdr_digits
+    SIM_S = args.sim_s
+    SPIN_US = args.spin_us
 
     # Cấu hình theo mode
     if args.mode == 'normal':
@@ -156,6 +346,10 @@ if __name__ == '__main__':
         OUT_CSV = 'results/jitter_overload.csv'
         BURST_FACTOR = 200  # giữ nguyên hệ số burst hiện tại
 
-    print(f"Running jitter simulation in {args.mode} mode → {OUT_CSV}")
-    run_sim()
-    print('Wrote', OUT_CSV)
+    for note in set_realtime(args.cpu, args.rt_prio):
+        print(f"Harness: {note}")
+    clock_desc = 'virtual' if args.virtual else 'precise' if args.precise else 'wall-clock'
+    print(f"Running jitter simulation in {args.mode} mode ({clock_desc}, {SIM_S:g}s) → {OUT_CSV}")
+    run_sim(virtual=args.virtual, precise=args.precise)
+    if OUT_FORMAT != 'none':
+        print('Wrote', OUT_CSV if OUT_FORMAT != 'cols' else columnar.table_path(OUT_CSV))
@@ -11,23 +11,32 @@ import sys
 import re
 import argparse
 from collections import defaultdict
-import statistics
+
+from latency_stats import percentiles
 
 LINE_RE = re.compile(r"\[(?P<ts>\d+)ms\] (?P<task>[^ ]+) end duration=(?P<dur>\d+)ms deadline=(?P<dl>\d+)ms (?P<res>HIT|MISS)")
 
 
-def parse_file(path):
-    tasks = defaultdict(list)
+def iter_records(path, task=None):
+    """Stream (end_ts_ms, task, duration_ms, deadline_ms, result) from a serial log.
+
+    Lines are read one at a time, so arbitrarily large captures are fine.
+    With `task`, only that task's records are yielded.
+    """
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         for line in f:
             m = LINE_RE.search(line)
             if m:
                 t = m.groupdict()
-                task = t['task']
-                dur = int(t['dur'])
-                dl = int(t['dl'])
-                res = t['res']
-                tasks[task].append((dur, dl, res))
+                if task is not None and t['task'] != task:
+                    continue
+                yield int(t['ts']), t['task'], int(t['dur']), int(t['dl']), t['res']
+
+
+def parse_file(path):
+    tasks = defaultdict(list)
+    for _, task, dur, dl, res in iter_records(path):
+        tasks[task].append((dur, dl, res))
     return tasks
 
 
@@ -37,8 +46,7 @@ def compute_kpi(tasks):
         durs = [r[0] for r in records]
         misses = sum(1 for r in records if r[2] == 'MISS')
         total = len(records)
-        p95 = int(statistics.quantiles(durs, n=100)[94]) if total >= 100 else max(durs) if durs else 0
-        p99 = int(statistics.quantiles(durs, n=100)[98]) if total >= 100 else max(durs) if durs else 0
+        p95, p99 = (round(v, 3) for v in percentiles(durs, (95, 99)))
         out[task] = {
             'count': total,
             'misses': misses,
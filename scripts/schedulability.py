@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Schedulability analysis of the configs/*.json task model, per core.
+
+Reads `scheduling.tasks` and `synchronization` from a config, pins the
+tasks to cores like simulate_overload.py, and answers analytically:
+
+- Fixed priority (baseline.json): exact response-time analysis
+    R = C + B + sum_{j in hp} ceil(R / T_j) * C_j
+  with blocking B from `critical_section_max_us`: one critical section per
+  lower-priority task under priority inheritance, a single one under a
+  priority ceiling protocol.
+- EDF (improved.json, D <= T): processor-demand test with QPA (Zhang &
+  Burns) over the synchronous busy period, and per-task worst-case
+  response times by Spuri's EDF response-time analysis.
+
+Each test runs twice: pessimistic (blocking, equal FreeRTOS priorities
+interfere with each other) and optimistic (no blocking, equal priorities
+served in release order). Both schedulable -> schedulable, both not ->
+unschedulable; otherwise the verdict is inconclusive and --simulate runs
+simulate_overload.py's simulator at the critical instant.
+
+The analysis is incremental: changing one WCET (--set, --interactive)
+only re-checks that task's core, and under fixed priority only the tasks
+at or below its priority, warm-started from the previous response times.
+
+Run:
+  python scripts/schedulability.py
+  python scripts/schedulability.py --config configs/improved.json --set Network=400 --sensitivity
+  python scripts/schedulability.py --config configs/baseline.json --interactive
+
+Outputs:
+- per-task WCRT / slack tables on stdout
+- results/schedulability.csv
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+
+import simulate_overload
+
+OUT_CSV = 'results/schedulability.csv'
+CSV_FIELDS = ['config', 'policy', 'core', 'task', 'firmness', 'period_ms', 'wcet_ms', 'deadline_ms', 'priority',
+              'blocking_ms', 'wcrt_ms', 'wcrt_optimistic_ms', 'slack_ms', 'verdict']
+
+CEILING_PROTOCOLS = ('priority_ceiling', 'immediate_ceiling', 'srp')
+SENSITIVITY_STEP_MS = 0.01
+QPA_MAX_HYPERPERIOD_MS = 10_000_000  # U == 1 with D < T: longer hyperperiods are rejected
+
+
+def _ceil_div(a, b):
+    # Guard against float noise, e.g. 1500.0000000002 / 500
+    return math.ceil(a / b - 1e-9)
+
+
+def rta(task, interferers, blocking, deadline, start=0.0):
+    """Fixed-point response time of `task`; stops once it exceeds `deadline`."""
+    r = max(start, task.wcet_ms + blocking)
+    while True:
+        nxt = task.wcet_ms + blocking + sum(_ceil_div(r, j.period_ms) * j.wcet_ms for j in interferers)
+        if nxt <= r or nxt > deadline:
+            return max(r, nxt)
+        r = nxt
+
+
+def utilization(tasks):
+    return sum(t.wcet_ms / t.period_ms for t in tasks)
+
+
+def busy_period(tasks, blocking=0.0, limit=math.inf):
+    """Length of the synchronous busy period; inf when U >= 1 or it passes `limit`."""
+    if utilization(tasks) >= 1 - 1e-9:
+        return math.inf
+    w = blocking + sum(t.wcet_ms for t in tasks)
+    while True:
+        nxt = blocking + sum(_ceil_div(w, t.period_ms) * t.wcet_ms for t in tasks)
+        if nxt <= w:
+            return w
+        if nxt > limit:
+            return math.inf
+        w = nxt
+
+
+def demand(tasks, t):
+    """EDF processor demand h(t): work with release and deadline in [0, t]."""
+    return sum((math.floor((t - x.deadline_ms) / x.period_ms + 1e-9) + 1) * x.wcet_ms
+               for x in tasks if x.deadline_ms <= t)
+
+
+def _last_deadline_before(tasks, t):
+    best = None
+    for x in tasks:
+        if x.deadline_ms < t:
+            d = (_ceil_div(t - x.deadline_ms, x.period_ms) - 1) * x.period_ms + x.deadline_ms
+            best = d if best is None else max(best, d)
+    return best
+
+
+def _hyperperiod(tasks):
+    if not all(float(x.period_ms).is_integer() for x in tasks):
+        return None
+    return math.lcm(*(int(x.period_ms) for x in tasks))
+
+
+def qpa(tasks, blocking=lambda t: 0.0):
+    """Quick Processor-demand Analysis; True if h(t) + blocking(t) <= t for all t."""
+    u = utilization(tasks)
+    if u > 1 + 1e-9:
+        return False
+    d_min = min(x.deadline_ms for x in tasks)
+    d_max = max(x.deadline_ms for x in tasks)
+    if u >= 1 - 1e-9:
+        if all(x.deadline_ms >= x.period_ms for x in tasks) and not blocking(0.0):
+            return True
+        # h(t + H) = h(t) + H at U = 1, so one hyperperiod is enough
+        hyper = _hyperperiod(tasks)
+        if hyper is None or hyper > QPA_MAX_HYPERPERIOD_MS:
+            return False
+        horizon = hyper + d_max
+    else:
+        bound = max(d_max, sum((x.period_ms - x.deadline_ms) * x.wcet_ms / x.period_ms for x in tasks) / (1 - u))
+        horizon = min(busy_period(tasks, blocking(0.0), bound), bound)
+    t = _last_deadline_before(tasks, horizon)
+    if t is None:
+        return True
+    while True:
+        h = demand(tasks, t) + blocking(t)
+        if h > t:
+            return False
+        if h <= d_min:
+            return True
+        t = h if h < t else _last_deadline_before(tasks, t)
+        if t is None:
+            return True
+
+
+def edf_response_time(task, tasks, busy, blocking=lambda d: 0.0):
+    """Spuri's worst-case response time of `task` under preemptive EDF.
+
+    `blocking(d)` is the blocking suffered by a busy period whose last
+    deadline is `d` (critical sections of tasks with later deadlines).
+    """
+    others = [j for j in tasks if j is not task]
+    offsets = set()
+    for j in tasks:
+        k = max(0, _ceil_div(task.deadline_ms - j.deadline_ms, j.period_ms))
+        while True:
+            a = k * j.period_ms + j.deadline_ms - task.deadline_ms
+            if a >= busy:
+                break
+            offsets.add(a)
+            k += 1
+    worst = task.wcet_ms
+    for a in sorted(offsets):
+        d = a + task.deadline_ms
+        own = (1 + math.floor(a / task.period_ms + 1e-9)) * task.wcet_ms
+        rivals = [j for j in others if j.deadline_ms <= d]
+        b = blocking(d)
+        length = own + b
+        while True:
+            nxt = own + b + sum(min(_ceil_div(length, j.period_ms),
+                                           1 + math.floor((d - j.deadline_ms) / j.period_ms + 1e-9)) * j.wcet_ms
+                                       for j in rivals)
+            if nxt <= length:
+                break
+            length = nxt
+        worst = max(worst, length - a)
+    return worst
+
+
+class CoreAnalysis:
+    """Cached analysis of the tasks on one core; set_wcet() re-checks incrementally.
+
+    With response_times=False the EDF path only runs QPA (verdict only).
+    """
+
+    def __init__(self, core, tasks, policy, cs_ms, protocol, response_times=True):
+        self.core = core
+        self.tasks = tasks
+        self.policy = policy
+        self.cs_ms = cs_ms
+        self.ceiling = protocol in CEILING_PROTOCOLS
+        self.response_times = response_times
+        self.results = {}  # name -> (blocking, wcrt, optimistic wcrt)
+        self.dirty = {t.name for t in tasks}
+        self.verdict = None
+
+    def blocking(self, task):
+        if self.policy == 'edf':
+            lower = [j for j in self.tasks if j.deadline_ms > task.deadline_ms]
+        else:
+            lower = [j for j in self.tasks if j.priority < task.priority]
+        if not lower:
+            return 0.0
+        return self.cs_ms if self.ceiling else self.cs_ms * len(lower)
+
+    def _edf_blocking(self, t):
+        lower = sum(1 for j in self.tasks if j.deadline_ms > t)
+        return 0.0 if not lower else self.cs_ms if self.ceiling else self.cs_ms * lower
+
+    def set_wcet(self, name, wcet_ms):
+        task = next(t for t in self.tasks if t.name == name)
+        grew = wcet_ms >= task.wcet_ms
+        task.wcet_ms = wcet_ms
+        self.verdict = None
+        if self.policy == 'edf':
+            self.dirty = {t.name for t in self.tasks}
+            return
+        for t in self.tasks:
+            if t.priority <= task.priority:
+                self.dirty.add(t.name)
+                if not grew:
+                    # Response times only shrink; the old fixed point is no longer a lower bound
+                    self.results.pop(t.name, None)
+
+    def analyze(self):
+        if not self.dirty and self.verdict is not None:
+            return self.verdict
+        if self.policy == 'edf' and not self.response_times:
+            pessimistic = qpa(self.tasks, self._edf_blocking)
+            optimistic = pessimistic or qpa(self.tasks)
+        elif self.policy == 'edf':
+            u_ok = utilization(self.tasks) < 1
+            busy = busy_period(self.tasks, max((self.blocking(t) for t in self.tasks), default=0.0))
+            for t in self.tasks:
+                b = self.blocking(t)
+                if u_ok:
+                    self.results[t.name] = (b, edf_response_time(t, self.tasks, busy, self._edf_blocking),
+                                            edf_response_time(t, self.tasks, busy))
+                else:
+                    self.results[t.name] = (b, math.inf, math.inf)
+            pessimistic = qpa(self.tasks, self._edf_blocking)
+            optimistic = qpa(self.tasks)
+        else:
+            for t in self.tasks:
+                if t.name not in self.dirty:
+                    continue
+                b = self.blocking(t)
+                hep = [j for j in self.tasks if j is not t and j.priority >= t.priority]
+                hp = [j for j in hep if j.priority > t.priority]
+                old = self.results.get(t.name)
+                self.results[t.name] = (b, rta(t, hep, b, t.deadline_ms, old[1] if old else 0.0),
+                                        rta(t, hp, 0.0, t.deadline_ms, old[2] if old else 0.0))
+            pessimistic = all(self.results[t.name][1] <= t.deadline_ms for t in self.tasks)
+            optimistic = all(self.results[t.name][2] <= t.deadline_ms for t in self.tasks)
+        self.dirty = set()
+        self.verdict = ('schedulable' if pessimistic else
+                        'inconclusive' if optimistic else 'unschedulable')
+        return self.verdict
+
+
+class Analysis:
+    """All cores of one config."""
+
+    def __init__(self, path, uniprocessor=False):
+        name, policy, tasks = simulate_overload.load_config(path)
+        with open(path, encoding='utf-8') as f:
+            cfg = json.load(f)
+        sync = cfg.get('synchronization', {})
+        self.name = name
+        self.policy = policy
+        self.protocol = sync.get('mutex_type', 'priority_inheritance')
+        self.cs_ms = sync.get('critical_section_max_us', 0) / 1000.0
+        self.claimed = cfg.get('utilization', {})
+        if uniprocessor:
+            for t in tasks:
+                t.core = 0
+        self.tasks = {t.name: t for t in tasks}
+        self.cores = {core: CoreAnalysis(core, [t for t in tasks if t.core == core], policy, self.cs_ms,
+                                         self.protocol)
+                      for core in sorted({t.core for t in tasks})}
+
+    def set_wcet(self, name, wcet_ms):
+        if name not in self.tasks:
+            raise KeyError(f'unknown task {name!r} (have: {", ".join(self.tasks)})')
+        self.cores[self.tasks[name].core].set_wcet(name, wcet_ms)
+
+    def analyze(self):
+        return {core: ca.analyze() for core, ca in self.cores.items()}
+
+    def rows(self):
+        out = []
+        for core, ca in self.cores.items():
+            for t in sorted(ca.tasks, key=lambda t: (t.deadline_ms if self.policy == 'edf' else -t.priority, t.name)):
+                b, r, r_opt = ca.results[t.name]
+                out.append({
+                    'config': self.name, 'policy': self.policy, 'core': core, 'task': t.name,
+                    'firmness': t.firmness, 'period_ms': t.period_ms, 'wcet_ms': t.wcet_ms,
+                    'deadline_ms': t.deadline_ms, 'priority': 'dyn' if t.priority is None else t.priority,
+                    'blocking_ms': b, 'wcrt_ms': r, 'wcrt_optimistic_ms': r_opt,
+                    'slack_ms': t.deadline_ms - r, 'verdict': ca.verdict,
+                })
+        return out
+
+    def max_wcet(self, name):
+        """Largest WCET of `name` (to SENSITIVITY_STEP_MS) that keeps its core schedulable."""
+        task = self.tasks[name]
+        ca = self.cores[task.core]
+        original = task.wcet_ms
+        lo, hi = 0.0, float(task.deadline_ms)
+        try:
+            while hi - lo > SENSITIVITY_STEP_MS:
+                mid = (lo + hi) / 2
+                ca.set_wcet(name, mid)
+                if ca.analyze() == 'schedulable':
+                    lo = mid
+                else:
+                    hi = mid
+        finally:
+            ca.set_wcet(name, original)
+            ca.analyze()
+        return lo
+
+
+def simulate_check(analysis, core, duration_s):
+    """Observed worst response per task at the critical instant, all jobs at WCET."""
+    tasks = analysis.cores[core].tasks
+    saved = simulate_overload.BCET_FRACTION
+    simulate_overload.BCET_FRACTION = 1.0
+    try:
+        stats = simulate_overload.simulate(tasks, analysis.policy, duration_s, sync_release=True)
+    finally:
+        simulate_overload.BCET_FRACTION = saved
+    return {t.name: (stats[t.name].response.max or 0.0, stats[t.name].misses) for t in tasks}
+
+
+def print_report(analysis, rows):
+    policy = 'EDF' if analysis.policy == 'edf' else 'fixed priority'
+    print(f"\n=== {analysis.name} ({policy}, {analysis.protocol}, "
+          f"critical section {analysis.cs_ms:.3f} ms) ===")
+    total_u = utilization(analysis.tasks.values())
+    if 'calculated' in analysis.claimed:
+        claimed = analysis.claimed['calculated']
+        note = '' if abs(claimed - total_u) < 1e-4 else '  <-- config value is stale'
+        print(f"U(all tasks)={total_u:.4f} (config says {claimed}){note}")
+    for core, ca in analysis.cores.items():
+        n = len(ca.tasks)
+        extra = f", Liu-Layland bound {n * (2 ** (1 / n) - 1):.3f}" if analysis.policy == 'fp' else ''
+        print(f"core {core}: U={utilization(ca.tasks):.4f}{extra} -> {ca.verdict}")
+    print(f"{'core':>4} {'task':<10} {'prio':>5} {'T':>6} {'C':>8} {'D':>6} {'B':>6} "
+          f"{'WCRT':>9} {'WCRT_opt':>9} {'slack':>9}")
+    for r in rows:
+        print(f"{r['core']:>4} {r['task']:<10} {r['priority']:>5} {r['period_ms']:>6} {r['wcet_ms']:>8.3f} "
+              f"{r['deadline_ms']:>6} {r['blocking_ms']:>6.3f} {r['wcrt_ms']:>9.3f} "
+              f"{r['wcrt_optimistic_ms']:>9.3f} {r['slack_ms']:>9.3f}"
+              + ('  MISS' if r['slack_ms'] < 0 else ''))
+
+
+def interactive(analysis):
+    """Read `Task wcet_ms` lines from stdin and re-check after each change."""
+    print("\nEnter '<task> <wcet_ms>' to re-check, empty line to quit")
+    for line in sys.stdin:
+        parts = line.split()
+        if not parts:
+            break
+        try:
+            name, wcet = parts[0], float(parts[1])
+            t0 = time.perf_counter()
+            analysis.set_wcet(name, wcet)
+            verdicts = analysis.analyze()
+            elapsed_us = (time.perf_counter() - t0) * 1e6
+        except (IndexError, ValueError, KeyError) as e:
+            print(f"  ? {e}")
+            continue
+        core = analysis.tasks[name].core
+        print(f"  core {core}: {verdicts[core]} ({elapsed_us:.0f} us)")
+        for r in analysis.rows():
+            if r['core'] == core:
+                print(f"    {r['task']:<10} C={r['wcet_ms']:<8g} WCRT={r['wcrt_ms']:<10.3f} slack={r['slack_ms']:.3f}")
+
+
+def main():
+    p = argparse.ArgumentParser(description='RTA / EDF demand-bound schedulability analysis of configs/*.json')
+    p.add_argument('--config', action='append', help='Config JSON (repeatable; default: baseline and improved)')
+    p.add_argument('--set', action='append', default=[], metavar='TASK=WCET_MS',
+                   help='Override a task WCET before analysing (repeatable)')
+    p.add_argument('--uniprocessor', action='store_true',
+                   help='Analyse every task on one core (as the config utilization block does)')
+    p.add_argument('--sensitivity', action='store_true', help='Report the largest schedulable WCET per task')
+    p.add_argument('--simulate', action='store_true', help='Simulate cores whose verdict is inconclusive')
+    p.add_argument('--sim-duration-s', type=float, default=600, help='Simulated seconds for --simulate')
+    p.add_argument('--interactive', action='store_true', help='Re-check WCET changes read from stdin')
+    p.add_argument('-o', '--out', default=OUT_CSV)
+    args = p.parse_args()
+    if args.interactive and len(args.config or simulate_overload.CONFIGS) != 1:
+        p.error('--interactive needs exactly one --config')
+
+    rows = []
+    analyses = []
+    for path in args.config or simulate_overload.CONFIGS:
+        analysis = Analysis(path, args.uniprocessor)
+        for item in args.set:
+            name, _, value = item.partition('=')
+            try:
+                analysis.set_wcet(name, float(value))
+            except (KeyError, ValueError) as e:
+                p.error(f'--set {item}: {e}')
+        analysis.analyze()
+        table = analysis.rows()
+        print_report(analysis, table)
+        rows.extend(table)
+        analyses.append(analysis)
+
+        if args.sensitivity:
+            print(f"{'task':<10} {'C':>8} {'max C':>9} {'margin':>8}")
+            for name, t in analysis.tasks.items():
+                c_max = analysis.max_wcet(name)
+                print(f"{name:<10} {t.wcet_ms:>8g} {c_max:>9.2f} {c_max / t.wcet_ms:>7.1f}x")
+        if args.simulate:
+            for core, ca in analysis.cores.items():
+                if ca.verdict != 'inconclusive':
+                    continue
+                print(f"core {core}: simulating {args.sim_duration_s:g}s at the critical instant, C = WCET")
+                for name, (worst, misses) in simulate_check(analysis, core, args.sim_duration_s).items():
+                    print(f"  {name:<10} observed max response {worst:>9.3f} ms, misses {misses}")
+
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+    print(f"\nWrote {args.out}")
+
+    if args.interactive:
+        interactive(analyses[0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Bounded priority send queue for the producer/consumer sender
+(comm_instrument.py --classes), after configs/improved.json's
+"communication" block.
+
+Messages are queued per priority level (0 = most important); get()
+returns the oldest message of the most important non-empty level, so a
+control message overtakes every queued telemetry message. With
+priority_queue off all classes share level 0, i.e. one FIFO.
+
+When `maxsize` messages are queued, put() applies the backpressure
+policy:
+
+  drop_oldest   evict the oldest message of the least important level
+                that does not outrank the new one; if everything queued
+                outranks the new message, the new one is dropped
+  drop_newest   drop the new message
+  block         the producer waits for room
+
+Both return the dropped message so the caller can log it as lost.
+Retries re-enter with requeue() at the front of their level; it never
+waits (it is called from timer callbacks), so under `block` a retry may
+exceed maxsize by at most the sender's window.
+"""
+import asyncio
+import collections
+
+BACKPRESSURE = ('drop_oldest', 'drop_newest', 'block')
+
+
+class PrioritySendQueue:
+    """Bounded multi-level FIFO with a backpressure policy (asyncio)."""
+
+    def __init__(self, maxsize, backpressure='drop_oldest', levels=1):
+        if backpressure not in BACKPRESSURE:
+            raise ValueError(f'unknown backpressure {backpressure!r}: use one of {", ".join(BACKPRESSURE)}')
+        if maxsize < 1:
+            raise ValueError('queue size must be >= 1')
+        self.maxsize = maxsize
+        self.backpressure = backpressure
+        self.queues = [collections.deque() for _ in range(levels)]
+        self.size = 0
+        self.max_depth = 0
+        self.dropped = 0
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+
+    def __len__(self):
+        return self.size
+
+    def _admit(self, item, level, front):
+        """Apply drop_oldest/drop_newest if full, then queue item; returns the dropped item or None."""
+        victim = None
+        if self.size >= self.maxsize:
+            self.dropped += 1
+            if self.backpressure == 'drop_newest':
+                return item
+            lowest = max(i for i, q in enumerate(self.queues) if q)
+            if lowest < level:
+                return item
+            victim = self.queues[lowest].popleft()
+            self.size -= 1
+        if front:
+            self.queues[level].appendleft(item)
+        else:
+            self.queues[level].append(item)
+        self.size += 1
+        self.max_depth = max(self.max_depth, self.size)
+        self._readable.set()
+        return victim
+
+    async def put(self, item, level=0):
+        """Queue item at `level`; returns the message dropped by backpressure, if any."""
+        if self.backpressure == 'block':
+            while self.size >= self.maxsize:
+                self._writable.clear()
+                await self._writable.wait()
+        return self._admit(item, level, front=False)
+
+    def requeue(self, item, level=0):
+        """Put a retry back at the front of its level without waiting; returns the dropped message, if any."""
+        if self.backpressure == 'block':
+            self.queues[level].appendleft(item)
+            self.size += 1
+            self.max_depth = max(self.max_depth, self.size)
+            self._readable.set()
+            return None
+        return self._admit(item, level, front=True)
+
+    async def get(self):
+        """Oldest message of the most important non-empty level (waits while empty)."""
+        while not self.size:
+            self._readable.clear()
+            await self._readable.wait()
+        for q in self.queues:
+            if q:
+                item = q.popleft()
+                break
+        self.size -= 1
+        self._writable.set()
+        return item
@@ -14,18 +14,57 @@ Measures:
 - DB write time
 - Buffer depth (for async)
 
+All three modes run on one discrete-event core: a heap-ordered queue of task
+releases, flush timers, burst start/end and write completions, so simulated
+time jumps straight from one event to the next.
+
+Usage:
+  python scripts/simulate_db_impact.py
+  python scripts/simulate_db_impact.py --duration-s 2592000   # 30 days, ~10 s
+  python scripts/simulate_db_impact.py --duration-s 2592000 --backend events --format both   # ~5 min
+  python scripts/simulate_db_impact.py --trace-log serial.log --write-trace writes.csv --stream
+
+The optional NumPy backend (--backend numpy) generates whole columns per
+chunk of activations instead of stepping events; the event engine remains
+the reference implementation. It does not make multi-week runs take
+seconds: 30 days (5.2M activations per mode) take ~2 minutes of event
+stepping, and writing the per-task CSVs more than doubles that. Runs
+longer than LONG_RUN_S therefore default to the fast path: the NumPy
+backend (when NumPy is installed and the run needs no stateful storage
+model or write trace), --stream and --format cols. Explicit --backend,
+--stream / --no-stream and --format override those defaults.
+
+Trace replay (--trace-log) swaps the synthetic periodic task for the
+activation instants and execution times of one task in a captured serial
+log (parse_logs.py format); --write-trace replays recorded SPIFFS write
+latencies instead of a storage model. Both files are streamed, so multi-day
+captures never have to fit in memory.
+
 Outputs:
-- results/db_impact_baseline.csv
-- results/db_impact_sync.csv
-- results/db_impact_async.csv
+- results/db_impact_baseline.csv (+ .cols columnar table, see --format)
+- results/db_impact_sync.csv (+ .cols)
+- results/db_impact_async.csv (+ .cols)
 - results/db_impact_summary.txt
 """
-import time
+import argparse
+import hashlib
+import heapq
 import random
-import statistics
 import csv
 import os
+from array import array
 from collections import deque
+from itertools import chain, islice, takewhile
+
+import columnar
+import parse_logs
+import storage_model
+from latency_stats import LatencyHistogram, percentiles
+
+try:
+    import numpy as np
+except ImportError:  # optional: only needed for --backend numpy
+    np = None
 
 # Configuration
 SIM_DURATION_S = 60
@@ -49,243 +88,741 @@ BURST_START_S = 20
 BURST_END_S = 30
 BURST_FACTOR = 3  # 3x more writes during burst
 
+# Trace replay: the 500ms sensor task logged by logTask() in src/main.cpp
+TRACE_TASK = 'SoilTask'
+
 OUT_DIR = 'results'
 
-def now_ms():
-    return int(time.time() * 1000)
+# Above this simulated duration, default to numpy + --stream + --format cols (see main())
+LONG_RUN_S = 86400
+
+# Event kinds. The value doubles as the tie-break order for events that fall
+# on the same instant: burst edges apply before anything else, a finished
+# write frees its buffer slots before the flush timer looks at the buffer,
+# and the flush timer runs before the task released at the same time.
+EV_BURST_START = 0
+EV_BURST_END = 1
+EV_WRITE_DONE = 2
+EV_FLUSH_TIMER = 3
+EV_TASK_RELEASE = 4
+
+# Column layout of the per-task result table for each mode
+RESULT_FIELDS = {
+    'baseline': [('task_id', 'q'), ('t1', 'q'), ('t5', 'd'), ('response_ms', 'd'),
+                 ('db_time_ms', 'd'), ('non_db_time_ms', 'd'), ('deadline_hit', 'b')],
+    'sync': [('task_id', 'q'), ('t1', 'q'), ('t2', 'd'), ('t3', 'd'), ('t4', 'd'), ('t5', 'd'),
+             ('response_ms', 'd'), ('db_time_ms', 'd'), ('non_db_time_ms', 'd'),
+             ('deadline_hit', 'b'), ('in_burst', 'b')],
+    'async': [('task_id', 'q'), ('t1', 'q'), ('t2', 'd'), ('t5', 'd'), ('response_ms', 'd'),
+              ('db_time_ms', 'd'), ('non_db_time_ms', 'd'), ('deadline_hit', 'b'),
+              ('buffer_depth', 'q'), ('in_burst', 'b')],
+}
+
+
+def make_storage(name='gaussian', fill=0.5, record_bytes=storage_model.RECORD_BYTES, trace=None):
+    """Storage model for one run; 'gaussian' uses this module's SPIFFS_WRITE_* values."""
+    return storage_model.make_storage(name, fill, record_bytes, trace,
+                                      mean_ms=SPIFFS_WRITE_MEAN_MS, stddev_ms=SPIFFS_WRITE_STDDEV_MS,
+                                      min_ms=SPIFFS_WRITE_MIN_MS, max_ms=SPIFFS_WRITE_MAX_MS)
+
+
+def read_release_trace(path, task=TRACE_TASK):
+    """Stream (release_ms, work_ms) for one task from a captured serial log.
+
+    logTask() prints the completion instant and the duration, so the release
+    is `ts - duration`. Releases are rebased to the first one so the burst
+    window and flush timers line up with simulated time; if millis() goes
+    backwards (a reboot mid-capture) the trace continues one period later.
+    """
+    offset = None
+    last = 0
+    for ts, _, dur, _, _ in parse_logs.iter_records(path, task):
+        t1 = ts - dur
+        if offset is None:
+            offset = -t1
+        elif t1 + offset < last:
+            offset = last + CONTROL_TASK_PERIOD_MS - t1
+        last = t1 + offset
+        yield last, float(dur)
+
+
+class EventQueue:
+    """Heap-ordered queue of (time_ms, kind, seq, data) simulation events."""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = 0
+        self.now_ms = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, time_ms, kind, data=None):
+        self._seq += 1
+        heapq.heappush(self._heap, (time_ms, kind, self._seq, data))
+
+    def run(self, handlers):
+        """Pop events in time order and dispatch them until the queue drains.
+
+        Handlers are indexed by event kind and must stop re-arming themselves
+        past the simulation horizon, otherwise the loop never ends.
+        """
+        heap = self._heap
+        pop = heapq.heappop
+        while heap:
+            time_ms, kind, _, data = pop(heap)
+            self.now_ms = time_ms
+            handlers[kind](time_ms, data)
+
+
+class ResultTable:
+    """Per-task results stored as one typed array per column.
+
+    Month-long runs produce millions of rows; keeping them as columns avoids
+    one dict per task while still handing out dict rows for CSV export.
+    Rows arrive as tuples and are transposed into the columns in chunks.
+    """
+
+    CHUNK_ROWS = 8192
+
+    def __init__(self, fields):
+        self.schema = list(fields)
+        self.fields = [name for name, _ in fields]
+        self.columns = {name: array(code) for name, code in fields}
+        self._bool_fields = {name for name, code in fields if code == 'b'}
+        self._pending = []
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]]) + len(self._pending)
+
+    def append(self, row):
+        """Add one row tuple (values in field order)."""
+        self._pending.append(row)
+        if len(self._pending) >= self.CHUNK_ROWS:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        for name, values in zip(self.fields, zip(*self._pending)):
+            self.columns[name].extend(values)
+        self._pending = []
+
+    def column(self, name):
+        self._flush_pending()
+        return self.columns[name]
+
+    def iter_values(self):
+        """Yield row tuples in field order (booleans restored)."""
+        self._flush_pending()
+        cols = [map(bool, self.columns[name]) if name in self._bool_fields else self.columns[name]
+                for name in self.fields]
+        return zip(*cols)
+
+    def rows(self):
+        for values in self.iter_values():
+            yield dict(zip(self.fields, values))
+
+
+# --- Online KPI accumulation -------------------------------------------------
+
+KPI_BUCKET_US = 1  # histogram resolution for streamed KPIs
+
+
+class KPIAccumulator:
+    """Online KPI state for one configuration.
+
+    By default the three latency columns go into LatencyHistograms, so
+    memory is flat however long the run is. With exact=True the raw values
+    are kept instead and percentiles come from one sort per column.
+    """
+
+    COLUMNS = ('response_ms', 'db_time_ms', 'non_db_time_ms')
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, exact=False, bucket_us=KPI_BUCKET_US):
+        self.exact = exact
+        self.total = 0
+        self.misses = 0
+        self.max_buffer_depth = 0
+        if exact:
+            self.chunks = {name: [] for name in self.COLUMNS}
+        else:
+            self.hist = {name: LatencyHistogram(bucket_us) for name in self.COLUMNS}
+
+    def add_columns(self, cols):
+        """Fold in a batch given as {field: sequence}; buffer_depth is optional."""
+        for name in self.COLUMNS:
+            if self.exact:
+                values = cols[name]
+                self.chunks[name].append(values if hasattr(values, 'dtype') else array('d', values))
+            else:
+                self.hist[name].add_many(cols[name])
+        n = len(cols['response_ms'])
+        self.total += n
+        hits = cols['deadline_hit']
+        self.misses += n - int(hits.sum() if hasattr(hits, 'sum') else sum(hits))
+        depth = cols.get('buffer_depth')
+        if depth is not None and len(depth):
+            self.max_buffer_depth = max(self.max_buffer_depth, int(max(depth)))
+
+    def merge(self, other):
+        if other.exact != self.exact:
+            raise ValueError('cannot merge exact and histogram accumulators')
+        self.total += other.total
+        self.misses += other.misses
+        self.max_buffer_depth = max(self.max_buffer_depth, other.max_buffer_depth)
+        for name in self.COLUMNS:
+            if self.exact:
+                self.chunks[name].extend(other.chunks[name])
+            else:
+                self.hist[name].merge(other.hist[name])
+
+    def _stats(self, name):
+        """[p50, p95, p99, max] of one column."""
+        if not self.exact:
+            hist = self.hist[name]
+            return hist.percentiles(self.PERCENTILES) + [hist.max if hist.max is not None else 0]
+        chunks = self.chunks[name]
+        if np is not None and any(isinstance(c, np.ndarray) for c in chunks):
+            data = np.concatenate([np.asarray(c, dtype=np.float64) for c in chunks])
+            return percentiles(data, self.PERCENTILES) + [float(data.max())]
+        data = sorted(v for c in chunks for v in c)
+        return percentiles(data, self.PERCENTILES, presorted=True) + [data[-1] if data else 0]
+
+    def kpi(self, label):
+        r50, r95, r99, rmax = self._stats('response_ms')
+        d50, d95, _, dmax = self._stats('db_time_ms')
+        n50, n95, _, _ = self._stats('non_db_time_ms')
+        return {
+            'label': label,
+            'total_tasks': self.total,
+            'deadline_misses': self.misses,
+            'miss_rate': self.misses * 100.0 / self.total if self.total else 0.0,
+            'response_p50': r50,
+            'response_p95': r95,
+            'response_p99': r99,
+            'response_max': rmax,
+            'jitter': r99 - r50,
+            'db_time_p50': d50,
+            'db_time_p95': d95,
+            'db_time_max': dmax,
+            'non_db_time_p50': n50,
+            'non_db_time_p95': n95,
+            'buffer_depth_max': self.max_buffer_depth,
+        }
+
+
+class StreamingResults:
+    """ResultTable stand-in that streams rows to CSV and keeps only KPIs.
+
+    Rows are buffered in chunks of ResultTable.CHUNK_ROWS, written with
+    csv.writer and/or to a columnar table (``cols_path``) and folded into a
+    KPIAccumulator, so memory does not grow with run length. With neither
+    path only the KPIs are kept.
+    """
+
+    def __init__(self, fields, path=None, exact=False, cols_path=None, meta=None):
+        self.fields = [name for name, _ in fields]
+        self.path = path
+        self.acc = KPIAccumulator(exact=exact)
+        self.rows_written = 0
+        self._pending = []
+        self._file = None
+        self._writer = None
+        self._cols = columnar.ColumnWriter(cols_path, fields, meta) if cols_path else None
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._file = open(path, 'w', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.fields)
+
+    def __len__(self):
+        return self.acc.total + len(self._pending)
+
+    def append(self, row):
+        self._pending.append(row)
+        if len(self._pending) >= ResultTable.CHUNK_ROWS:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        if self._writer:
+            self._writer.writerows(self._pending)
+        cols = dict(zip(self.fields, zip(*self._pending)))
+        if self._cols:
+            self._cols.append_columns(cols)
+        self.acc.add_columns(cols)
+        self.rows_written += len(self._pending)
+        self._pending = []
+
+    def add_table(self, table):
+        """Stream a whole (chunk) table, e.g. one ArrayResultTable chunk."""
+        self._flush_pending()
+        if self._writer:
+            self._writer.writerows(table.iter_values())
+        if self._cols:
+            self._cols.append_columns({name: table.column(name) for name in self.fields})
+        self.acc.add_columns({name: table.column(name) for name in self.fields
+                              if name in KPIAccumulator.COLUMNS or name in ('deadline_hit', 'buffer_depth')})
+        self.rows_written += len(table)
+
+    def kpi(self, label):
+        self._flush_pending()
+        return self.acc.kpi(label)
+
+    def close(self):
+        self._flush_pending()
+        if self._file:
+            self._file.close()
+            self._file = None
+            print(f"Wrote {self.path}")
+        if self._cols:
+            self._cols.close()
+            print(f"Wrote {self._cols.path}")
+            self._cols = None
+
+
+def run_simulation(mode, duration_s=SIM_DURATION_S, verbose=True, rng=None, sink=None, storage=None,
+                   releases=None):
+    """Run one logging policy ('baseline', 'sync' or 'async') on the event queue.
+
+    All modes share the same event kinds: periodic task releases, burst
+    start/end, and (sync/async) SPIFFS write completions; async adds a
+    periodic flush timer for the background writer. During the burst window
+    SPIFFS contention stretches both the sync write and the async flush.
+
+    ``rng`` is a random.Random (the module-level generator when omitted).
+    ``sink`` (a StreamingResults) replaces the in-memory ResultTable; flush
+    events are then only counted, not kept. ``storage`` is a storage_model
+    instance pricing each sync append and async batch flush (default: the
+    clamped Gaussian). ``releases`` replays (release_ms, work_ms) pairs, e.g.
+    from read_release_trace(), instead of the synthetic periodic task; with
+    duration_s=None the run lasts until the trace ends, and the flush timer
+    stops at the first tick after the last release.
+    Returns (results, flush_events, counters).
+    """
+    rng = rng if rng is not None else random
+    storage = storage if storage is not None else make_storage()
+    horizon_ms = float('inf') if duration_s is None else int(duration_s * 1000)
+    releases = iter(releases) if releases is not None else None
+    queue = EventQueue()
+    results = sink if sink is not None else ResultTable(RESULT_FIELDS[mode])
+    record = results.append
+    flush_events = []
+    keep_flush_events = sink is None
+    buffer = deque()
+    state = {'in_burst': False, 'task_count': 0, 'flushing': False, 'releases_done': False}
+    counters = {'enqueued': 0, 'flushed': 0, 'dropped': 0, 'flushes': 0}
+    if releases is None:
+        expected_tasks = max(1, -(-horizon_ms // CONTROL_TASK_PERIOD_MS))
+        progress_total = f'/{expected_tasks}'
+        progress_every = max(20, expected_tasks // 50)
+    else:
+        progress_total = ''
+        progress_every = 1000
+
+    def on_burst_start(t, _):
+        state['in_burst'] = True
+
+    def on_burst_end(t, _):
+        state['in_burst'] = False
+
+    def progress(task_id, response_ms, extra=''):
+        if verbose and task_id % progress_every == 0:
+            print(f"Tasks: {task_id}{progress_total} | Response: {response_ms:.2f}ms{extra}", end='\r')
+
+    def schedule_release(t):
+        # Next activation: one period on, or the next trace entry when replaying
+        if releases is None:
+            if t < horizon_ms:
+                queue.schedule(t, EV_TASK_RELEASE)
+            return
+        entry = next(releases, None)
+        if entry is None or entry[0] >= horizon_ms:
+            state['releases_done'] = True
+        else:
+            queue.schedule(entry[0], EV_TASK_RELEASE, entry[1])
+
+    def on_release(t1, work_time):
+        state['task_count'] += 1
+        task_id = state['task_count']
+        schedule_release(t1 + CONTROL_TASK_PERIOD_MS)
+
+        if work_time is None:
+            # Simulate control task work (sensor read, decision logic)
+            work_time = CONTROL_TASK_WCET_MS + rng.uniform(-1, 1)
+        t2 = t1 + work_time
+
+        if mode == 'baseline':
+            response_time = work_time
+            record((task_id, t1, t2, response_time, 0, response_time,
+                    response_time <= CONTROL_TASK_DEADLINE_MS))
+            progress(task_id, response_time)
+        elif mode == 'sync':
+            # T3: Synchronous SPIFFS write (BLOCKS task until it completes)
+            in_burst = state['in_burst']
+            write_time = storage.append(rng) * (BURST_FACTOR if in_burst else 1.0)
+            queue.schedule(t2 + write_time, EV_WRITE_DONE, (task_id, t1, t2, write_time, in_burst))
+        else:
+            # T2: Enqueue log (fast, ~1-10µs, negligible in sim)
+            t2 += 0.001
+            if len(buffer) < BUFFER_SIZE:
+                buffer.append(task_id)
+                counters['enqueued'] += 1
+            else:
+                # Buffer full: drop (or could block, but we choose drop for RT)
+                counters['dropped'] += 1
+            response_time = t2 - t1
+            record((task_id, t1, t2, t2, response_time, 0, response_time,
+                    response_time <= CONTROL_TASK_DEADLINE_MS, len(buffer), state['in_burst']))
+            progress(task_id, response_time,
+                     f" | Buffer: {len(buffer)}/{BUFFER_SIZE} | Dropped: {counters['dropped']}")
+
+    def on_write_done(t4, data):
+        if mode == 'sync':
+            task_id, t1, t2, write_time, in_burst = data
+            response_time = t4 - t1
+            record((task_id, t1, t2, t2, t4, t4, response_time, write_time,
+                    response_time - write_time, response_time <= CONTROL_TASK_DEADLINE_MS, in_burst))
+            progress(task_id, response_time, f" | DB: {write_time:.2f}ms")
+        else:
+            # Background flush finished: the batch leaves the buffer now
+            for _ in range(data):
+                buffer.popleft()
+            counters['flushed'] += data
+            state['flushing'] = False
+
+    def on_flush_timer(t, _):
+        if buffer and not state['flushing']:
+            batch_size = min(BATCH_SIZE, len(buffer))
+            flush_time = storage.flush(rng, batch_size)
+            if state['in_burst']:
+                flush_time *= BURST_FACTOR
+            counters['flushes'] += 1
+            if keep_flush_events:
+                flush_events.append({'time_ms': t, 'batch_size': batch_size, 'flush_time_ms': flush_time})
+            state['flushing'] = True
+            queue.schedule(t + flush_time, EV_WRITE_DONE, batch_size)
+        if t + FLUSH_INTERVAL_MS < horizon_ms and not state['releases_done']:
+            queue.schedule(t + FLUSH_INTERVAL_MS, EV_FLUSH_TIMER)
+
+    handlers = [on_burst_start, on_burst_end, on_write_done, on_flush_timer, on_release]
+
+    if mode != 'baseline':
+        if BURST_START_S * 1000 < horizon_ms:
+            queue.schedule(BURST_START_S * 1000, EV_BURST_START)
+            queue.schedule(BURST_END_S * 1000, EV_BURST_END)
+    if mode == 'async':
+        queue.schedule(FLUSH_INTERVAL_MS, EV_FLUSH_TIMER)
+    schedule_release(0)
+    queue.run(handlers)
+
+    if verbose:
+        print()
+    if hasattr(storage, 'stats'):
+        counters['storage'] = dict(storage.stats)
+    return results, flush_events, counters
+
+
+# --- NumPy array backend -----------------------------------------------------
+# Generates whole columns per chunk instead of one Python event per task. The
+# event-queue path above stays the reference implementation.
+
+ARRAY_CHUNK_TASKS = 1 << 20
+
+
+def _spiffs_write_array(rng, n):
+    """Vectorised GaussianStorage.append(): n clamped Gaussian latencies."""
+    return np.clip(rng.normal(SPIFFS_WRITE_MEAN_MS, SPIFFS_WRITE_STDDEV_MS, n),
+                   SPIFFS_WRITE_MIN_MS, SPIFFS_WRITE_MAX_MS)
+
+
+class ArrayResultTable:
+    """ResultTable look-alike backed by NumPy columns.
+
+    Only the independent columns (t1, work, db time, burst mask, buffer
+    depth) are stored; timestamps, response times and deadline hits are
+    derived on demand so 10^7 activations stay within a few hundred MB.
+    """
 
-def simulate_spiffs_write():
-    """Simulate SPIFFS write latency (Gaussian with min/max clamp)."""
-    latency = random.gauss(SPIFFS_WRITE_MEAN_MS, SPIFFS_WRITE_STDDEV_MS)
-    return max(SPIFFS_WRITE_MIN_MS, min(SPIFFS_WRITE_MAX_MS, latency))
+    def __init__(self, mode, first_task_id=1):
+        self.mode = mode
+        self.first_task_id = first_task_id
+        self.schema = RESULT_FIELDS[mode]
+        self.fields = [name for name, _ in self.schema]
+        self._chunks = {'t1': [], 'work': [], 'db': [], 'in_burst': [], 'buffer_depth': []}
+        self._base = None
 
-def simulate_baseline():
+    def __len__(self):
+        return len(self._columns()['t1'])
+
+    def add_chunk(self, **cols):
+        for name, values in cols.items():
+            self._chunks[name].append(values)
+        self._base = None
+
+    def _columns(self):
+        if self._base is None:
+            self._base = {}
+            for name, parts in self._chunks.items():
+                if parts:
+                    self._base[name] = np.concatenate(parts)
+                    self._chunks[name] = [self._base[name]]
+        return self._base
+
+    def _derive(self, name, lo, hi):
+        base = self._columns()
+        t1, work = base['t1'][lo:hi], base['work'][lo:hi]
+        if self.mode == 'async':
+            # T2 includes the ~1µs enqueue
+            response = work + 0.001
+        elif self.mode == 'sync':
+            response = work + base['db'][lo:hi]
+        else:
+            response = work
+        if name == 'task_id':
+            start = self.first_task_id + lo
+            return np.arange(start, start + len(t1), dtype=np.int64)
+        if name == 't1':
+            return t1
+        if name in ('t2', 't3'):
+            return t1 + (response if self.mode == 'async' else work)
+        if name in ('t4', 't5'):
+            return t1 + response
+        if name == 'response_ms':
+            return response
+        if name == 'db_time_ms':
+            return base['db'][lo:hi] if self.mode == 'sync' else np.zeros(len(t1))
+        if name == 'non_db_time_ms':
+            return work if self.mode == 'sync' else response
+        if name == 'deadline_hit':
+            return response <= CONTROL_TASK_DEADLINE_MS
+        return base[name][lo:hi]
+
+    def column(self, name):
+        return self._derive(name, 0, len(self))
+
+    def iter_values(self):
+        """Yield row tuples in field order, converting one chunk at a time."""
+        n = len(self)
+        step = ResultTable.CHUNK_ROWS
+        for lo in range(0, n, step):
+            hi = min(n, lo + step)
+            yield from zip(*[self._derive(name, lo, hi).tolist() for name in self.fields])
+
+    def rows(self):
+        for values in self.iter_values():
+            yield dict(zip(self.fields, values))
+
+
+def _async_depth_chunk(t1, state, rng, horizon_ms, final=False):
+    """Advance the async buffer recurrence over one chunk of release instants.
+
+    Between two buffer-draining events the depth only grows, so the chunk is
+    split into segments that start at each flush completion; inside a segment
+    depth is min(BUFFER_SIZE, base + arrivals). Only flush timers (one per
+    FLUSH_INTERVAL_MS) go through the Python loop, using the same ordering as
+    the event queue: completion, then timer, then the release at that instant.
+    The final chunk also runs the timers left between its last release and
+    the horizon. Returns the per-task buffer depth.
+    """
+    m = len(t1)
+    t_last = int(t1[-1])
+    # Float copy so scalar searchsorted() on flush completion times does not
+    # re-cast the whole integer column on every call
+    t1f = t1.astype(np.float64)
+    k0 = state['next_timer']
+    k_end = -(-horizon_ms // FLUSH_INTERVAL_MS)
+    k1 = k_end if final else max(k0, min(t_last // FLUSH_INTERVAL_MS + 1, k_end))
+    timers = np.arange(k0, k1, dtype=np.int64) * FLUSH_INTERVAL_MS
+    in_burst = (timers >= BURST_START_S * 1000) & (timers < BURST_END_S * 1000)
+    unit_writes = _spiffs_write_array(rng, len(timers)) * np.where(in_burst, BURST_FACTOR, 1.0)
+    n_at_timer = np.searchsorted(t1, timers, 'left').tolist()
+    timers = timers.tolist()
+    unit_writes = unit_writes.tolist()
+
+    seg_starts = [0]
+    seg_bases = [state['depth']]
+    base, seg_start = state['depth'], 0
+
+    def settle_pending(limit):
+        # Apply the outstanding flush completion if it lands at or before `limit`
+        nonlocal base, seg_start
+        done_ms, batch = state['pending']
+        if done_ms > limit:
+            return
+        n = int(t1f.searchsorted(done_ms, 'left'))
+        base = min(BUFFER_SIZE, base + n - seg_start) - batch
+        seg_start = n
+        seg_starts.append(n)
+        seg_bases.append(base)
+        state['flushed'] += batch
+        state['pending'] = None
+
+    for t_timer, n_before, unit in zip(timers, n_at_timer, unit_writes):
+        if state['pending'] is not None:
+            settle_pending(t_timer)
+        if state['pending'] is None:
+            depth = min(BUFFER_SIZE, base + n_before - seg_start)
+            if depth > 0:
+                batch = min(BATCH_SIZE, depth)
+                flush_time = unit * (batch / 10.0)
+                state['flushes'] += 1
+                if state['flush_events'] is not None:
+                    state['flush_events'].append({'time_ms': t_timer, 'batch_size': batch, 'flush_time_ms': flush_time})
+                state['pending'] = (t_timer + flush_time, batch)
+    if state['pending'] is not None:
+        settle_pending(float('inf') if final else t_last)
+    state['next_timer'] = k1
+
+    starts = np.array(seg_starts, dtype=np.int64)
+    bases = np.array(seg_bases, dtype=np.int64)
+    lengths = np.diff(np.append(starts, m))
+    state['dropped'] += int(np.maximum(0, bases + lengths - BUFFER_SIZE).sum())
+    idx = np.arange(m, dtype=np.int64)
+    seg = np.searchsorted(starts, idx, 'right') - 1
+    depth = np.minimum(BUFFER_SIZE, bases[seg] + (idx - starts[seg]) + 1)
+    state['depth'] = int(depth[-1])
+    return depth
+
+
+def _trace_chunks(releases, horizon_ms):
+    """Yield (t1, work, final) arrays of up to ARRAY_CHUNK_TASKS replayed releases."""
+    entries = chain.from_iterable(takewhile(lambda e: e[0] < horizon_ms, releases))
+
+    def take():
+        return np.fromiter(islice(entries, 2 * ARRAY_CHUNK_TASKS), dtype=np.float64).reshape(-1, 2)
+
+    chunk = take()
+    while len(chunk):
+        # Read one chunk ahead so the last one is known to be final
+        ahead = take()
+        yield chunk[:, 0].astype(np.int64), chunk[:, 1], not len(ahead)
+        chunk = ahead
+
+
+def run_simulation_numpy(mode, duration_s=SIM_DURATION_S, verbose=True, rng=None, sink=None, storage=None,
+                         releases=None):
+    """Array-backend twin of run_simulation(); ``rng`` is a numpy Generator.
+
+    With a ``sink`` each chunk is streamed out and dropped instead of kept.
+    Only the stateless Gaussian storage model vectorises. ``releases`` and
+    duration_s=None behave as in run_simulation().
+    """
+    if np is None:
+        raise RuntimeError('the numpy backend requires NumPy (pip install numpy)')
+    if storage is not None and not isinstance(storage, storage_model.GaussianStorage):
+        raise ValueError(f'the numpy backend only supports the gaussian storage model, not {storage.name!r}')
+    rng = rng if rng is not None else np.random.default_rng()
+    horizon_ms = float('inf') if duration_s is None else int(duration_s * 1000)
+    if releases is None:
+        n_tasks = -(-horizon_ms // CONTROL_TASK_PERIOD_MS)
+        progress_total = f'/{n_tasks}'
+        spans = ((lo, min(n_tasks, lo + ARRAY_CHUNK_TASKS)) for lo in range(0, n_tasks, ARRAY_CHUNK_TASKS))
+        chunks = ((np.arange(lo, hi, dtype=np.int64) * CONTROL_TASK_PERIOD_MS, None, hi == n_tasks)
+                  for lo, hi in spans)
+    else:
+        progress_total = ''
+        chunks = _trace_chunks(releases, horizon_ms)
+    results = sink if sink is not None else ArrayResultTable(mode)
+    state = {'depth': 0, 'pending': None, 'next_timer': 1, 'flushed': 0, 'dropped': 0, 'flushes': 0,
+             'flush_events': [] if sink is None else None}
+
+    hi = 0
+    for t1, work, final in chunks:
+        lo, hi = hi, hi + len(t1)
+        if work is None:
+            work = CONTROL_TASK_WCET_MS + rng.uniform(-1, 1, hi - lo)
+        in_burst = (t1 >= BURST_START_S * 1000) & (t1 < BURST_END_S * 1000)
+        cols = {'t1': t1, 'work': work, 'in_burst': in_burst}
+        if mode == 'sync':
+            cols['db'] = _spiffs_write_array(rng, hi - lo) * np.where(in_burst, BURST_FACTOR, 1.0)
+        elif mode == 'async':
+            timer_end = horizon_ms
+            if releases is not None:
+                # Replays stop flushing at the first timer tick after the last release
+                timer_end = min(horizon_ms, (int(t1[-1]) // FLUSH_INTERVAL_MS + 1) * FLUSH_INTERVAL_MS + 1)
+            cols['buffer_depth'] = _async_depth_chunk(t1, state, rng, timer_end, final=final)
+        if sink is not None:
+            chunk = ArrayResultTable(mode, first_task_id=lo + 1)
+            chunk.add_chunk(**cols)
+            sink.add_table(chunk)
+        else:
+            results.add_chunk(**cols)
+        if verbose:
+            print(f"Tasks: {hi}{progress_total}", end='\r')
+
+    if verbose:
+        print()
+    counters = {'enqueued': hi - state['dropped'], 'flushed': state['flushed'],
+                'dropped': state['dropped'], 'flushes': state['flushes']}
+    return results, state['flush_events'] or [], counters
+
+
+def make_rng(backend, seed=None):
+    """Random generator for a backend; seed may be an int or a sequence of ints."""
+    if backend == 'numpy':
+        return np.random.default_rng(seed)
+    if isinstance(seed, (list, tuple)):
+        # Hash the sequence so (seed, point, replication) give independent streams
+        seed = int.from_bytes(hashlib.sha256(repr(tuple(seed)).encode()).digest()[:8], 'big')
+    return random.Random(seed)
+
+
+def _run_backend(mode, duration_s, backend, seed=None, sink=None, storage=None, releases=None):
+    if backend == 'numpy':
+        return run_simulation_numpy(mode, duration_s, rng=make_rng(backend, seed), sink=sink, storage=storage,
+                                    releases=releases)
+    return run_simulation(mode, duration_s, rng=make_rng(backend, seed) if seed is not None else None,
+                          sink=sink, storage=storage, releases=releases)
+
+
+def simulate_baseline(duration_s=SIM_DURATION_S, backend='events', seed=None, sink=None, storage=None,
+                      releases=None):
     """Baseline: no DB logging, best-case performance."""
     print("\n=== BASELINE (No DB Logging) ===")
-    results = []
-    
-    start_time = now_ms()
-    sim_time_ms = 0
-    task_count = 0
-    
-    while sim_time_ms < (SIM_DURATION_S * 1000):
-        task_count += 1
-        
-        # T1: Task start
-        t1 = sim_time_ms
-        
-        # Simulate control task work (sensor read, decision logic)
-        work_time = CONTROL_TASK_WCET_MS + random.uniform(-1, 1)
-        
-        # T5: Task complete
-        t5 = t1 + work_time
-        
-        response_time = t5 - t1
-        deadline_hit = response_time <= CONTROL_TASK_DEADLINE_MS
-        
-        results.append({
-            'task_id': task_count,
-            't1': t1,
-            't5': t5,
-            'response_ms': response_time,
-            'db_time_ms': 0,
-            'non_db_time_ms': response_time,
-            'deadline_hit': deadline_hit
-        })
-        
-        sim_time_ms += CONTROL_TASK_PERIOD_MS
-        
-        if task_count % 20 == 0:
-            print(f"Tasks: {task_count} | Response: {response_time:.2f}ms | Deadline: {'HIT' if deadline_hit else 'MISS'}", end='\r')
-    
-    print()
+    results, _, _ = _run_backend('baseline', duration_s, backend, seed, sink, storage, releases)
     return results
 
-def simulate_sync():
+
+def simulate_sync(duration_s=SIM_DURATION_S, backend='events', seed=None, sink=None, storage=None,
+                  releases=None):
     """Synchronous DB writes: blocking, adds SPIFFS latency to critical path."""
     print("\n=== SYNC (Blocking SPIFFS Writes) ===")
-    results = []
-    
-    sim_time_ms = 0
-    task_count = 0
-    
-    while sim_time_ms < (SIM_DURATION_S * 1000):
-        task_count += 1
-        
-        # Determine if in burst period
-        in_burst = (BURST_START_S * 1000) <= sim_time_ms < (BURST_END_S * 1000)
-        contention_factor = BURST_FACTOR if in_burst else 1.0
-        
-        # T1: Task start
-        t1 = sim_time_ms
-        
-        # Simulate control task work
-        work_time = CONTROL_TASK_WCET_MS + random.uniform(-1, 1)
-        t2 = t1 + work_time
-        
-        # T3: Synchronous SPIFFS write (BLOCKS task)
-        write_time = simulate_spiffs_write() * contention_factor
-        t4 = t2 + write_time
-        
-        # T5: Task complete (after write)
-        t5 = t4
-        
-        response_time = t5 - t1
-        db_time = write_time
-        non_db_time = response_time - db_time
-        deadline_hit = response_time <= CONTROL_TASK_DEADLINE_MS
-        
-        results.append({
-            'task_id': task_count,
-            't1': t1,
-            't2': t2,
-            't3': t2,
-            't4': t4,
-            't5': t5,
-            'response_ms': response_time,
-            'db_time_ms': db_time,
-            'non_db_time_ms': non_db_time,
-            'deadline_hit': deadline_hit,
-            'in_burst': in_burst
-        })
-        
-        sim_time_ms += CONTROL_TASK_PERIOD_MS
-        
-        if task_count % 20 == 0:
-            print(f"Tasks: {task_count} | Response: {response_time:.2f}ms | DB: {db_time:.2f}ms | Deadline: {'HIT' if deadline_hit else 'MISS'}", end='\r')
-    
-    print()
+    results, _, counters = _run_backend('sync', duration_s, backend, seed, sink, storage, releases)
+    if 'storage' in counters:
+        print(f"Storage: {counters['storage']}")
     return results
 
-def simulate_async():
+
+def simulate_async(duration_s=SIM_DURATION_S, backend='events', seed=None, sink=None, storage=None,
+                   releases=None):
     """Asynchronous buffered writes: enqueue fast, background flush."""
     print("\n=== ASYNC (Buffered + Background Flush) ===")
-    results = []
-    buffer = deque(maxlen=BUFFER_SIZE)
-    
-    sim_time_ms = 0
-    task_count = 0
-    last_flush_ms = 0
-    total_enqueued = 0
-    total_flushed = 0
-    total_dropped = 0
-    
-    # Background flush tracking
-    flush_events = []
-    
-    while sim_time_ms < (SIM_DURATION_S * 1000):
-        task_count += 1
-        
-        # Check if should flush (time-based)
-        if (sim_time_ms - last_flush_ms) >= FLUSH_INTERVAL_MS and len(buffer) > 0:
-            # Simulate background task flushing
-            batch_size = min(BATCH_SIZE, len(buffer))
-            flush_time = simulate_spiffs_write() * (batch_size / 10.0)  # Batch write is more efficient
-            
-            flush_events.append({
-                'time_ms': sim_time_ms,
-                'batch_size': batch_size,
-                'flush_time_ms': flush_time
-            })
-            
-            # Remove flushed items
-            for _ in range(batch_size):
-                if buffer:
-                    buffer.popleft()
-                    total_flushed += 1
-            
-            last_flush_ms = sim_time_ms
-        
-        # Determine if in burst period
-        in_burst = (BURST_START_S * 1000) <= sim_time_ms < (BURST_END_S * 1000)
-        
-        # T1: Task start
-        t1 = sim_time_ms
-        
-        # Simulate control task work
-        work_time = CONTROL_TASK_WCET_MS + random.uniform(-1, 1)
-        
-        # T2: Enqueue log (fast, ~1-10µs, negligible in sim)
-        enqueue_time = 0.001  # 1µs
-        t2 = t1 + work_time + enqueue_time
-        
-        # Try to enqueue
-        if len(buffer) < BUFFER_SIZE:
-            buffer.append({'task_id': task_count, 'time': sim_time_ms})
-            total_enqueued += 1
-        else:
-            # Buffer full: drop (or could block, but we choose drop for RT)
-            total_dropped += 1
-        
-        # T5: Task complete (no blocking on DB)
-        t5 = t2
-        
-        response_time = t5 - t1
-        db_time = 0  # No blocking DB time in critical path
-        non_db_time = response_time
-        deadline_hit = response_time <= CONTROL_TASK_DEADLINE_MS
-        
-        results.append({
-            'task_id': task_count,
-            't1': t1,
-            't2': t2,
-            't5': t5,
-            'response_ms': response_time,
-            'db_time_ms': db_time,
-            'non_db_time_ms': non_db_time,
-            'deadline_hit': deadline_hit,
-            'buffer_depth': len(buffer),
-            'in_burst': in_burst
-        })
-        
-        sim_time_ms += CONTROL_TASK_PERIOD_MS
-        
-        if task_count % 20 == 0:
-            print(f"Tasks: {task_count} | Response: {response_time:.2f}ms | Buffer: {len(buffer)}/{BUFFER_SIZE} | Dropped: {total_dropped}", end='\r')
-    
-    print()
-    print(f"Total enqueued: {total_enqueued} | Flushed: {total_flushed} | Dropped: {total_dropped}")
-    print(f"Flush events: {len(flush_events)}")
-    
+    results, flush_events, counters = _run_backend('async', duration_s, backend, seed, sink, storage, releases)
+    print(f"Total enqueued: {counters['enqueued']} | Flushed: {counters['flushed']} | Dropped: {counters['dropped']}")
+    print(f"Flush events: {counters['flushes']}")
+    if 'storage' in counters:
+        print(f"Storage: {counters['storage']}")
     return results, flush_events
 
-def analyze_results(results, label):
-    """Compute KPIs from results."""
-    response_times = [r['response_ms'] for r in results]
-    db_times = [r['db_time_ms'] for r in results]
-    non_db_times = [r['non_db_time_ms'] for r in results]
-    misses = sum(1 for r in results if not r['deadline_hit'])
-    
-    def pct(data, p):
-        if not data: return 0
-        sorted_data = sorted(data)
-        k = (len(sorted_data)-1) * (p/100.0)
-        f = int(k)
-        c = min(f+1, len(sorted_data)-1)
-        if f == c:
-            return sorted_data[int(k)]
-        d0 = sorted_data[f] * (c-k)
-        d1 = sorted_data[c] * (k-f)
-        return d0 + d1
-    
-    kpi = {
-        'label': label,
-        'total_tasks': len(results),
-        'deadline_misses': misses,
-        'miss_rate': misses * 100.0 / len(results),
-        'response_p50': pct(response_times, 50),
-        'response_p95': pct(response_times, 95),
-        'response_p99': pct(response_times, 99),
-        'response_max': max(response_times),
-        'jitter': pct(response_times, 99) - pct(response_times, 50),
-        'db_time_p50': pct(db_times, 50),
-        'db_time_p95': pct(db_times, 95),
-        'db_time_max': max(db_times) if db_times else 0,
-        'non_db_time_p50': pct(non_db_times, 50),
-        'non_db_time_p95': pct(non_db_times, 95)
-    }
-    
-    return kpi
+
+def analyze_results(results, label, exact=True):
+    """Compute KPIs from a ResultTable, ArrayResultTable or StreamingResults.
+
+    Streamed results already carry their accumulator. In-memory tables give
+    exact percentiles by default; exact=False uses the µs histograms.
+    """
+    if isinstance(results, StreamingResults):
+        return results.kpi(label)
+    acc = KPIAccumulator(exact=exact)
+    names = KPIAccumulator.COLUMNS + ('deadline_hit',)
+    if 'buffer_depth' in results.fields:
+        names += ('buffer_depth',)
+    acc.add_columns({name: results.column(name) for name in names})
+    return acc.kpi(label)
 
 def print_kpi(kpi):
     """Pretty-print KPI."""
@@ -298,33 +835,128 @@ def print_kpi(kpi):
     print(f"Non-DB time (ms): p50={kpi['non_db_time_p50']:.3f} p95={kpi['non_db_time_p95']:.3f}")
 
 def write_csv(results, filename):
-    """Write results to CSV."""
+    """Write a ResultTable to CSV."""
     os.makedirs(OUT_DIR, exist_ok=True)
     path = os.path.join(OUT_DIR, filename)
     
-    if not results:
+    if not len(results):
         return
     
     with open(path, 'w', newline='') as f:
-        w = csv.DictWriter(f, fieldnames=results[0].keys())
-        w.writeheader()
-        w.writerows(results)
+        w = csv.writer(f)
+        w.writerow(results.fields)
+        w.writerows(results.iter_values())
     
     print(f"Wrote {path}")
 
+def write_cols(results, filename, meta=None):
+    """Write a ResultTable/ArrayResultTable as a columnar .cols table."""
+    if not len(results):
+        return
+    path = columnar.write_table(os.path.join(OUT_DIR, filename), results.schema,
+                                {name: results.column(name) for name in results.fields}, meta)
+    print(f"Wrote {path}")
+
 def main():
+    p = argparse.ArgumentParser(description='DB/I-O impact simulator (baseline vs sync vs async)')
+    p.add_argument('--duration-s', type=float, default=None,
+                   help=f'Simulated time in seconds (default: {SIM_DURATION_S}, or the whole trace with '
+                        f'--trace-log; 2592000 = 30 days)')
+    p.add_argument('--backend', choices=['events', 'numpy'], default=None,
+                   help='events: reference discrete-event engine; numpy: vectorised array backend '
+                        f'(default: events, numpy above {LONG_RUN_S}s when possible)')
+    p.add_argument('--seed', type=int, default=None,
+                   help='Seed the random generator for a reproducible run')
+    p.add_argument('--stream', action=argparse.BooleanOptionalAction, default=None,
+                   help='Stream rows to the CSVs as they are produced and keep only KPI histograms (flat memory; '
+                        f'default above {LONG_RUN_S}s)')
+    p.add_argument('--exact', action='store_true',
+                   help='With --stream, also keep raw values for exact percentiles (memory grows with run length)')
+    p.add_argument('--format', choices=['csv', 'cols', 'both'], default=None,
+                   help='Per-task output: CSV, binary columnar .cols tables (see columnar.py), or both '
+                        f'(default: both, cols above {LONG_RUN_S}s)')
+    p.add_argument('--storage', choices=['gaussian', 'spiffs'], default='gaussian',
+                   help='gaussian: size-independent clamped Gaussian; spiffs: page/erase-block/GC model of fileLog()')
+    p.add_argument('--fs-fill', type=float, default=0.5,
+                   help='SPIFFS partition fill level from other files, 0.0-1.0 (--storage spiffs)')
+    p.add_argument('--record-bytes', type=int, default=storage_model.RECORD_BYTES,
+                   help='Bytes per log record (--storage spiffs)')
+    p.add_argument('--trace-log', default=None,
+                   help='Replay release instants and execution times from a serial log (parse_logs.py format)')
+    p.add_argument('--trace-task', default=TRACE_TASK,
+                   help=f'Task whose log lines drive the replay (default: {TRACE_TASK})')
+    p.add_argument('--write-trace', default=None,
+                   help='Replay recorded write latencies (CSV with write_ms/latency_ms/db_time_ms, '
+                        'or one value per line) instead of --storage')
+    args = p.parse_args()
+    duration_s = args.duration_s
+    if duration_s is None and args.trace_log is None:
+        duration_s = SIM_DURATION_S
+    storage_name = 'trace' if args.write_trace else args.storage
+    long_run = duration_s is not None and duration_s > LONG_RUN_S
+    if args.backend is None:
+        fast = long_run and np is not None and not args.write_trace and args.storage == 'gaussian'
+        args.backend = 'numpy' if fast else 'events'
+    if args.stream is None:
+        args.stream = long_run
+    if args.format is None:
+        args.format = 'cols' if long_run else 'both'
+    if args.backend == 'numpy' and np is None:
+        p.error('--backend numpy requires NumPy (pip install numpy)')
+    if args.backend == 'numpy' and args.write_trace:
+        p.error('--write-trace needs the event backend')
+    if args.backend == 'numpy' and args.storage != 'gaussian':
+        p.error('--storage spiffs needs the event backend (stateful model)')
+    if args.trace_log and next(read_release_trace(args.trace_log, args.trace_task), None) is None:
+        p.error(f'no {args.trace_task} lines in {args.trace_log}')
+
+    if args.trace_log:
+        duration_desc = f"{args.trace_task} trace {args.trace_log}"
+        if duration_s is not None:
+            duration_desc += f" (first {duration_s:g}s)"
+    else:
+        duration_desc = f"{duration_s:g}s"
+
     print("="*70)
     print("DB/I-O IMPACT ON REAL-TIME PERFORMANCE")
     print("="*70)
-    print(f"Simulation duration: {SIM_DURATION_S}s")
+    print(f"Simulation duration: {duration_desc}")
     print(f"Control task: period={CONTROL_TASK_PERIOD_MS}ms, deadline={CONTROL_TASK_DEADLINE_MS}ms, WCET={CONTROL_TASK_WCET_MS}ms")
-    print(f"SPIFFS write: mean={SPIFFS_WRITE_MEAN_MS}ms, range=[{SPIFFS_WRITE_MIN_MS}, {SPIFFS_WRITE_MAX_MS}]ms")
+    storage_desc = make_storage(storage_name, args.fs_fill, args.record_bytes, args.write_trace).describe()
+    print(f"Storage model: {storage_desc}")
     print(f"Burst period: {BURST_START_S}-{BURST_END_S}s (factor={BURST_FACTOR}x)")
+    if long_run:
+        print(f"Long run: backend={args.backend}, {'streamed' if args.stream else 'in memory'}, "
+              f"format={args.format}" + (" (event engine: expect minutes)" if args.backend == 'events' else ''))
     
     # Run simulations
-    results_baseline = simulate_baseline()
-    results_sync = simulate_sync()
-    results_async, flush_events = simulate_async()
+    seeds = [None] * 3 if args.seed is None else [[args.seed, i] for i in range(3)]
+    modes = ('baseline', 'sync', 'async')
+    want_csv = args.format in ('csv', 'both')
+    want_cols = args.format in ('cols', 'both')
+    metas = [{'mode': mode, 'duration': duration_desc, 'backend': args.backend, 'seed': args.seed,
+              'storage': storage_desc} for mode in modes]
+    sinks = [None] * 3
+    if args.stream:
+        sinks = [StreamingResults(RESULT_FIELDS[mode],
+                                  os.path.join(OUT_DIR, f'db_impact_{mode}.csv') if want_csv else None,
+                                  exact=args.exact,
+                                  cols_path=os.path.join(OUT_DIR, f'db_impact_{mode}.cols') if want_cols else None,
+                                  meta=meta)
+                 for mode, meta in zip(modes, metas)]
+    # Storage models are stateful (fill level, log size): one per run
+    storages = [make_storage(storage_name, args.fs_fill, args.record_bytes, args.write_trace) for _ in range(3)]
+    # The trace is re-read for each mode rather than held in memory
+    releases = [None] * 3
+    if args.trace_log:
+        releases = [read_release_trace(args.trace_log, args.trace_task) for _ in range(3)]
+    results_baseline = simulate_baseline(duration_s, args.backend, seeds[0], sinks[0], storages[0], releases[0])
+    results_sync = simulate_sync(duration_s, args.backend, seeds[1], sinks[1], storages[1], releases[1])
+    results_async, flush_events = simulate_async(duration_s, args.backend, seeds[2], sinks[2], storages[2],
+                                                 releases[2])
+    for sink in sinks:
+        if sink is not None:
+            sink.close()
     
     # Analyze
     kpi_baseline = analyze_results(results_baseline, 'BASELINE')
@@ -339,10 +971,13 @@ def main():
     print_kpi(kpi_sync)
     print_kpi(kpi_async)
     
-    # Write CSVs
-    write_csv(results_baseline, 'db_impact_baseline.csv')
-    write_csv(results_sync, 'db_impact_sync.csv')
-    write_csv(results_async, 'db_impact_async.csv')
+    # Write per-task tables (streamed runs wrote theirs already)
+    if not args.stream:
+        for mode, results, meta in zip(modes, (results_baseline, results_sync, results_async), metas):
+            if want_csv:
+                write_csv(results, f'db_impact_{mode}.csv')
+            if want_cols:
+                write_cols(results, f'db_impact_{mode}.cols', meta)
     
     # Write summary
     summary_path = os.path.join(OUT_DIR, 'db_impact_summary.txt')
@@ -351,9 +986,9 @@ def main():
         f.write("="*70 + "\n\n")
         
         f.write("CONFIGURATION\n")
-        f.write(f"Simulation duration: {SIM_DURATION_S}s\n")
+        f.write(f"Simulation duration: {duration_desc}\n")
         f.write(f"Control task: period={CONTROL_TASK_PERIOD_MS}ms, deadline={CONTROL_TASK_DEADLINE_MS}ms\n")
-        f.write(f"SPIFFS write: mean={SPIFFS_WRITE_MEAN_MS}ms (range {SPIFFS_WRITE_MIN_MS}-{SPIFFS_WRITE_MAX_MS}ms)\n")
+        f.write(f"Storage model: {storage_desc}\n")
         f.write(f"Burst: {BURST_START_S}-{BURST_END_S}s (factor {BURST_FACTOR}x)\n\n")
         
         f.write("="*70 + "\n")
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Preemptive scheduler simulator: fixed priority vs EDF on the ESP32's two cores.
+
+Loads the task sets from configs/*.json (baseline.json: static priorities,
+improved.json: earliest deadline first) and pins every task to the core
+used by xTaskCreatePinnedToCore() in src/main.cpp. Each core runs its own
+preemptive scheduler; the highest-priority (FP) or earliest-deadline (EDF)
+ready job always runs, equal keys are served first-come first-served.
+
+Scenarios (burst window BURST_START_S..BURST_END_S, as in the other scripts):
+- nominal:  execution times in [BCET_FRACTION*WCET, WCET]
+- moderate: jobs released in the burst run 4x longer
+- severe:   10x longer, plus 5 sporadic SPORADIC_TASK jobs (retries) at
+            random instants inside the burst
+
+Each task's first release is offset by a seeded random phase in [0, T) (the
+firmware tasks start their vTaskDelay loops at unrelated instants);
+--sync-release releases everything at t=0, the critical instant.
+
+Simulation is event-driven: a heap of pending releases and a heap-ordered
+ready queue per core, so time jumps from one release/completion to the
+next and hours of simulated time take seconds.
+
+Run:
+  python scripts/simulate_overload.py
+  python scripts/simulate_overload.py --config configs/improved.json --scenario severe --duration-s 36000
+  python scripts/simulate_overload.py --burst-factor 6 --sporadic 20
+
+Outputs:
+- per-task KPI tables on stdout
+- results/scheduling_overload.csv
+"""
+import argparse
+import csv
+import heapq
+import json
+import os
+import random
+
+from latency_stats import LatencyHistogram
+
+CONFIGS = ['configs/baseline.json', 'configs/improved.json']
+
+# Config task -> core, from xTaskCreatePinnedToCore() in src/main.cpp
+# (Sensor = SoilTask/DHTTask, Display = the LCD task). A task may override
+# this with a "core" entry in the config.
+CORE_PINNING = {'Switch': 1, 'Sensor': 1, 'Weather': 0, 'Network': 0, 'Display': 0}
+
+SIM_DURATION_S = 600
+BCET_FRACTION = 0.5  # best case = half the WCET
+
+BURST_START_S = 20
+BURST_END_S = 30
+
+# name -> (burst factor, sporadic jobs)
+SCENARIOS = {
+    'nominal': (1, 0),
+    'moderate': (4, 0),
+    'severe': (10, 5),
+}
+SPORADIC_TASK = 'Network'
+
+OUT_CSV = 'results/scheduling_overload.csv'
+CSV_FIELDS = ['config', 'policy', 'scenario', 'core', 'task', 'firmness', 'jobs', 'misses', 'miss_rate',
+              'response_p50', 'response_p95', 'response_p99', 'response_max', 'preemptions']
+
+
+class Task:
+    def __init__(self, name, period_ms, wcet_ms, deadline_ms, priority, core, firmness='hard'):
+        self.name = name
+        self.period_ms = period_ms
+        self.wcet_ms = wcet_ms
+        self.deadline_ms = deadline_ms
+        self.priority = priority
+        self.core = core
+        self.firmness = firmness
+
+
+def load_config(path):
+    """(name, policy, tasks) from a configs/*.json file; policy is 'fp' or 'edf'."""
+    with open(path, encoding='utf-8') as f:
+        cfg = json.load(f)
+    sched = cfg['scheduling']
+    tasks = []
+    for name, t in sched['tasks'].items():
+        prio = t.get('priority')
+        tasks.append(Task(name, t['period_ms'], t['wcet_ms'], t.get('deadline_ms', t['period_ms']),
+                          prio if isinstance(prio, (int, float)) else None,
+                          t.get('core', CORE_PINNING.get(name, 0)), t.get('firmness', 'hard')))
+    edf = sched.get('algorithm') == 'earliest_deadline_first' or any(t.priority is None for t in tasks)
+    return cfg.get('name', os.path.basename(path)), 'edf' if edf else 'fp', tasks
+
+
+class TaskStats:
+    def __init__(self):
+        self.jobs = 0
+        self.misses = 0
+        self.preemptions = 0
+        self.response = LatencyHistogram()
+
+
+def simulate_core(tasks, policy, horizon_ms, rng, burst_factor=1, extra_jobs=(), stats=None, phases=None):
+    """Run one core's preemptive scheduler until every job released before
+    the horizon has completed.
+
+    ``tasks`` are released at their phase (default 0, the critical instant)
+    and then every period; ``extra_jobs`` are (release_ms, task_index,
+    exec_ms) sporadic jobs. Returns {task name: TaskStats}.
+    """
+    stats = stats if stats is not None else {t.name: TaskStats() for t in tasks}
+    burst_lo, burst_hi = BURST_START_S * 1000, BURST_END_S * 1000
+    releases = [(phases[i] if phases else 0.0, i, None) for i in range(len(tasks))]
+    releases.extend(extra_jobs)
+    heapq.heapify(releases)
+    ready = []  # (key, release, seq, job); job = [task index, remaining, release]
+    seq = 0
+
+    def release_due(now):
+        nonlocal seq
+        while releases and releases[0][0] <= now:
+            t_rel, i, exec_ms = heapq.heappop(releases)
+            task = tasks[i]
+            if exec_ms is None:
+                # Periodic release: draw the execution time, arm the next one
+                exec_ms = task.wcet_ms * rng.uniform(BCET_FRACTION, 1.0)
+                if burst_lo <= t_rel < burst_hi:
+                    exec_ms *= burst_factor
+                if t_rel + task.period_ms < horizon_ms:
+                    heapq.heappush(releases, (t_rel + task.period_ms, i, None))
+            key = t_rel + task.deadline_ms if policy == 'edf' else -task.priority
+            seq += 1
+            heapq.heappush(ready, (key, t_rel, seq, [i, exec_ms, t_rel]))
+
+    now = 0.0
+    while releases or ready:
+        next_release = releases[0][0] if releases else float('inf')
+        if not ready:
+            now = next_release
+            release_due(now)
+            continue
+        job = ready[0][3]
+        finish = now + job[1]
+        if finish <= next_release:
+            heapq.heappop(ready)
+            now = finish
+            task = tasks[job[0]]
+            st = stats[task.name]
+            response = now - job[2]
+            st.jobs += 1
+            st.response.add(response)
+            if response > task.deadline_ms:
+                st.misses += 1
+        else:
+            job[1] -= next_release - now
+            now = next_release
+            release_due(now)
+            if ready[0][3] is not job:
+                stats[tasks[job[0]].name].preemptions += 1
+    return stats
+
+
+def simulate(tasks, policy, duration_s, burst_factor=1, sporadic=0, seed=None, scenario='', sync_release=False):
+    """Simulate every core; returns {task name: TaskStats}."""
+    horizon_ms = duration_s * 1000
+    stats = {t.name: TaskStats() for t in tasks}
+    phase_rng = random.Random(f'{seed}:phase')
+    phase = {t.name: 0.0 if sync_release else phase_rng.uniform(0, t.period_ms) for t in tasks}
+    sp_rng = random.Random(f'{seed}:{scenario}:sporadic')
+    sporadic_times = sorted(sp_rng.uniform(BURST_START_S * 1000, BURST_END_S * 1000) for _ in range(sporadic))
+    for core in sorted({t.core for t in tasks}):
+        core_tasks = [t for t in tasks if t.core == core]
+        extra = []
+        for i, task in enumerate(core_tasks):
+            if task.name == SPORADIC_TASK:
+                extra = [(t, i, task.wcet_ms * burst_factor * sp_rng.uniform(BCET_FRACTION, 1.0))
+                         for t in sporadic_times]
+        # Same seed per (scenario, core) so FP and EDF see identical execution times
+        rng = random.Random(f'{seed}:{scenario}:{core}')
+        simulate_core(core_tasks, policy, horizon_ms, rng, burst_factor, extra, stats,
+                      [phase[t.name] for t in core_tasks])
+    return stats
+
+
+def kpi_rows(config_name, policy, scenario, tasks, stats):
+    rows = []
+    for task in sorted(tasks, key=lambda t: (t.core, t.name)):
+        st = stats[task.name]
+        p50, p95, p99 = st.response.percentiles((50, 95, 99))
+        rows.append({
+            'config': config_name, 'policy': policy, 'scenario': scenario, 'core': task.core,
+            'task': task.name, 'firmness': task.firmness, 'jobs': st.jobs, 'misses': st.misses,
+            'miss_rate': st.misses / st.jobs if st.jobs else 0.0,
+            'response_p50': p50, 'response_p95': p95, 'response_p99': p99,
+            'response_max': st.response.max or 0.0, 'preemptions': st.preemptions,
+        })
+    return rows
+
+
+def print_table(config_name, policy, scenario, tasks, rows):
+    by_name = {t.name: t for t in tasks}
+    print(f"\n=== {config_name} ({'EDF' if policy == 'edf' else 'fixed priority'}) | {scenario} ===")
+    for core in sorted({t.core for t in tasks}):
+        u = sum(t.wcet_ms / t.period_ms for t in tasks if t.core == core)
+        print(f"core {core}: U(WCET)={u:.4f}")
+    print(f"{'core':>4} {'task':<10} {'prio':>5} {'T':>6} {'C':>5} {'D':>6} {'jobs':>7} {'miss':>6} {'miss%':>7} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8} {'max':>9} {'preempt':>7}")
+    for r in rows:
+        t = by_name[r['task']]
+        prio = 'dyn' if t.priority is None else t.priority
+        print(f"{r['core']:>4} {r['task']:<10} {prio:>5} {t.period_ms:>6} {t.wcet_ms:>5} {t.deadline_ms:>6} "
+              f"{r['jobs']:>7} {r['misses']:>6} {r['miss_rate']*100:>6.2f}% {r['response_p50']:>8.2f} "
+              f"{r['response_p95']:>8.2f} {r['response_p99']:>8.2f} {r['response_max']:>9.2f} {r['preemptions']:>7}")
+
+
+def main():
+    p = argparse.ArgumentParser(description='Preemptive FP vs EDF two-core scheduler simulator')
+    p.add_argument('--config', action='append', help='Config JSON (repeatable; default: baseline and improved)')
+    p.add_argument('--scenario', choices=sorted(SCENARIOS) + ['all'], default='all')
+    p.add_argument('--burst-factor', type=float, default=None, help='Override the scenario burst factor')
+    p.add_argument('--sporadic', type=int, default=None,
+                   help=f'Override the number of sporadic {SPORADIC_TASK} jobs in the burst')
+    p.add_argument('--duration-s', type=float, default=SIM_DURATION_S,
+                   help=f'Simulated seconds (default: {SIM_DURATION_S})')
+    p.add_argument('--sync-release', action='store_true', help='Release every task at t=0 (no random phases)')
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('-o', '--out', default=OUT_CSV)
+    args = p.parse_args()
+
+    scenarios = sorted(SCENARIOS, key=lambda s: SCENARIOS[s]) if args.scenario == 'all' else [args.scenario]
+    print("=" * 70)
+    print("PREEMPTIVE SCHEDULING: FIXED PRIORITY vs EDF (2 cores)")
+    print("=" * 70)
+    print(f"Duration: {args.duration_s:g}s | Burst: {BURST_START_S}-{BURST_END_S}s | "
+          f"Execution time: [{BCET_FRACTION:g}, 1] x WCET | "
+          f"Release: {'synchronous' if args.sync_release else 'random phase'} | Seed: {args.seed}")
+
+    rows = []
+    for path in args.config or CONFIGS:
+        name, policy, tasks = load_config(path)
+        for scenario in scenarios:
+            factor, sporadic = SCENARIOS[scenario]
+            if args.burst_factor is not None:
+                factor = args.burst_factor
+            if args.sporadic is not None:
+                sporadic = args.sporadic
+            stats = simulate(tasks, policy, args.duration_s, factor, sporadic, args.seed, scenario,
+                             args.sync_release)
+            table = kpi_rows(name, policy, scenario, tasks, stats)
+            print_table(name, policy, scenario, tasks, table)
+            rows.extend(table)
+
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+    print(f"\nWrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Storage cost models for the DB/I-O simulator.
+
+A storage model answers one question: how long does it take to append log
+records of `record_bytes` each? `append(rng)` is one synchronous fileLog()
+call; `flush(rng, records)` is one background batch of `records` lines.
+
+Models:
+- GaussianStorage: the original clamped-Gaussian write latency. Payload size
+  is ignored; a batch flush costs `write * records/10` (legacy async rule).
+- SpiffsStorage: stateful SPIFFS-on-NOR model of `fileLog()` in
+  src/main.cpp. Each call pays the lookups for `exists` + `open` + `size`,
+  the page programs for the payload plus index/header updates on close,
+  garbage collection (move live pages + erase a block) once the erased pool
+  runs out, and `remove` + `rename` when the log passes 64 KB. GC cost
+  grows with the partition fill level because victim blocks hold more live
+  pages that must be moved. When GC cannot free enough pages beyond its
+  reserve the write fails like SPIFFS_ERR_FULL: nothing is written, the
+  call still pays its lookups and GC, and stats counts `failed_writes`
+  and `records_lost`.
+- TraceStorage: replays write latencies recorded on a real device.
+
+Defaults follow the esp32dev layout: a 0x170000-byte SPIFFS partition,
+256 B pages, 4 KB erase blocks.
+
+Run (batch cost table at several fill levels):
+  python scripts/storage_model.py
+  python scripts/storage_model.py --record-bytes 200 --fills 0.2,0.8,0.95
+"""
+import argparse
+import csv
+import random
+
+# SPIFFS layout (esp32dev default partition table)
+PARTITION_BYTES = 0x170000
+PAGE_BYTES = 256
+BLOCK_BYTES = 4096
+PAGE_HEADER_BYTES = 5  # obj id + span ix + flags per data page
+
+# NOR flash timings (typical for the ESP32 module flash)
+PAGE_PROGRAM_MS = 0.7
+BLOCK_ERASE_MS = 45.0
+PAGE_DELETE_MS = 0.05  # clear flag bits when a page becomes obsolete
+LOOKUP_MS_PER_BLOCK = 0.02  # scan of one block's object lookup page
+
+# fileLog() behaviour
+RECORD_BYTES = 128
+MAX_LOG_BYTES = 64 * 1024
+META_PAGES_PER_CLOSE = 2  # object index page + object header rewritten on close
+GC_FREE_BLOCKS = 2  # SPIFFS keeps this many erased blocks in reserve
+
+# Legacy Gaussian model parameters (same numbers as simulate_db_impact.py)
+GAUSS_MIN_MS = 10
+GAUSS_MAX_MS = 50
+GAUSS_MEAN_MS = 25
+GAUSS_STDDEV_MS = 8
+
+
+class GaussianStorage:
+    """Clamped Gaussian latency that ignores payload size and fill level."""
+
+    name = 'gaussian'
+
+    def __init__(self, mean_ms=GAUSS_MEAN_MS, stddev_ms=GAUSS_STDDEV_MS,
+                 min_ms=GAUSS_MIN_MS, max_ms=GAUSS_MAX_MS):
+        self.mean_ms = mean_ms
+        self.stddev_ms = stddev_ms
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+
+    def append(self, rng):
+        return max(self.min_ms, min(self.max_ms, rng.gauss(self.mean_ms, self.stddev_ms)))
+
+    def flush(self, rng, records):
+        # Batch write is more efficient
+        return self.append(rng) * (records / 10.0)
+
+    def describe(self):
+        return f"gaussian mean={self.mean_ms}ms range=[{self.min_ms}, {self.max_ms}]ms"
+
+
+class SpiffsStorage:
+    """Stateful SPIFFS model of fileLog(): page programs, GC and rotation.
+
+    Page accounting is per partition: `free` pages are erased and
+    programmable, `live` pages hold file data or metadata, `dirty` pages are
+    obsolete and only come back through GC. `fill` is the fraction of the
+    partition taken by other files (e.g. the web UI in data/www).
+    """
+
+    name = 'spiffs'
+
+    def __init__(self, fill=0.5, record_bytes=RECORD_BYTES, partition_bytes=PARTITION_BYTES,
+                 page_bytes=PAGE_BYTES, block_bytes=BLOCK_BYTES, noise=0.1):
+        self.record_bytes = record_bytes
+        self.page_bytes = page_bytes
+        self.payload_per_page = page_bytes - PAGE_HEADER_BYTES
+        self.pages_per_block = block_bytes // page_bytes
+        self.blocks = partition_bytes // block_bytes
+        self.total_pages = self.blocks * self.pages_per_block
+        self.noise = noise
+        self.fill = fill
+        self.live = int(self.total_pages * fill)
+        self.dirty = 0
+        self.free = self.total_pages - self.live
+        self.log_bytes = 0  # /edf_log.txt
+        self.bak_pages = 0  # /edf_log.bak
+        self.stats = {'gc_runs': 0, 'blocks_erased': 0, 'pages_moved': 0, 'rotations': 0,
+                      'failed_writes': 0, 'records_lost': 0}
+
+    def _lookup_ms(self):
+        # Object lookups scan every block that holds used pages
+        used_blocks = min(self.blocks, -(-(self.live + self.dirty) // self.pages_per_block))
+        return LOOKUP_MS_PER_BLOCK * max(1, used_blocks)
+
+    def _gc(self, needed):
+        """Reclaim dirty pages until `needed` free pages (plus reserve) exist."""
+        cost = 0.0
+        reserve = GC_FREE_BLOCKS * self.pages_per_block
+        while self.free < needed + reserve and self.dirty > 0:
+            # Victim: the dirtiest block; dirty pages cluster, so it holds at
+            # least the average share and at most a whole block
+            used = self.live + self.dirty
+            share = self.dirty / used if used else 1.0
+            reclaim = max(1, min(self.pages_per_block, self.dirty, round(self.pages_per_block * min(1.0, 2 * share))))
+            moved = self.pages_per_block - reclaim
+            cost += moved * PAGE_PROGRAM_MS + BLOCK_ERASE_MS
+            self.dirty -= reclaim
+            self.free += reclaim
+            self.stats['gc_runs'] += 1
+            self.stats['blocks_erased'] += 1
+            self.stats['pages_moved'] += moved
+        return cost
+
+    def _program(self, pages):
+        """(cost, ok) of programming `pages`; ok is False when the partition is full (nothing written)."""
+        cost = self._gc(pages)
+        if self.free - GC_FREE_BLOCKS * self.pages_per_block < pages:
+            return cost + self._lookup_ms(), False  # free-page search fails: SPIFFS_ERR_FULL
+        self.free -= pages
+        self.live += pages
+        return cost + pages * PAGE_PROGRAM_MS, True
+
+    def _obsolete(self, pages):
+        pages = min(pages, self.live)
+        self.live -= pages
+        self.dirty += pages
+        return pages * PAGE_DELETE_MS
+
+    def _rotate(self):
+        # SPIFFS.remove("/edf_log.bak") + SPIFFS.rename(txt, bak)
+        cost = self._lookup_ms() + self._obsolete(self.bak_pages)
+        log_pages = -(-self.log_bytes // self.payload_per_page)
+        self.bak_pages = log_pages
+        header_cost, ok = self._program(1)  # rewrite object header
+        cost += self._lookup_ms() + header_cost + (self._obsolete(1) if ok else 0.0)
+        self.log_bytes = 0
+        self.stats['rotations'] += 1
+        return cost
+
+    def append(self, rng):
+        return self.flush(rng, 1)
+
+    def flush(self, rng, records):
+        """Cost of one fileLog()-style open/append/close of `records` lines."""
+        cost = self._lookup_ms()  # SPIFFS.exists
+        cost += self._lookup_ms()  # open(FILE_READ) + size() + close()
+        if self.log_bytes > MAX_LOG_BYTES:
+            cost += self._rotate()
+        cost += self._lookup_ms()  # open(FILE_APPEND)
+
+        nbytes = records * self.record_bytes
+        # A partly filled last page is rewritten, the rest is new pages
+        tail = self.log_bytes % self.payload_per_page
+        new_pages = -(-(tail + nbytes) // self.payload_per_page)
+        program_cost, ok = self._program(new_pages)
+        cost += program_cost
+        if ok:
+            if tail:
+                cost += self._obsolete(1)
+            self.log_bytes += nbytes
+            # close(): object index + header are rewritten, old copies go dirty
+            meta_cost, ok = self._program(META_PAGES_PER_CLOSE)
+            cost += meta_cost + (self._obsolete(META_PAGES_PER_CLOSE) if ok else 0.0)
+        if not ok:
+            self.stats['failed_writes'] += 1
+            self.stats['records_lost'] += records
+        if self.noise:
+            cost *= max(0.5, rng.gauss(1.0, self.noise))
+        return cost
+
+    def fill_level(self):
+        return (self.live + self.dirty) / self.total_pages
+
+    def describe(self):
+        return (f"spiffs {self.blocks}x{self.pages_per_block}x{self.page_bytes}B, "
+                f"fill={self.fill:.2f}, record={self.record_bytes}B")
+
+
+class TraceStorage:
+    """Replays recorded write latencies, one trace entry per open/write/close.
+
+    The trace is a CSV with a `write_ms`, `latency_ms` or `db_time_ms` column
+    (so a previous db_impact_sync.csv works) or a bare list of numbers, one
+    per line. It is streamed, and restarts from the top when exhausted. A
+    batch flush is one recorded call, so record the trace from the writer
+    whose batching you want to replay.
+    """
+
+    name = 'trace'
+    COLUMNS = ('write_ms', 'latency_ms', 'db_time_ms')
+
+    def __init__(self, path):
+        self.path = path
+        self.stats = {'replays': 0}
+        self._values = self._read()
+        if next(self._read(), None) is None:
+            raise ValueError(f'no write latencies in {path}')
+
+    def _read(self):
+        with open(self.path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            col = next((header.index(c) for c in self.COLUMNS if c in header), None)
+            if col is None:
+                # No header: the first line is already data
+                col = 0
+                yield float(header[0])
+            for row in reader:
+                if len(row) > col and row[col].strip():
+                    yield float(row[col])
+
+    def append(self, rng):
+        value = next(self._values, None)
+        if value is None:
+            self.stats['replays'] += 1
+            self._values = self._read()
+            value = next(self._values)
+        return value
+
+    def flush(self, rng, records):
+        return self.append(rng)
+
+    def describe(self):
+        return f"trace {self.path}"
+
+
+def make_storage(name, fill=0.5, record_bytes=RECORD_BYTES, trace=None, **gauss):
+    """Fresh model by name; `gauss` overrides GaussianStorage parameters."""
+    if name == 'spiffs':
+        return SpiffsStorage(fill=fill, record_bytes=record_bytes)
+    if name == 'gaussian':
+        return GaussianStorage(**gauss)
+    if name == 'trace':
+        return TraceStorage(trace)
+    raise ValueError(f'unknown storage model: {name}')
+
+
+def batch_cost_table(fills, batches, record_bytes, writes=2000, seed=1):
+    """Mean cost per call and per record of `writes` calls for each batch size."""
+    rows = []
+    for fill in fills:
+        for batch in batches:
+            model = SpiffsStorage(fill=fill, record_bytes=record_bytes)
+            rng = random.Random(seed)
+            total = sum(model.flush(rng, batch) for _ in range(writes))
+            rows.append((fill, batch, total / writes, total / (writes * batch), model.stats['gc_runs'],
+                         model.stats['failed_writes']))
+    return rows
+
+
+def main():
+    p = argparse.ArgumentParser(description='SPIFFS fileLog() cost per batch size and fill level')
+    p.add_argument('--record-bytes', type=int, default=RECORD_BYTES)
+    p.add_argument('--fills', default='0.1,0.5,0.8,0.95', help='Comma-separated partition fill levels')
+    p.add_argument('--batches', default='1,5,10,20,50', help='Comma-separated records per call')
+    p.add_argument('--writes', type=int, default=2000, help='Calls simulated per cell')
+    args = p.parse_args()
+    fills = [float(v) for v in args.fills.split(',')]
+    batches = [int(v) for v in args.batches.split(',')]
+
+    print(f"{'fill':>5} {'batch':>5} {'ms/call':>9} {'ms/record':>10} {'x single':>9} {'gc_runs':>8} {'failed':>7}")
+    single = {}
+    for fill, batch, per_call, per_record, gc_runs, failed in batch_cost_table(fills, batches, args.record_bytes,
+                                                                                args.writes):
+        if batch == 1:
+            single[fill] = per_call
+        ratio = per_call / single[fill] if fill in single else float('nan')
+        print(f"{fill:>5.2f} {batch:>5} {per_call:>9.3f} {per_record:>10.3f} {ratio:>9.2f} {gc_runs:>8} {failed:>7}")
+    print("failed = calls that hit a full partition (SPIFFS_ERR_FULL, records lost)")
+
+
+if __name__ == '__main__':
+    main()
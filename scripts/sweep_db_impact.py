@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Monte-Carlo parameter sweep for the async DB logger.
+
+Runs the ASYNC model of simulate_db_impact.py over a grid (or a
+Latin-hypercube sample) of BUFFER_SIZE x FLUSH_INTERVAL_MS x BATCH_SIZE x
+BURST_FACTOR, with N seeded replications per point spread across a process
+pool. Every (point, replication) gets its own RNG stream derived from
+(--seed, point_id, rep), so results do not depend on worker count or order.
+
+Outputs one tidy table, one row per (point, replication):
+  point_id, rep, buffer_size, flush_interval_ms, batch_size, burst_factor,
+  tasks, deadline_misses, miss_rate, dropped, flushed, response_p99,
+  max_buffer_depth, failed_writes (SPIFFS full, --storage spiffs)
+
+Run:
+  python scripts/sweep_db_impact.py --buffer-size 25,50,100,200 --flush-interval-ms 1000,5000,10000 --batch-size 10,20,40
+  python scripts/sweep_db_impact.py --design lhs --samples 64 --buffer-size 10,200 --flush-interval-ms 500,20000 --reps 10
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+from contextlib import contextmanager
+from itertools import product
+
+import simulate_db_impact as sim
+
+OUT_CSV = 'results/db_sweep.csv'
+
+# Sweep axis -> simulator module constant
+AXES = [
+    ('buffer_size', 'BUFFER_SIZE'),
+    ('flush_interval_ms', 'FLUSH_INTERVAL_MS'),
+    ('batch_size', 'BATCH_SIZE'),
+    ('burst_factor', 'BURST_FACTOR'),
+]
+
+FIELDS = ['point_id', 'rep'] + [axis for axis, _ in AXES] + [
+    'tasks', 'deadline_misses', 'miss_rate', 'dropped', 'flushed', 'response_p99', 'max_buffer_depth',
+    'failed_writes']
+
+
+def parse_values(text):
+    return [int(v) for v in text.split(',') if v.strip()]
+
+
+def grid_design(values):
+    """Full factorial design over the per-axis value lists."""
+    return [dict(zip(values, combo)) for combo in product(*values.values())]
+
+
+def lhs_design(values, samples, seed=None):
+    """Latin-hypercube sample of `samples` integer points.
+
+    Each axis is stratified into `samples` equal slices of [min, max] of its
+    value list; one draw per slice, slices shuffled independently per axis.
+    """
+    rng = random.Random(seed)
+    columns = {}
+    for axis, vals in values.items():
+        lo, hi = min(vals), max(vals)
+        strata = [(i + rng.random()) / samples for i in range(samples)]
+        rng.shuffle(strata)
+        columns[axis] = [int(round(lo + u * (hi - lo))) for u in strata]
+    return [{axis: columns[axis][i] for axis in values} for i in range(samples)]
+
+
+@contextmanager
+def overridden(point):
+    """Temporarily set the simulator constants for one sweep point."""
+    saved = {const: getattr(sim, const) for axis, const in AXES}
+    try:
+        for axis, const in AXES:
+            setattr(sim, const, point[axis])
+        yield
+    finally:
+        for const, value in saved.items():
+            setattr(sim, const, value)
+
+
+def run_point(job):
+    """Pool worker: one replication of one sweep point -> tidy row dict."""
+    point_id, rep, point, seed, duration_s, backend, storage = job
+    with overridden(point):
+        rng = sim.make_rng(backend, [seed, point_id, rep])
+        # KPI-only sink: memory stays flat whatever the run length
+        sink = sim.StreamingResults(sim.RESULT_FIELDS['async'])
+        if backend == 'numpy':
+            _, _, counters = sim.run_simulation_numpy('async', duration_s, verbose=False, rng=rng, sink=sink)
+        else:
+            _, _, counters = sim.run_simulation('async', duration_s, verbose=False, rng=rng, sink=sink,
+                                                storage=sim.make_storage(*storage))
+        kpi = sim.analyze_results(sink, f'point{point_id}')
+    row = {'point_id': point_id, 'rep': rep}
+    row.update(point)
+    row.update({
+        'tasks': kpi['total_tasks'],
+        'deadline_misses': kpi['deadline_misses'],
+        'miss_rate': kpi['miss_rate'],
+        'dropped': counters['dropped'],
+        'flushed': counters['flushed'],
+        'response_p99': kpi['response_p99'],
+        'max_buffer_depth': kpi['buffer_depth_max'],
+        'failed_writes': counters.get('storage', {}).get('failed_writes', 0),
+    })
+    return row
+
+
+def run_sweep(points, reps, seed, duration_s, backend, workers, storage=('gaussian',)):
+    jobs = [(pid, rep, point, seed, duration_s, backend, storage)
+            for pid, point in enumerate(points) for rep in range(reps)]
+    rows = []
+    if workers <= 1:
+        for i, row in enumerate(map(run_point, jobs), 1):
+            rows.append(row)
+            print(f"Runs: {i}/{len(jobs)}", end='\r')
+    else:
+        chunksize = max(1, len(jobs) // (workers * 8))
+        with multiprocessing.Pool(workers) as pool:
+            for i, row in enumerate(pool.imap_unordered(run_point, jobs, chunksize), 1):
+                rows.append(row)
+                print(f"Runs: {i}/{len(jobs)}", end='\r')
+    print()
+    rows.sort(key=lambda r: (r['point_id'], r['rep']))
+    return rows
+
+
+def print_summary(rows):
+    """Mean over replications per point."""
+    by_point = {}
+    for row in rows:
+        by_point.setdefault(row['point_id'], []).append(row)
+    print(f"{'point':>5} {'buf':>5} {'flush_ms':>8} {'batch':>5} {'burst':>5} "
+          f"{'miss%':>7} {'dropped':>9} {'p99_ms':>8} {'max_depth':>9} {'failed':>7}")
+    for pid, group in sorted(by_point.items()):
+        n = len(group)
+        first = group[0]
+        print(f"{pid:>5} {first['buffer_size']:>5} {first['flush_interval_ms']:>8} {first['batch_size']:>5} "
+              f"{first['burst_factor']:>5} {sum(r['miss_rate'] for r in group)/n:>7.3f} "
+              f"{sum(r['dropped'] for r in group)/n:>9.1f} {sum(r['response_p99'] for r in group)/n:>8.3f} "
+              f"{max(r['max_buffer_depth'] for r in group):>9} "
+              f"{sum(r['failed_writes'] for r in group)/n:>7.1f}")
+
+
+def main():
+    p = argparse.ArgumentParser(description='Parallel Monte-Carlo sweep of the async DB logger')
+    p.add_argument('--buffer-size', type=parse_values, default=[25, 50, 100, 200],
+                   help='Comma-separated BUFFER_SIZE values (lhs: min,max range)')
+    p.add_argument('--flush-interval-ms', type=parse_values, default=[1000, 5000, 10000],
+                   help='Comma-separated FLUSH_INTERVAL_MS values')
+    p.add_argument('--batch-size', type=parse_values, default=[10, 20, 40],
+                   help='Comma-separated BATCH_SIZE values')
+    p.add_argument('--burst-factor', type=parse_values, default=[sim.BURST_FACTOR],
+                   help='Comma-separated BURST_FACTOR values')
+    p.add_argument('--design', choices=['grid', 'lhs'], default='grid',
+                   help='grid: full factorial; lhs: Latin-hypercube over each axis range')
+    p.add_argument('--samples', type=int, default=32, help='Number of LHS points (--design lhs)')
+    p.add_argument('--reps', type=int, default=5, help='Replications per point (default: 5)')
+    p.add_argument('--seed', type=int, default=1, help='Base seed for design and RNG streams')
+    p.add_argument('--duration-s', type=float, default=600, help='Simulated seconds per run (default: 600)')
+    p.add_argument('--backend', choices=['events', 'numpy'], default='events')
+    p.add_argument('--storage', choices=['gaussian', 'spiffs'], default='gaussian',
+                   help='Flush cost model (spiffs needs --backend events)')
+    p.add_argument('--fs-fill', type=float, default=0.5, help='SPIFFS fill level (--storage spiffs)')
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    p.add_argument('-o', '--out', default=OUT_CSV)
+    args = p.parse_args()
+    if args.backend == 'numpy' and sim.np is None:
+        p.error('--backend numpy requires NumPy (pip install numpy)')
+    if args.backend == 'numpy' and args.storage != 'gaussian':
+        p.error('--storage spiffs needs the event backend (stateful model)')
+
+    values = {axis: getattr(args, axis) for axis, _ in AXES}
+    if args.design == 'grid':
+        points = grid_design(values)
+    else:
+        points = lhs_design(values, args.samples, args.seed)
+
+    print(f"Sweep: {len(points)} points x {args.reps} reps, {args.duration_s:g}s each, "
+          f"backend={args.backend}, workers={args.workers}")
+    rows = run_sweep(points, args.reps, args.seed, args.duration_s, args.backend, args.workers,
+                     (args.storage, args.fs_fill))
+
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+
+    print_summary(rows)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
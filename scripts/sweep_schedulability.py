@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Random task-set campaign: rate monotonic vs EDF acceptance ratios.
+
+Generates synthetic task sets on one core (the configs/ model grown with
+more zones and sensors) for every (total utilization, task count) on the
+grid:
+- utilizations by UUniFast (Bini & Buttazzo), so sets are uniform over
+  the simplex sum(u_i) = U
+- periods log-uniform in [--period-min-ms, --period-max-ms], 1 ms grid
+- constrained deadlines D uniform in [C + f*(T - C), T], f = --deadline-frac
+
+Each set is checked by schedulability.py (fixed-priority RTA with the
+--fp-order priorities, EDF QPA) and by simulate_overload.py's preemptive
+simulator over the synchronous busy period with every job at its WCET,
+which is where both policies show their worst case. The simulation is
+capped at --sim-max-ms; a capped run without misses still counts as
+accepted.
+
+Sets are generated inside the pool workers from (--seed, set_id), so
+results do not depend on worker count or order; 100k sets only ship a few
+integers to each worker and back.
+
+Run:
+  python scripts/sweep_schedulability.py
+  python scripts/sweep_schedulability.py --tasks 5,10,20,40 --sets 1000 --workers 32
+  python scripts/sweep_schedulability.py --no-simulate --u-step 0.02 --sets 2000
+
+Outputs:
+- results/sched_campaign.csv    one row per task set
+- results/sched_acceptance.csv  acceptance ratio per (axis, value, method)
+"""
+import argparse
+import csv
+import math
+import multiprocessing
+import os
+import random
+
+import schedulability as sa
+import simulate_overload as so
+
+OUT_CSV = 'results/sched_campaign.csv'
+CURVES_CSV = 'results/sched_acceptance.csv'
+
+METHODS = ['rm_rta', 'edf_qpa', 'rm_sim', 'edf_sim']
+FIELDS = ['set_id', 'tasks', 'utilization', 'u_actual'] + METHODS + ['sim_capped']
+CURVE_FIELDS = ['axis', 'value', 'method', 'accepted', 'total', 'ratio']
+
+
+def parse_values(text, cast=int):
+    return [cast(v) for v in text.split(',') if v.strip()]
+
+
+def uunifast(n, total_u, rng):
+    """n task utilizations summing to total_u, uniform over the simplex."""
+    out = []
+    remaining = total_u
+    for i in range(1, n):
+        nxt = remaining * rng.random() ** (1.0 / (n - i))
+        out.append(remaining - nxt)
+        remaining = nxt
+    out.append(remaining)
+    return out
+
+
+def generate_taskset(n, total_u, rng, period_min_ms, period_max_ms, deadline_frac, fp_order='rm'):
+    """Synthetic constrained-deadline task set (simulate_overload.Task, core 0)."""
+    lo, hi = math.log(period_min_ms), math.log(period_max_ms)
+    tasks = []
+    for i, u in enumerate(uunifast(n, total_u, rng)):
+        period = max(1, round(math.exp(rng.uniform(lo, hi))))
+        wcet = u * period
+        deadline = wcet + rng.uniform(deadline_frac, 1.0) * (period - wcet)
+        tasks.append(so.Task(f't{i}', period, wcet, deadline, 0, 0, 'hard'))
+    # FreeRTOS: a higher number is a higher priority; unique, ties by index
+    key = (lambda t: t.period_ms) if fp_order == 'rm' else (lambda t: t.deadline_ms)
+    for prio, t in enumerate(sorted(tasks, key=key, reverse=True), 1):
+        t.priority = prio
+    return tasks
+
+
+def analyze(tasks, policy, cs_ms):
+    """True if schedulability.py's pessimistic test accepts the set."""
+    ca = sa.CoreAnalysis(0, tasks, policy, cs_ms, 'priority_inheritance', response_times=False)
+    return ca.analyze() == 'schedulable'
+
+
+def simulate(tasks, policy, sim_max_ms):
+    """(no misses, capped) for the synchronous release with C = WCET."""
+    horizon = min(sa.busy_period(tasks, limit=sim_max_ms), sim_max_ms)
+    capped = horizon >= sim_max_ms
+    stats = so.simulate_core(tasks, policy, horizon + 1e-9, random.Random(0))
+    return all(st.misses == 0 for st in stats.values()), capped
+
+
+def run_set(job):
+    """Pool worker: generate and evaluate one task set -> tidy row dict."""
+    set_id, n, total_u, opts = job
+    rng = random.Random(f"{opts['seed']}:{set_id}")
+    tasks = generate_taskset(n, total_u, rng, opts['period_min_ms'], opts['period_max_ms'],
+                             opts['deadline_frac'], opts['fp_order'])
+    row = {'set_id': set_id, 'tasks': n, 'utilization': total_u, 'u_actual': sa.utilization(tasks),
+           'rm_rta': int(analyze(tasks, 'fp', opts['cs_ms'])),
+           'edf_qpa': int(analyze(tasks, 'edf', opts['cs_ms'])),
+           'rm_sim': '', 'edf_sim': '', 'sim_capped': ''}
+    if opts['simulate']:
+        so.BCET_FRACTION = 1.0  # worker process: every job runs for its WCET
+        rm_ok, capped = simulate(tasks, 'fp', opts['sim_max_ms'])
+        edf_ok, _ = simulate(tasks, 'edf', opts['sim_max_ms'])
+        row.update({'rm_sim': int(rm_ok), 'edf_sim': int(edf_ok), 'sim_capped': int(capped)})
+    return row
+
+
+def run_campaign(jobs, workers):
+    rows = []
+    if workers <= 1:
+        for i, row in enumerate(map(run_set, jobs), 1):
+            rows.append(row)
+            if i % 100 == 0 or i == len(jobs):
+                print(f"Sets: {i}/{len(jobs)}", end='\r')
+    else:
+        chunksize = max(1, len(jobs) // (workers * 8))
+        with multiprocessing.Pool(workers) as pool:
+            for i, row in enumerate(pool.imap_unordered(run_set, jobs, chunksize), 1):
+                rows.append(row)
+                if i % 100 == 0 or i == len(jobs):
+                    print(f"Sets: {i}/{len(jobs)}", end='\r')
+    print()
+    rows.sort(key=lambda r: r['set_id'])
+    return rows
+
+
+def acceptance_curves(rows, methods):
+    """[{axis, value, method, accepted, total, ratio}] over utilization and task count."""
+    out = []
+    for axis in ('utilization', 'tasks'):
+        groups = {}
+        for row in rows:
+            groups.setdefault(row[axis], []).append(row)
+        for value, group in sorted(groups.items()):
+            for method in methods:
+                accepted = sum(r[method] for r in group)
+                out.append({'axis': axis, 'value': value, 'method': method, 'accepted': accepted,
+                            'total': len(group), 'ratio': accepted / len(group)})
+    return out
+
+
+def print_curves(curves, methods):
+    for axis, label in (('utilization', 'U'), ('tasks', 'n')):
+        print(f"\nAcceptance ratio by {axis}:")
+        print(f"{label:>6} " + ' '.join(f"{m:>8}" for m in methods))
+        by_value = {}
+        for c in curves:
+            if c['axis'] == axis:
+                by_value.setdefault(c['value'], {})[c['method']] = c['ratio']
+        for value, ratios in by_value.items():
+            print(f"{value:>6g} " + ' '.join(f"{ratios[m]:>8.3f}" for m in methods))
+
+
+def main():
+    p = argparse.ArgumentParser(description='Parallel RM vs EDF schedulability campaign on random task sets')
+    p.add_argument('--tasks', type=parse_values, default=[5, 10, 20], help='Comma-separated task counts')
+    p.add_argument('--u-min', type=float, default=0.05)
+    p.add_argument('--u-max', type=float, default=1.0)
+    p.add_argument('--u-step', type=float, default=0.05)
+    p.add_argument('--sets', type=int, default=100, help='Task sets per (utilization, task count)')
+    p.add_argument('--period-min-ms', type=float, default=10)
+    p.add_argument('--period-max-ms', type=float, default=10000)
+    p.add_argument('--deadline-frac', type=float, default=0.5,
+                   help='D uniform in [C + f*(T-C), T]; 1 gives implicit deadlines')
+    p.add_argument('--fp-order', choices=['rm', 'dm'], default='rm',
+                   help='Fixed priorities: rate monotonic (baseline.json) or deadline monotonic')
+    p.add_argument('--cs-us', type=float, default=0, help='critical_section_max_us for blocking (analysis only)')
+    p.add_argument('--no-simulate', dest='simulate', action='store_false', help='Analysis only')
+    p.add_argument('--sim-max-ms', type=float, default=600000, help='Cap on the simulated busy period')
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    p.add_argument('-o', '--out', default=OUT_CSV)
+    p.add_argument('--curves-out', default=CURVES_CSV)
+    args = p.parse_args()
+
+    steps = int(round((args.u_max - args.u_min) / args.u_step))
+    utils = [round(args.u_min + i * args.u_step, 6) for i in range(steps + 1)]
+    opts = {'seed': args.seed, 'period_min_ms': args.period_min_ms, 'period_max_ms': args.period_max_ms,
+            'deadline_frac': args.deadline_frac, 'fp_order': args.fp_order, 'cs_ms': args.cs_us / 1000.0,
+            'simulate': args.simulate, 'sim_max_ms': args.sim_max_ms}
+    jobs = [(set_id, n, u, opts)
+            for set_id, (n, u, _) in enumerate((n, u, k) for n in args.tasks for u in utils for k in range(args.sets))]
+
+    print(f"Campaign: {len(jobs)} task sets ({len(args.tasks)} sizes x {len(utils)} utilizations x {args.sets}), "
+          f"periods {args.period_min_ms:g}-{args.period_max_ms:g}ms, FP={args.fp_order}, workers={args.workers}")
+    rows = run_campaign(jobs, args.workers)
+    methods = METHODS if args.simulate else METHODS[:2]
+    curves = acceptance_curves(rows, methods)
+
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+    os.makedirs(os.path.dirname(args.curves_out) or '.', exist_ok=True)
+    with open(args.curves_out, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=CURVE_FIELDS)
+        w.writeheader()
+        w.writerows(curves)
+
+    print_curves(curves, methods)
+    if args.simulate:
+        disagree = sum(1 for r in rows if r['rm_rta'] != r['rm_sim'] or r['edf_qpa'] != r['edf_sim'])
+        capped = sum(r['sim_capped'] for r in rows)
+        print(f"\nAnalysis vs simulation disagreements: {disagree} ({capped} simulations capped)")
+    print(f"Wrote {args.out}, {args.curves_out}")
+
+
+if __name__ == '__main__':
+    main()